@@ -0,0 +1,177 @@
+"""
+Micro-benchmark du noyau mathématique : ancien Vec3 (avec __dict__ et
+float() à chaque construction) contre le Vec3 à __slots__ et les chemins
+"à plat" de geometry / scene.
+
+Usage: python benchmarks/bench_math.py [nombre_de_rayons]
+"""
+
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from math_utils import Vec3
+from geometry import Sphere
+from scene import Camera, Material
+
+
+# ----------------------------------------------------------------------
+# Ancienne implémentation (copie de référence, pour comparaison)
+# ----------------------------------------------------------------------
+
+class LegacyVec3:
+
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        self.x = float(x)
+        self.y = float(y)
+        self.z = float(z)
+
+    def __add__(self, other):
+        return LegacyVec3(self.x + other.x, self.y + other.y, self.z + other.z)
+
+    def __sub__(self, other):
+        return LegacyVec3(self.x - other.x, self.y - other.y, self.z - other.z)
+
+    def __mul__(self, scalar):
+        return LegacyVec3(self.x * scalar, self.y * scalar, self.z * scalar)
+
+    def __truediv__(self, scalar):
+        return LegacyVec3(self.x / scalar, self.y / scalar, self.z / scalar)
+
+    def dot(self, other):
+        return self.x * other.x + self.y * other.y + self.z * other.z
+
+    def cross(self, other):
+        return LegacyVec3(self.y * other.z - self.z * other.y,
+                          self.z * other.x - self.x * other.z,
+                          self.x * other.y - self.y * other.x)
+
+    def length(self):
+        return math.sqrt(self.x * self.x + self.y * self.y + self.z * self.z)
+
+    def normalize(self):
+        length = self.length()
+        if length > 0:
+            return self / length
+        return LegacyVec3(0, 0, 0)
+
+
+class LegacyRay:
+
+    def __init__(self, origin, direction):
+        self.origin = origin
+        self.direction = direction.normalize()
+
+    def at(self, t):
+        return self.origin + self.direction * t
+
+
+def legacy_get_ray(camera, u, v):
+    point = camera.lower_left_corner + camera.horizontal * u + camera.vertical * v
+    return LegacyRay(camera.position, (point - camera.position).normalize())
+
+
+def legacy_intersect(center, radius, ray):
+    oc = ray.origin - center
+    a = ray.direction.dot(ray.direction)
+    b = 2.0 * oc.dot(ray.direction)
+    c = oc.dot(oc) - radius * radius
+    discriminant = b * b - 4 * a * c
+    if discriminant < 0:
+        return False, None, None
+    sqrt_discriminant = math.sqrt(discriminant)
+    t1 = (-b - sqrt_discriminant) / (2 * a)
+    t2 = (-b + sqrt_discriminant) / (2 * a)
+    if t1 > 0.001:
+        t = t1
+    elif t2 > 0.001:
+        t = t2
+    else:
+        return False, None, None
+    hit_point = ray.at(t)
+    return True, t, (hit_point - center).normalize()
+
+
+class LegacyCamera:
+    """Même base que Camera, mais construite avec LegacyVec3."""
+
+    def __init__(self, camera):
+        def convert(v):
+            return LegacyVec3(v.x, v.y, v.z)
+        self.position = convert(camera.position)
+        self.lower_left_corner = convert(camera.lower_left_corner)
+        self.horizontal = convert(camera.horizontal)
+        self.vertical = convert(camera.vertical)
+
+
+# ----------------------------------------------------------------------
+# Mesures
+# ----------------------------------------------------------------------
+
+def _uv(count):
+    side = int(math.sqrt(count))
+    return [((i + 0.5) / side, (j + 0.5) / side) for j in range(side) for i in range(side)]
+
+
+def bench_legacy(camera, spheres, uv):
+    legacy_camera = LegacyCamera(camera)
+    legacy_spheres = [(LegacyVec3(s.center.x, s.center.y, s.center.z), s.radius) for s in spheres]
+    start = time.perf_counter()
+    hits = 0
+    for u, v in uv:
+        ray = legacy_get_ray(legacy_camera, u, v)
+        for center, radius in legacy_spheres:
+            if legacy_intersect(center, radius, ray)[0]:
+                hits += 1
+    return time.perf_counter() - start, hits
+
+
+def bench_current(camera, spheres, uv):
+    start = time.perf_counter()
+    hits = 0
+    for u, v in uv:
+        ray = camera.get_ray(u, v)
+        for sphere in spheres:
+            if sphere.intersect(ray)[0]:
+                hits += 1
+    return time.perf_counter() - start, hits
+
+
+def bench_construction(cls, count):
+    start = time.perf_counter()
+    for k in range(count):
+        cls(k, 1.0, 2.0)
+    return time.perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+
+    camera = Camera(Vec3(0.0, 2.0, 8.0), Vec3(0.0, 0.0, 0.0), Vec3(0.0, 1.0, 0.0), 50.0, 16.0 / 9.0)
+    material = Material(Vec3(0.8, 0.2, 0.2))
+    spheres = [Sphere(Vec3(-2.0, 1.0, 0.0), 1.0, material),
+               Sphere(Vec3(0.0, 0.7, -0.5), 0.7, material),
+               Sphere(Vec3(2.5, 1.2, -1.0), 1.2, material)]
+    uv = _uv(count)
+
+    legacy_time, legacy_hits = bench_legacy(camera, spheres, uv)
+    current_time, current_hits = bench_current(camera, spheres, uv)
+    assert legacy_hits == current_hits, "les deux implémentations doivent trouver les mêmes impacts"
+
+    rays = len(uv)
+    print(f"Rayons caméra + {len(spheres)} intersections, {rays:,} rayons")
+    print(f"  ancien Vec3   : {rays / legacy_time:12,.0f} rayons/s")
+    print(f"  Vec3 __slots__: {rays / current_time:12,.0f} rayons/s  (x{legacy_time / current_time:.2f})")
+
+    legacy_new = bench_construction(LegacyVec3, count)
+    current_new = bench_construction(Vec3, count)
+    print(f"Construction de {count:,} vecteurs")
+    print(f"  ancien Vec3   : {legacy_new * 1e9 / count:8.1f} ns/vecteur")
+    print(f"  Vec3 __slots__: {current_new * 1e9 / count:8.1f} ns/vecteur  (x{legacy_new / current_new:.2f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""
+Suite de benchmarks du ray tracer.
+
+Rend un ensemble fixe de scènes (scenes/*.txt et des scènes générées de 10
+à 100 000 sphères) à résolution, échantillonnage et graine fixes. Chaque
+cas tourne dans son propre processus, pour mesurer sa mémoire maximale sans
+être gêné par les autres. Pour chaque cas : temps de chargement et de rendu,
+rayons primaires / réfléchis / d'ombre par seconde, mémoire maximale et
+empreinte de l'image (pour détecter un changement de rendu).
+
+Usage:
+    python benchmarks/run.py                        # tout, résultats dans benchmarks/results.json
+    python benchmarks/run.py --sizes 10,1000 --only spheres
+    python benchmarks/run.py --save-baseline        # enregistre la référence
+    python benchmarks/run.py --baseline benchmarks/baseline.json   # compare à la référence
+
+La comparaison échoue (code de retour 1) si un cas est plus lent que la
+référence au-delà de la tolérance, ou si son image a changé.
+"""
+
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+SIZES = (10, 100, 1000, 10000, 100000)
+DEFAULT_RESULTS = os.path.join(ROOT, 'benchmarks', 'results.json')
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+
+
+# ----------------------------------------------------------------------
+# Scènes
+# ----------------------------------------------------------------------
+
+def generate_spheres(count, filename):
+    """Scène de count sphères aléatoires (mais toujours les mêmes) sur un plan."""
+    rng = random.Random(count)
+    # Densité à peu près constante : le champ s'élargit avec le nombre de sphères
+    extent = max(4.0, count ** (1 / 3) * 2.0)
+    radius = min(1.0, 4.0 / count ** (1 / 3))
+
+    lines = [
+        f"# {count} sphères générées par benchmarks/run.py",
+        f"CAMERA 0 {extent * 0.8:.3f} {extent * 1.6:.3f}  0 0 0  50",
+        "AMBIENT_LIGHT 0.2",
+        f"LIGHT {extent:.3f} {extent * 2:.3f} {extent:.3f}  1.0",
+        "BACKGROUND 0.2 0.2 0.3",
+        "PLANE 0 0 0  0 1 0  0.5 0.5 0.5  0.1 0.6 0.1 0.3",
+    ]
+    for _ in range(count):
+        r = radius * rng.uniform(0.3, 1.0)
+        lines.append(
+            f"SPHERE {rng.uniform(-extent, extent):.4f} {rng.uniform(r, extent):.4f} "
+            f"{rng.uniform(-extent, extent):.4f}  {r:.4f}  "
+            f"{rng.random():.3f} {rng.random():.3f} {rng.random():.3f}  "
+            f"0.1 0.7 0.3 50 {rng.choice((0.0, 0.0, 0.3)):.1f}")
+
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+    return filename
+
+
+def benchmark_cases(sizes, only, workdir):
+    """Liste de (nom, fichier de scène) à mesurer."""
+    cases = []
+    scene_dir = os.path.join(ROOT, 'scenes')
+    for name in sorted(os.listdir(scene_dir)):
+        if name.endswith('.txt'):
+            cases.append((name[:-4], os.path.join(scene_dir, name)))
+    for count in sizes:
+        filename = os.path.join(workdir, f"spheres_{count}.txt")
+        cases.append((f"spheres_{count}", generate_spheres(count, filename)))
+
+    if only:
+        cases = [case for case in cases if any(word in case[0] for word in only)]
+    return cases
+
+
+# ----------------------------------------------------------------------
+# Mesure d'un cas (dans un processus à part)
+# ----------------------------------------------------------------------
+
+def peak_memory_mb():
+    try:
+        import resource
+    except ImportError:
+        return None  # Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: kilo-octets, macOS: octets
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def measure(scene_file, width, height, spp, seed, backend, repeat=1):
+    from scene_loader import load_scene
+    from renderer import Renderer
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        scene = load_scene(scene_file, cache=False)
+        load_time = time.perf_counter() - start
+
+        renderer = Renderer(scene, width, height, max_depth=3, samples_per_pixel=spp,
+                            backend=backend, seed=seed)
+        # Meilleur temps sur plusieurs rendus : moins sensible au bruit de la machine
+        render_time = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            framebuffer = renderer.render()
+            render_time = min(render_time, time.perf_counter() - start)
+
+    counters = renderer.counters
+    rays = {
+        'primary': counters.get('samples', 0),
+        'reflection': counters.get('reflection_rays', 0),
+        'shadow': counters.get('shadow_rays', 0),
+    }
+    return {
+        'objects': len(scene.objects),
+        'load_time': load_time,
+        'render_time': render_time,
+        'wall_time': load_time + render_time,
+        'rays': rays,
+        'rays_per_second': {kind: count / render_time for kind, count in rays.items()},
+        'total_rays_per_second': sum(rays.values()) / render_time,
+        'peak_memory_mb': peak_memory_mb(),
+        'image_hash': hashlib.sha256(framebuffer.to_rgb8()).hexdigest()[:16],
+    }
+
+
+def run_case(scene_file, args):
+    command = [sys.executable, os.path.abspath(__file__), '--measure', scene_file,
+               '--width', str(args.width), '--height', str(args.height),
+               '--spp', str(args.spp), '--seed', str(args.seed), '--backend', args.backend,
+               '--repeat', str(args.repeat)]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr else
+                           f"code de retour {completed.returncode}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+# ----------------------------------------------------------------------
+# Rapport et comparaison
+# ----------------------------------------------------------------------
+
+def _rate(value):
+    return f"{value / 1000:.1f}k" if value >= 1000 else f"{value:.0f}"
+
+
+def print_result(name, result):
+    rps = result['rays_per_second']
+    memory = result['peak_memory_mb']
+    memory = f"mémoire {memory:.0f} Mo" if memory is not None else ""
+    print(f"  {name:<22} {result['wall_time']:7.2f}s  "
+          f"primaires {_rate(rps['primary']):>7}/s  réfléchis {_rate(rps['reflection']):>7}/s  "
+          f"ombres {_rate(rps['shadow']):>7}/s  {memory}")
+
+
+def compare(results, baseline, tolerance):
+    """Affiche l'écart à la référence ; renvoie la liste des régressions."""
+    regressions = []
+    if baseline['settings'] != results['settings']:
+        print("ATTENTION: paramètres différents de ceux de la référence "
+              f"({baseline['settings']} au lieu de {results['settings']})")
+
+    print(f"\nComparaison avec la référence (tolérance {tolerance:.0%}):")
+    for name, result in results['cases'].items():
+        reference = baseline['cases'].get(name)
+        if reference is None:
+            print(f"  {name:<22} nouveau cas")
+            continue
+        ratio = result['total_rays_per_second'] / reference['total_rays_per_second']
+        status = "OK"
+        if ratio < 1 - tolerance:
+            status = "REGRESSION"
+            regressions.append(f"{name}: {ratio:.2f}x plus lent")
+        if result['image_hash'] != reference['image_hash']:
+            status = "IMAGE DIFFÉRENTE"
+            regressions.append(f"{name}: image différente")
+        print(f"  {name:<22} {ratio:5.2f}x rayons/s, temps {result['wall_time']:.2f}s "
+              f"(référence {reference['wall_time']:.2f}s)  {status}")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks du ray tracer")
+    parser.add_argument("--width", type=int, default=160)
+    parser.add_argument("--height", type=int, default=90)
+    parser.add_argument("--spp", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--backend", default="python")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="nombre de rendus par cas (le meilleur temps est gardé)")
+    parser.add_argument("--sizes", default=",".join(str(n) for n in SIZES),
+                        help="nombres de sphères des scènes générées (ex. 10,1000)")
+    parser.add_argument("--only", default=None,
+                        help="ne garde que les cas dont le nom contient un de ces mots (ex. simple,spheres)")
+    parser.add_argument("--output", default=DEFAULT_RESULTS, help="fichier JSON des résultats")
+    parser.add_argument("--baseline", default=None, help="référence JSON à laquelle comparer")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help=f"enregistre aussi les résultats comme référence ({DEFAULT_BASELINE})")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="baisse de rayons/s tolérée avant de signaler une régression")
+    parser.add_argument("--measure", default=None, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.measure:
+        # Processus fils : un seul cas, résultat en JSON sur la sortie standard
+        result = measure(args.measure, args.width, args.height, args.spp, args.seed,
+                         args.backend, args.repeat)
+        print(json.dumps(result))
+        return 0
+
+    settings = {'width': args.width, 'height': args.height, 'spp': args.spp,
+                'seed': args.seed, 'backend': args.backend, 'repeat': args.repeat}
+    sizes = [int(n) for n in args.sizes.split(',') if n]
+    only = args.only.split(',') if args.only else None
+
+    results = {
+        'settings': settings,
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                    'cpus': os.cpu_count()},
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'cases': {},
+    }
+
+    print(f"Benchmarks {args.width}x{args.height}, {args.spp} échantillons/pixel, "
+          f"graine {args.seed}, backend {args.backend}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, scene_file in benchmark_cases(sizes, only, workdir):
+            try:
+                result = run_case(scene_file, args)
+            except RuntimeError as e:
+                print(f"  {name:<22} ERREUR: {e}")
+                continue
+            results['cases'][name] = result
+            print_result(name, result)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nRésultats: {args.output}")
+
+    if args.save_baseline:
+        with open(DEFAULT_BASELINE, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Référence enregistrée: {DEFAULT_BASELINE}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\nRégressions:\n  " + "\n  ".join(regressions))
+            return 1
+        print("\nAucune régression.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
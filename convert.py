@@ -1,161 +1,275 @@
 """
 Script de conversion PPM vers PNG.
 Usage: python convert.py fichier.ppm [fichier_sortie.png]
+       python convert.py dossier/ [dossier_sortie/] --jobs N
 
 Exemples:
     python convert.py output/simple.ppm
     python convert.py output/simple.ppm output/simple.png
+    python convert.py output/animation/ --jobs 8 --level 1
+    python convert.py output/animation/ output/png/ --filter adaptive --level 9
+
+Les PPM P3 (ASCII) et P6 (binaire) sont lus directement en octets, puis
+encodés avec l'encodeur PNG du ray tracer (src/png_writer.py), sans Pillow.
 """
 
-import sys
+import argparse
+import contextlib
 import os
+import sys
+import time
+import warnings
+from multiprocessing import Pool
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+from png_writer import PNGStreamWriter, FILTER_CHOICES
+
+try:
+    import numpy as np
+except ImportError:  # NumPy est optionnel (lecture P3 plus rapide)
+    np = None
+
+WHITESPACE = b' \t\r\n\v\f'
+
+
+def _header_tokens(data, count):
+    """Lit count nombres de l'en-tête (commentaires "#" compris) ; renvoie (tokens, position)."""
+    tokens = []
+    pos = 0
+    while len(tokens) < count:
+        while pos < len(data) and data[pos] in WHITESPACE:
+            pos += 1
+        if pos >= len(data):
+            raise ValueError("En-tête PPM incomplet")
+        if data[pos] == ord('#'):
+            end = data.find(b'\n', pos)
+            pos = len(data) if end < 0 else end + 1
+            continue
+        start = pos
+        while pos < len(data) and data[pos] not in WHITESPACE:
+            pos += 1
+        tokens.append(data[start:pos])
+    return tokens, pos
+
+
+def parse_ppm(data):
+    """
+    Contenu d'un fichier PPM (octets) -> (largeur, hauteur, pixels RGB en octets).
+    P6 est découpé directement ; P3 est lu en C par NumPy (numpy.fromstring)
+    s'il est installé, sinon nombre par nombre en Python (bien plus lent).
+    """
+    (magic, width, height, max_val), pos = _header_tokens(data, 4)
+    if magic not in (b'P3', b'P6'):
+        raise ValueError(f"Format non supporté: {magic.decode(errors='replace')} (P3 ou P6)")
+    width, height, max_val = int(width), int(height), int(max_val)
+    if not 0 < max_val < 256:
+        raise ValueError(f"Valeur maximale {max_val} non supportée (8 bits seulement)")
+    size = width * height * 3
+
+    if magic == b'P6':
+        # Un seul blanc sépare l'en-tête des pixels
+        pixels = data[pos + 1:pos + 1 + size]
+    else:
+        body = data[pos:]
+        if b'#' in body:
+            body = b'\n'.join(line.split(b'#', 1)[0] for line in body.splitlines())
+        pixels = _parse_ascii(body)
+
+    if len(pixels) < size:
+        raise ValueError(f"Pixels incomplets: {len(pixels)} octets au lieu de {size}")
+    pixels = pixels[:size]
+
+    if max_val != 255:
+        # Remise à l'échelle 0..255 par table de correspondance
+        table = bytes(min(255, round(v * 255 / max_val)) for v in range(256))
+        pixels = pixels.translate(table)
+    return width, height, pixels
+
+
+def _parse_ascii(body):
+    """Nombres 0..255 séparés par des blancs -> octets."""
+    if np is not None:
+        # Lu en entiers larges : en uint8, 300 deviendrait 44 sans erreur.
+        # Un caractère inattendu arrête la lecture avec un avertissement,
+        # transformé ici en erreur.
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            try:
+                values = np.fromstring(body, dtype=np.int64, sep=' ')
+            except (ValueError, DeprecationWarning):
+                raise ValueError("Pixels P3 invalides (caractère inattendu)") from None
+        if values.size and (values.min() < 0 or values.max() > 255):
+            raise ValueError("Pixels P3 invalides (valeur hors de 0..255)")
+        return values.astype(np.uint8).tobytes()
+    return bytes(map(int, body.split()))
+
 
 def convert_ppm_to_png_with_pillow(input_file, output_file):
-    
+
     try:
         from PIL import Image
-        
+    except ImportError as e:
+        # Absent, ou installation cassée : l'erreur d'import le dit
+        print(f"✗ Pillow indisponible ({e}) : pip install Pillow")
+        return False
+
+    try:
         # Ouvre et convertit l'image
         img = Image.open(input_file)
         img.save(output_file, 'PNG')
         print(f"✓ Conversion réussie avec Pillow: {output_file}")
         return True
-    except ImportError:
-        return False
     except Exception as e:
-        print(f"✗ Erreur avec Pillow: {e}")
+        print(f"✗ Erreur avec Pillow: {type(e).__name__}: {e}")
         return False
 
-def convert_ppm_manually(input_file, output_file):
+
+def convert_file(input_file, output_file, level=6, row_filter='sub'):
+    """Convertit un PPM en PNG ; renvoie (taille PPM, taille PNG)."""
+    with open(input_file, 'rb') as f:
+        width, height, pixels = parse_ppm(f.read())
+
+    stride = width * 3
+    # Pas de "Image sauvegardée" par fichier : l'appelant rend compte
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        with PNGStreamWriter(output_file, width, height, level, row_filter) as writer:
+            for j in range(height):
+                writer.write_rgb8(pixels[j * stride:(j + 1) * stride])
+    return os.path.getsize(input_file), os.path.getsize(output_file)
+
+
+def convert_ppm_manually(input_file, output_file, level=6, row_filter='sub'):
     try:
-        import struct
-        import zlib
-        
-        # Lit le fichier PPM
-        with open(input_file, 'r') as f:
-            lines = f.readlines()
-        
-        # Parse l'en-tête PPM
-        line_idx = 0
-        # Ignore les commentaires et lignes vides
-        while line_idx < len(lines) and (lines[line_idx].strip().startswith('#') or not lines[line_idx].strip()):
-            line_idx += 1
-        
-        format_line = lines[line_idx].strip()
-        if format_line != 'P3':
-            print(f"✗ Format non supporté: {format_line} (seul P3 est supporté)")
-            return False
-        line_idx += 1
-        
-        # Dimensions
-        while line_idx < len(lines) and (lines[line_idx].strip().startswith('#') or not lines[line_idx].strip()):
-            line_idx += 1
-        dims = lines[line_idx].strip().split()
-        width, height = int(dims[0]), int(dims[1])
-        line_idx += 1
-        
-        # Max value
-        while line_idx < len(lines) and (lines[line_idx].strip().startswith('#') or not lines[line_idx].strip()):
-            line_idx += 1
-        max_val = int(lines[line_idx].strip())
-        line_idx += 1
-        
-        # Lit les données de pixels
-        pixel_data = []
-        for i in range(line_idx, len(lines)):
-            values = lines[i].strip().split()
-            pixel_data.extend([int(v) for v in values])
-        
-        # Crée les données PNG
-        png_data = bytearray()
-        
-        # En-tête PNG
-        png_data.extend(b'\x89PNG\r\n\x1a\n')
-        
-        ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)  # RGB, 8-bit
-        png_data.extend(struct.pack('>I', len(ihdr)))
-        png_data.extend(b'IHDR')
-        png_data.extend(ihdr)
-        png_data.extend(struct.pack('>I', zlib.crc32(b'IHDR' + ihdr) & 0xffffffff))
-        
-        raw_data = bytearray()
-        for y in range(height):
-            raw_data.append(0) 
-            for x in range(width):
-                idx = (y * width + x) * 3
-                if idx + 2 < len(pixel_data):
-                    raw_data.append(pixel_data[idx])      # R
-                    raw_data.append(pixel_data[idx + 1])  # G
-                    raw_data.append(pixel_data[idx + 2])  # B
-        
-        compressed = zlib.compress(bytes(raw_data), 9)
-        png_data.extend(struct.pack('>I', len(compressed)))
-        png_data.extend(b'IDAT')
-        png_data.extend(compressed)
-        png_data.extend(struct.pack('>I', zlib.crc32(b'IDAT' + compressed) & 0xffffffff))
-        
-        png_data.extend(struct.pack('>I', 0))
-        png_data.extend(b'IEND')
-        png_data.extend(struct.pack('>I', zlib.crc32(b'IEND') & 0xffffffff))
-        
-        # Écrit le fichier PNG
-        with open(output_file, 'wb') as f:
-            f.write(png_data)
-        
+        convert_file(input_file, output_file, level, row_filter)
         print(f"✓ Conversion réussie (manuelle): {output_file}")
         return True
-        
-    except Exception as e:
+    except (OSError, ValueError) as e:
         print(f"✗ Erreur lors de la conversion manuelle: {e}")
-        import traceback
-        traceback.print_exc()
         return False
 
+
+# ----------------------------------------------------------------------
+# Mode dossier
+# ----------------------------------------------------------------------
+
+def _convert_job(job):
+    input_file, output_file, level, row_filter = job
+    start = time.perf_counter()
+    try:
+        sizes = convert_file(input_file, output_file, level, row_filter)
+    except (OSError, ValueError) as e:
+        return input_file, None, str(e), time.perf_counter() - start
+    return input_file, sizes, None, time.perf_counter() - start
+
+
+def convert_directory(input_dir, output_dir, jobs=1, level=6, row_filter='sub'):
+    """Convertit tous les .ppm de input_dir vers output_dir ; renvoie le nombre d'échecs."""
+    names = sorted(name for name in os.listdir(input_dir) if name.lower().endswith('.ppm'))
+    if not names:
+        print(f"✗ Aucun fichier .ppm dans {input_dir}")
+        return 1
+
+    os.makedirs(output_dir, exist_ok=True)
+    work = [(os.path.join(input_dir, name),
+             os.path.join(output_dir, os.path.splitext(name)[0] + '.png'), level, row_filter)
+            for name in names]
+
+    print(f"Conversion de {len(work)} fichiers ({jobs} processus, zlib {level}, filtre {row_filter})...")
+    start = time.perf_counter()
+    failures = 0
+    total_in = total_out = 0
+
+    if jobs > 1:
+        with Pool(processes=jobs) as pool:
+            results = list(_report(pool.imap_unordered(_convert_job, work, chunksize=4), len(work)))
+    else:
+        results = list(_report(map(_convert_job, work), len(work)))
+
+    for input_file, sizes, error, _ in results:
+        if sizes is None:
+            failures += 1
+        else:
+            total_in += sizes[0]
+            total_out += sizes[1]
+
+    elapsed = time.perf_counter() - start
+    print(f"\n{len(work) - failures}/{len(work)} fichiers convertis en {elapsed:.1f}s "
+          f"({len(work) / elapsed:.1f} fichiers/s)")
+    if total_in:
+        print(f"Taille PPM: {total_in:,} octets, PNG: {total_out:,} octets "
+              f"(compression {(1 - total_out / total_in) * 100:.1f}%)")
+    return failures
+
+
+def _report(results, total):
+    for done, result in enumerate(results, 1):
+        input_file, sizes, error, elapsed = result
+        name = os.path.basename(input_file)
+        if error is None:
+            print(f"  ✓ {name} ({elapsed:.2f}s) [{done}/{total}]")
+        else:
+            print(f"  ✗ {name}: {error} [{done}/{total}]")
+        yield result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Conversion PPM (P3/P6) → PNG")
+    parser.add_argument("input", help="fichier .ppm, ou dossier de fichiers .ppm")
+    parser.add_argument("output", nargs="?", default=None,
+                        help="fichier .png (ou dossier de sortie en mode dossier)")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="nombre de processus en mode dossier (0 = un par cœur)")
+    parser.add_argument("--level", type=int, choices=range(10), default=6, metavar="0-9",
+                        help="niveau de compression zlib (1 = rapide, 9 = plus petit)")
+    parser.add_argument("--filter", choices=FILTER_CHOICES, default="sub",
+                        help="filtre des lignes PNG (adaptive: le meilleur par ligne, plus lent)")
+    parser.add_argument("--pillow", action="store_true",
+                        help="convertit avec Pillow (fichier seul)")
+    return parser.parse_args(argv)
+
+
 def main():
     """Fonction principale."""
-    
-    # Vérifie les arguments
-    if len(sys.argv) < 2:
-        print("Usage: python convert.py fichier.ppm [fichier_sortie.png]")
-        print("\nExemples:")
-        print("  python convert.py output/simple.ppm")
-        print("  python convert.py output/simple.ppm output/simple.png")
-        return 1
-    
-    input_file = sys.argv[1]
-    
+    args = parse_args()
+    input_file = args.input
+
     # Vérifie que le fichier existe
     if not os.path.exists(input_file):
         print(f"✗ Erreur: Le fichier '{input_file}' n'existe pas!")
         return 1
-    
-    if len(sys.argv) > 2:
-        output_file = sys.argv[2]
+
+    if os.path.isdir(input_file):
+        jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+        failures = convert_directory(input_file, args.output or input_file, jobs,
+                                     args.level, args.filter)
+        return 1 if failures else 0
+
+    if args.output:
+        output_file = args.output
     else:
         base_name = os.path.splitext(input_file)[0]
         output_file = base_name + '.png'
-    
+
     print("=" * 60)
     print("CONVERSION PPM → PNG")
     print("=" * 60)
     print(f"Entrée:  {input_file}")
     print(f"Sortie:  {output_file}")
     print("=" * 60)
-    
-    print("\nTentative de conversion avec Pillow...")
-    success = convert_ppm_to_png_with_pillow(input_file, output_file)
-    
-    if not success:
-        print("\n⚠ Pillow n'est pas installé. Utilisation de la conversion manuelle...")
-        print("Pour de meilleurs résultats, installez Pillow: pip install Pillow")
+
+    if args.pillow:
+        print("\nConversion avec Pillow...")
+        success = convert_ppm_to_png_with_pillow(input_file, output_file)
+    else:
         print("\nConversion en cours...")
-        success = convert_ppm_manually(input_file, output_file)
-    
+        success = convert_ppm_manually(input_file, output_file, args.level, args.filter)
+
     if success:
         print("\n" + "=" * 60)
         print("CONVERSION TERMINÉE AVEC SUCCÈS!")
         print("=" * 60)
-        
+
         input_size = os.path.getsize(input_file)
         output_size = os.path.getsize(output_file)
         ratio = (1 - output_size / input_size) * 100
@@ -168,7 +282,10 @@ def main():
         print("✗ ÉCHEC DE LA CONVERSION")
         print("=" * 60)
         print("\nSolutions alternatives:")
-        print("1. Installer Pillow: pip install Pillow")
+        if args.pillow:
+            print("1. Convertir sans Pillow: relancer sans --pillow")
+        else:
+            print("1. Installer Pillow: pip install Pillow, puis relancer avec --pillow")
         print("2. Utiliser GIMP (gratuit): ouvrir le PPM et exporter en PNG")
         print("3. Utiliser ImageMagick: magick convert fichier.ppm fichier.png")
         return 1
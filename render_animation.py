@@ -1,105 +1,132 @@
-# render_animation.py - Rend toutes les frames et crée un GIF
+# render_animation.py - Rend toutes les frames et crée un GIF (ou APNG)
 
 import os
-import subprocess
+import sys
 import glob
+import argparse
 
-def render_all_frames():
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+from animation import AnimationDriver, OUTPUT_FORMATS
+from distributed import Coordinator, parse_address
+from render_cache import RenderCache, DEFAULT_DIRECTORY
+from ray_table import DEFAULT_DIRECTORY as RAY_TABLE_DIRECTORY
+from animation_writer import open_animation_writer
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Rendu de l'animation de rotation")
+    parser.add_argument("--scene", default=None,
+                        help="fichier de scène animé (ex. scenes/rotation.txt) "
+                             "au lieu de scenes/animation/frame_*.txt")
+    parser.add_argument("--frames", default=None,
+                        help="frames à rendre, ex. 0-9, 5, 0-29:2 (défaut: toutes)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="nombre de frames rendues en parallèle")
+    parser.add_argument("--width", type=int, default=640)  # Résolution réduite
+    parser.add_argument("--height", type=int, default=360)
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="png",
+                        help="format des frames écrites (avec --keep-frames)")
+    parser.add_argument("--animation", default="output/rotation.gif",
+                        help="fichier de l'animation: .gif, ou .png/.apng pour un PNG animé")
+    parser.add_argument("--delay", type=int, default=100,
+                        help="durée d'une frame de l'animation en millisecondes")
+    parser.add_argument("--keep-frames", action="store_true",
+                        help="écrit aussi chaque frame dans output/animation/")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="graine de l'anti-aliasing (frames reproductibles)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="ne retrace que les pixels touchés par les objets qui bougent")
+    parser.add_argument("--serve", metavar="HOTE:PORT", default=None,
+                        help="distribue les tuiles aux workers (python src/worker.py --connect HOTE:PORT, "
+                             "avec la même clé RAYTRACER_AUTHKEY) ; sans hôte, écoute sur "
+                             "127.0.0.1. Réseau de confiance uniquement : les messages sont des pickles")
+    parser.add_argument("--cache", metavar="DOSSIER", nargs="?", const=DEFAULT_DIRECTORY, default=None,
+                        help="recopie les frames déjà rendues avec la même scène et les mêmes paramètres")
+    parser.add_argument("--cache-size", type=int, default=512,
+                        help="taille maximale du cache de rendu en Mo")
+    parser.add_argument("--ray-table", metavar="DOSSIER", nargs="?", const=RAY_TABLE_DIRECTORY,
+                        default=None,
+                        help="calcule une seule fois les rayons primaires de la caméra, "
+                             "partagés par toutes les frames (fichier projeté en mémoire)")
+    parser.add_argument("--ray-table-size", type=int, default=1024,
+                        help="taille maximale du dossier des tables de rayons en Mo")
+    parser.add_argument("--no-gif", action="store_true",
+                        help="ne crée pas l'animation (les frames sont alors écrites)")
+    return parser.parse_args(argv)
+
+def render_all_frames(args):
     """Rend toutes les scènes d'animation"""
-    scene_files = sorted(glob.glob("scenes/animation/frame_*.txt"))
+    if args.scene:
+        if not os.path.exists(args.scene):
+            print(f"Erreur: fichier '{args.scene}' introuvable")
+            return False
+        scene_files = args.scene
+    else:
+        scene_files = sorted(glob.glob("scenes/animation/frame_*.txt"))
     
     if not scene_files:
         print("Erreur: Aucune scène trouvée!")
         print("Lance d'abord: python generate_rotation.py")
         return False
     
-    # Crée le dossier de sortie
-    os.makedirs("output/animation", exist_ok=True)
-    
-    print(f"Rendu de {len(scene_files)} frames...")
     print("(Résolution réduite pour aller plus vite)")
     
-    for i, scene_file in enumerate(scene_files):
-        frame_num = i
-        output_file = f"output/animation/frame_{frame_num:03d}.ppm"
-        
-        print(f"  Frame {frame_num+1}/{len(scene_files)}...", end=" ", flush=True)
-        
-        # Rend avec résolution réduite (plus rapide)
-        cmd = [
-            "python", "src/main.py",
-            scene_file,
-            output_file,
-            "640",  # Largeur réduite
-            "360"   # Hauteur réduite
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            print("OK")
-        else:
-            print(f"ERREUR\n{result.stderr}")
-            return False
-    
-    print("\nRendu terminé!")
-    return True
-
-def create_gif():
-    """Convertit les PPM en PNG puis crée un GIF"""
-    
+    cache = None
+    if args.cache is not None:
+        if args.seed is None:
+            print("Note: sans --seed, la graine est tirée au hasard et les frames ne seront pas réutilisées")
+        cache = RenderCache(args.cache, args.cache_size * 1024 * 1024)
+    
+    coordinator = None
+    if args.serve:
+        coordinator = Coordinator(parse_address(args.serve)).start()
+    
+    # Frames sur le disque seulement si demandé : l'animation est encodée
+    # directement depuis les framebuffers, au fil du rendu
+    keep_frames = args.keep_frames or args.no_gif
+    driver = AnimationDriver(width=args.width, height=args.height, jobs=args.jobs,
+                             output_dir="output/animation" if keep_frames else None,
+                             output_format=args.format,
+                             seed=args.seed, incremental=args.incremental,
+                             coordinator=coordinator, cache=cache,
+                             ray_table=args.ray_table,
+                             ray_table_size=args.ray_table_size * 1024 * 1024)
+    writer = None
+    finished = False
     try:
-        from PIL import Image
-    except ImportError:
-        print("\nPillow non installé!")
-        print("Installe-le: pip install Pillow")
+        if not args.no_gif:
+            output_dir = os.path.dirname(args.animation)
+            if output_dir:
+                os.makedirs(output_dir, exist_ok=True)
+            writer = open_animation_writer(args.animation, args.width, args.height, args.delay)
+        driver.render(scene_files, frames=args.frames, writer=writer)
+        finished = True
+    except (ValueError, RuntimeError) as e:
+        print(f"Erreur: {e}")
         return False
+    finally:
+        # Animation renommée seulement si toutes les frames ont été rendues ;
+        # sinon (erreur, Ctrl+C...) le fichier temporaire est supprimé
+        if writer is not None:
+            if finished:
+                writer.close()
+            else:
+                writer.abort()
+        if coordinator is not None:
+            coordinator.close()
     
-    print("\nConversion PPM → PNG...")
-    
-    ppm_files = sorted(glob.glob("output/animation/frame_*.ppm"))
-    
-    for ppm_file in ppm_files:
-        png_file = ppm_file.replace(".ppm", ".png")
-        print(f"  {os.path.basename(ppm_file)}...", end=" ", flush=True)
-        
-        try:
-            img = Image.open(ppm_file)
-            img.save(png_file, 'PNG')
-            print("OK")
-        except Exception as e:
-            print(f"ERREUR: {e}")
-    
-    # Crée le GIF
-    print("\nCréation du GIF...")
-    
-    png_files = sorted(glob.glob("output/animation/frame_*.png"))
-    
-    if not png_files:
-        print("Erreur: Aucun PNG trouvé!")
-        return False
-    
-    images = [Image.open(f) for f in png_files]
-    
-    images[0].save(
-        "output/rotation.gif",
-        save_all=True,
-        append_images=images[1:],
-        duration=100,  # 100ms par frame = 10 FPS
-        loop=0
-    )
-    
-    print("GIF créé: output/rotation.gif")
+    print("\nRendu terminé!")
     return True
 
 def main():
-    if not render_all_frames():
-        return
+    args = parse_args()
     
-    create_gif()
+    if not render_all_frames(args):
+        return
     
     print("\n=== Terminé! ===")
-    print("GIF disponible: output/rotation.gif")
+    if not args.no_gif:
+        print(f"Animation disponible: {args.animation}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,254 @@
+"""
+Scènes animées : une scène statique + des pistes (tracks) sur les paramètres
+de certains objets, lumières ou de la caméra.
+
+La scène de base est lue une seule fois ; scene_at(frame) fabrique la scène
+d'une frame en ne recréant que ce qui est animé. Les objets non animés sont
+les mêmes instances d'une frame à l'autre (temporal.scene_diff les saute
+sans les comparer), et un objet animé dont les valeurs n'ont pas changé
+(clé tenue) réutilise aussi l'instance précédente.
+"""
+
+import math
+
+from math_utils import Vec3
+from geometry import Sphere, Plane
+from scene import Scene, Camera, Material, Light, DirectionalLight
+
+# Paramètres animables par type de cible : nom -> nombre de composantes
+PARAMETERS = {
+    'SPHERE': {'center': 3, 'radius': 1, 'color': 3, 'reflectivity': 1},
+    'PLANE': {'point': 3, 'normal': 3, 'color': 3, 'reflectivity': 1},
+    'LIGHT': {'position': 3, 'intensity': 1, 'color': 3},
+    'DIRECTIONAL_LIGHT': {'direction': 3, 'intensity': 1, 'color': 3},
+    'CAMERA': {'position': 3, 'look_at': 3, 'fov': 1},
+}
+
+INTERPOLATIONS = ('linear', 'step', 'smooth')
+
+# Noms utilisables dans les expressions d'ANIMATE
+EXPRESSION_NAMES = {
+    'pi': math.pi, 'tau': math.tau, 'e': math.e,
+    'sin': math.sin, 'cos': math.cos, 'tan': math.tan,
+    'asin': math.asin, 'acos': math.acos, 'atan': math.atan, 'atan2': math.atan2,
+    'sqrt': math.sqrt, 'exp': math.exp, 'log': math.log,
+    'floor': math.floor, 'ceil': math.ceil, 'radians': math.radians, 'degrees': math.degrees,
+    'abs': abs, 'min': min, 'max': max, 'pow': pow,
+}
+FRAME_NAMES = ('frame', 'frames', 't')
+
+
+class ExpressionTrack:
+    """
+    Valeurs calculées par une expression Python restreinte, ex.
+    "-2*cos(tau*t), 1, 0". Variables: frame, frames, t = frame / frames.
+    """
+
+    def __init__(self, text, size):
+        self.text = text
+        self.size = size
+        try:
+            self.code = compile(f"({text},)", '<ANIMATE>', 'eval')
+        except SyntaxError as e:
+            raise ValueError(f"expression invalide '{text}'") from e
+
+        # Pas d'attributs, de lambdas ni de noms inconnus : seulement du calcul
+        unknown = set(self.code.co_names) - set(EXPRESSION_NAMES) - set(FRAME_NAMES)
+        if unknown:
+            raise ValueError(f"nom non autorisé dans l'expression: {', '.join(sorted(unknown))}")
+        if any(hasattr(const, 'co_code') for const in self.code.co_consts):
+            raise ValueError(f"expression trop complexe '{text}'")
+
+        # Vérifie le nombre de composantes dès le chargement
+        self.value(0, 1)
+
+    def value(self, frame, frames):
+        names = dict(EXPRESSION_NAMES, frame=frame, frames=frames, t=frame / frames)
+        values = eval(self.code, {'__builtins__': {}}, names)
+        if len(values) != self.size:
+            raise ValueError(f"{len(values)} valeurs au lieu de {self.size} pour '{self.text}'")
+        return tuple(float(v) for v in values)
+
+
+class KeyframeTrack:
+    """
+    Valeurs interpolées entre des clés (frame, valeurs, interpolation).
+    L'interpolation d'une clé s'applique au segment qui la suit ; avant la
+    première et après la dernière clé, la valeur est tenue.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.keys = []
+
+    def add_key(self, frame, values, interpolation='linear'):
+        if len(values) != self.size:
+            raise ValueError(f"{len(values)} valeurs au lieu de {self.size}")
+        if interpolation not in INTERPOLATIONS:
+            raise ValueError(f"interpolation inconnue '{interpolation}' "
+                             f"(choix: {', '.join(INTERPOLATIONS)})")
+        self.keys = [key for key in self.keys if key[0] != frame]
+        self.keys.append((frame, tuple(values), interpolation))
+        self.keys.sort(key=lambda key: key[0])
+
+    def value(self, frame, frames):
+        keys = self.keys
+        if frame <= keys[0][0]:
+            return keys[0][1]
+        for (f0, v0, mode), (f1, v1, _) in zip(keys, keys[1:]):
+            if frame < f1:
+                s = (frame - f0) / (f1 - f0)
+                if mode == 'step':
+                    return v0
+                if mode == 'smooth':
+                    s = s * s * (3 - 2 * s)
+                return tuple(a + (b - a) * s for a, b in zip(v0, v1))
+        return keys[-1][1]
+
+
+def _vec(values):
+    return Vec3(values[0], values[1], values[2])
+
+
+def _material(material, params):
+    if 'color' not in params and 'reflectivity' not in params:
+        return material
+    color = _vec(params['color']) if 'color' in params else material.color
+    reflectivity = params['reflectivity'][0] if 'reflectivity' in params else material.reflectivity
+    return Material(color, material.ambient, material.diffuse, material.specular,
+                    material.shininess, reflectivity)
+
+
+def _rebuild(kind, base, params):
+    """Nouvelle instance de base avec les paramètres animés remplacés."""
+    if kind == 'SPHERE':
+        center = _vec(params['center']) if 'center' in params else base.center
+        radius = params['radius'][0] if 'radius' in params else base.radius
+        return Sphere(center, radius, _material(base.material, params))
+    if kind == 'PLANE':
+        point = _vec(params['point']) if 'point' in params else base.point
+        normal = _vec(params['normal']) if 'normal' in params else base.normal
+        return Plane(point, normal, _material(base.material, params))
+    if kind == 'CAMERA':
+        position = _vec(params['position']) if 'position' in params else base.position
+        look_at = _vec(params['look_at']) if 'look_at' in params else base.look_at
+        fov = params['fov'][0] if 'fov' in params else base.fov
+        return Camera(position, look_at, base.up, fov, base.aspect_ratio)
+
+    intensity = params['intensity'][0] if 'intensity' in params else base.intensity
+    color = _vec(params['color']) if 'color' in params else base.color
+    if kind == 'DIRECTIONAL_LIGHT':
+        direction = _vec(params['direction']) if 'direction' in params else base.direction
+        return DirectionalLight(direction, intensity, color)
+    position = _vec(params['position']) if 'position' in params else base.position
+    return Light(position, intensity, color)
+
+
+def target_kind(obj):
+    """Type de cible (SPHERE, PLANE, LIGHT...) d'un élément de la scène, ou None."""
+    if isinstance(obj, Sphere):
+        return 'SPHERE'
+    if isinstance(obj, Plane):
+        return 'PLANE'
+    if isinstance(obj, DirectionalLight):
+        return 'DIRECTIONAL_LIGHT'
+    if isinstance(obj, Light):
+        return 'LIGHT'
+    return None
+
+
+class AnimatedScene:
+    """
+    Scène de base + pistes. tracks: {(cible, numéro, paramètre): piste},
+    les numéros commençant à 1 par type (SPHERE#1 = première sphère du
+    fichier), avec ('CAMERA', 1, ...) pour la caméra.
+
+        animation = load_animation("scenes/rotation.txt")
+        for frame, scene in animation.frames():
+            ...
+    """
+
+    def __init__(self, base_scene, frame_count=1, tracks=None):
+        if frame_count < 1:
+            raise ValueError(f"Nombre de frames invalide: {frame_count}")
+        self.base_scene = base_scene
+        self.frame_count = frame_count
+        self.tracks = tracks or {}
+
+        # (liste, position) dans la scène de base de chaque cible numérotée
+        numbering = {}
+        self._slots = {}
+        for attribute in ('objects', 'lights'):
+            for position, obj in enumerate(getattr(base_scene, attribute)):
+                kind = target_kind(obj)
+                if kind is not None:
+                    numbering[kind] = numbering.get(kind, 0) + 1
+                    self._slots[(kind, numbering[kind])] = (attribute, position)
+
+        # Pistes regroupées par cible : {(cible, numéro): {paramètre: piste}}
+        self._targets = {}
+        for (kind, number, param), track in self.tracks.items():
+            if kind == 'CAMERA':
+                if base_scene.camera is None:
+                    raise ValueError("CAMERA animée mais aucune caméra définie")
+            elif (kind, number) not in self._slots:
+                raise ValueError(f"Cible inconnue {kind}#{number}")
+            self._targets.setdefault((kind, number), {})[param] = track
+
+        # Dernière instance construite par cible, avec ses valeurs
+        self._instances = {}
+
+    @property
+    def is_animated(self):
+        return bool(self.tracks)
+
+    def values_at(self, frame):
+        """Paramètres animés à cette frame : {(cible, numéro): {paramètre: valeurs}}."""
+        return {target: {param: track.value(frame, self.frame_count)
+                         for param, track in params.items()}
+                for target, params in self._targets.items()}
+
+    def _instance(self, target, base, params):
+        cached = self._instances.get(target)
+        if cached is not None and cached[0] == params:
+            return cached[1]
+        instance = _rebuild(target[0], base, params)
+        self._instances[target] = (params, instance)
+        return instance
+
+    def scene_at(self, frame):
+        """Scène de la frame donnée (les éléments non animés sont partagés)."""
+        if not 0 <= frame < self.frame_count:
+            raise ValueError(f"Frame {frame} hors de l'animation ({self.frame_count} frames)")
+
+        base = self.base_scene
+        scene = Scene()
+        scene.objects = list(base.objects)
+        scene.lights = list(base.lights)
+        scene.camera = base.camera
+        scene.background_color = base.background_color
+
+        for target, params in self.values_at(frame).items():
+            if target[0] == 'CAMERA':
+                scene.camera = self._instance(target, base.camera, params)
+            else:
+                attribute, position = self._slots[target]
+                items = getattr(scene, attribute)
+                items[position] = self._instance(target, items[position], params)
+        return scene
+
+    def frames(self, indices=None):
+        """Générateur paresseux de (frame, scène)."""
+        for frame in (range(self.frame_count) if indices is None else indices):
+            yield frame, self.scene_at(frame)
+
+    def changed_objects(self, frame):
+        """
+        Positions (dans scene.objects) des objets dont les paramètres
+        diffèrent de la frame précédente (tous les objets animés en frame 0).
+        """
+        current = self.values_at(frame)
+        previous = self.values_at(frame - 1) if frame > 0 else {}
+        return sorted(position for target, (attribute, position) in self._slots.items()
+                      if attribute == 'objects' and target in current
+                      and current[target] != previous.get(target))
@@ -0,0 +1,317 @@
+"""
+Rendu d'animations dans le processus courant.
+
+Chaque frame est chargée et rendue par un processus d'un pool (pas de
+sous-processus "python src/main.py" par frame) : l'interpréteur et les
+modules ne sont chargés qu'une fois par processus, et les frames sont
+rendues en parallèle puis écrites directement au format demandé.
+
+La source peut être une liste de fichiers (un par frame) ou un seul fichier
+de scène animé (voir animated_scene.py) : il n'est alors lu qu'une fois par
+processus et chaque frame est fabriquée à la demande.
+"""
+
+import contextlib
+import os
+import time
+from multiprocessing import Pool
+
+from scene_loader import load_scene, load_animation
+from renderer import Renderer
+from ppm_writer import write_ppm
+from png_writer import write_png
+from sampling import random_seed
+from temporal import dirty_tiles
+from render_cache import render_key
+
+OUTPUT_FORMATS = ('png', 'ppm')
+
+
+def parse_frame_range(spec, frame_count):
+    """
+    Sélection de frames -> liste d'indices (bornes incluses).
+    Exemples: "0-9", "5", "0-29:2", "0-4,10,20-22", "" ou None = toutes.
+    """
+    if not spec:
+        return list(range(frame_count))
+
+    frames = []
+    for part in spec.split(','):
+        part = part.strip()
+        step = 1
+        if ':' in part:
+            part, step_text = part.split(':')
+            step = int(step_text)
+        if '-' in part:
+            start_text, end_text = part.split('-')
+            start = int(start_text) if start_text else 0
+            end = int(end_text) if end_text else frame_count - 1
+        else:
+            start = end = int(part)
+        if start < 0 or end >= frame_count or start > end or step < 1:
+            raise ValueError(f"Frames invalides '{part}' (animation de {frame_count} frames)")
+        frames.extend(range(start, end + 1, step))
+
+    # Sans doublons, dans l'ordre
+    return sorted(set(frames))
+
+
+# Scènes animées déjà chargées dans ce processus, par chemin
+_animations = {}
+
+
+def _animation(path):
+    animation = _animations.get(path)
+    if animation is None:
+        animation = _animations[path] = load_animation(path)
+    return animation
+
+
+def _load_frame(source):
+    """source: fichier de scène, ou (fichier animé, frame)."""
+    if isinstance(source, tuple):
+        path, frame = source
+        return _animation(path).scene_at(frame)
+    return load_scene(source)
+
+
+def _write_frame(output_file, framebuffer):
+    if output_file.endswith('.png'):
+        write_png(output_file, framebuffer)
+    else:
+        write_ppm(output_file, framebuffer)
+
+
+def _make_renderer(scene, options, **overrides):
+    settings = dict(max_depth=options['max_depth'],
+                    samples_per_pixel=options['samples_per_pixel'],
+                    backend=options['backend'], seed=options['seed'],
+                    ray_table=options['ray_table'], ray_table_size=options['ray_table_size'])
+    settings.update(overrides)
+    return Renderer(scene, options['width'], options['height'], **settings)
+
+
+def _cache_suffix(output_file):
+    return os.path.splitext(output_file)[1][1:]
+
+
+def _cached_frame(cache, key, output_file, need_framebuffer):
+    """
+    (framebuffer, True) si la frame est dans le cache (et recopiée vers
+    output_file s'il y en a un), sinon (None, False). Le framebuffer n'est
+    relu que s'il sert encore (frame suivante incrémentale, animation).
+    """
+    if key is None:
+        return None, False
+    framebuffer = None
+    if need_framebuffer:
+        framebuffer = cache.get_framebuffer(key)
+        if framebuffer is None:
+            return None, False
+    if output_file is not None and not cache.get_file(key, _cache_suffix(output_file), output_file):
+        return None, False
+    return framebuffer, True
+
+
+def _store_frame(cache, key, output_file, framebuffer, need_framebuffer):
+    if key is None:
+        return
+    if output_file is not None:
+        cache.put_file(key, _cache_suffix(output_file), output_file)
+    if need_framebuffer:
+        cache.put_framebuffer(key, framebuffer)
+
+
+def _render_frame(job):
+    index, source, output_file, options = job
+    start = time.perf_counter()
+    cache = options['cache']
+    need_framebuffer = options['return_framebuffer']
+
+    # Le rendu d'une frame n'affiche rien : seul le pilote rend compte
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        scene = _load_frame(source)
+        renderer = _make_renderer(scene, options)
+        key = render_key(renderer) if cache is not None else None
+        # Image déjà rendue (et encodée) : simple copie
+        framebuffer, hit = _cached_frame(cache, key, output_file, need_framebuffer)
+        if not hit:
+            framebuffer = renderer.render()
+            if output_file is not None:
+                _write_frame(output_file, framebuffer)
+            _store_frame(cache, key, output_file, framebuffer, need_framebuffer)
+
+    # Le framebuffer n'est renvoyé au pilote que s'il l'encode (animation)
+    framebuffer = framebuffer if need_framebuffer else None
+    return index, output_file, time.perf_counter() - start, hit, framebuffer
+
+
+class AnimationDriver:
+    """
+    Pilote de rendu d'animation :
+
+        driver = AnimationDriver(width=640, height=360, jobs=4)
+        driver.render(sorted(glob.glob("scenes/animation/frame_*.txt")), frames="0-9")
+        driver.render("scenes/rotation.txt")  # fichier de scène animé
+
+    Avec output_dir=None, aucune frame n'est écrite sur le disque : les
+    framebuffers vont seulement au writer d'animation (voir animation_writer.py) :
+
+        driver = AnimationDriver(output_dir=None)
+        with open_animation_writer("output/rotation.gif", 640, 360) as writer:
+            driver.render("scenes/rotation.txt", writer=writer)
+    """
+
+    def __init__(self, width=640, height=360, jobs=1, output_dir="output/animation",
+                 output_format='png', samples_per_pixel=4, max_depth=3, seed=None,
+                 backend='python', incremental=False, coordinator=None, cache=None,
+                 ray_table=None, ray_table_size=None):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Format inconnu '{output_format}' (choix: {', '.join(OUTPUT_FORMATS)})")
+
+        self.width = width
+        self.height = height
+        self.jobs = jobs
+        self.output_dir = output_dir
+        self.output_format = output_format
+        self.samples_per_pixel = samples_per_pixel
+        self.max_depth = max_depth
+        self.seed = seed
+        self.backend = backend
+        # Mode incrémental : frames rendues dans l'ordre, seules les tuiles
+        # touchées par les objets qui bougent sont retracées (voir temporal.py)
+        self.incremental = incremental
+        # Rendu distribué : frames rendues l'une après l'autre, tuiles
+        # envoyées aux workers du coordinateur (voir distributed.py)
+        self.coordinator = coordinator
+        # Cache de rendu (RenderCache) : les frames déjà rendues sont recopiées
+        self.cache = cache
+        # Table des rayons primaires (voir ray_table.py), commune aux frames
+        # de même caméra : True (en mémoire) ou dossier (mmap)
+        self.ray_table = ray_table
+        self.ray_table_size = ray_table_size
+
+    def output_path(self, index):
+        if self.output_dir is None:
+            return None
+        return os.path.join(self.output_dir, f"frame_{index:03d}.{self.output_format}")
+
+    def _options(self):
+        return {
+            'width': self.width,
+            'height': self.height,
+            'max_depth': self.max_depth,
+            'samples_per_pixel': self.samples_per_pixel,
+            'backend': self.backend,
+            'seed': self.seed,
+            'cache': self.cache,
+            'ray_table': self.ray_table,
+            'ray_table_size': self.ray_table_size,
+            'return_framebuffer': False,
+        }
+
+    def render(self, scene_files, frames=None, writer=None):
+        """
+        Rend les frames demandées (indices dans scene_files, ou chaîne
+        comme "0-9") et renvoie la liste des fichiers écrits, dans l'ordre.
+        scene_files peut aussi être le chemin d'un fichier de scène animé.
+        Avec un writer (ex. GIFStreamWriter), chaque framebuffer lui est
+        envoyé dans l'ordre des frames via writer.add_frame(framebuffer).
+        """
+        if isinstance(scene_files, str):
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                frame_count = _animation(scene_files).frame_count
+            scene_files = [(scene_files, frame) for frame in range(frame_count)]
+        if isinstance(frames, str) or frames is None:
+            frames = parse_frame_range(frames, len(scene_files))
+
+        if self.output_dir is not None:
+            os.makedirs(self.output_dir, exist_ok=True)
+        options = self._options()
+        options['return_framebuffer'] = writer is not None
+        if self.ray_table and options['seed'] is None:
+            # Une graine par frame donnerait une table de rayons par frame
+            options['seed'] = random_seed()
+        jobs = [(index, scene_files[index], self.output_path(index), options) for index in frames]
+
+        print(f"Rendu de {len(jobs)} frames {self.width}x{self.height} "
+              f"avec {self.jobs} processus...")
+        start = time.perf_counter()
+        outputs = {}
+
+        if self.incremental or self.coordinator is not None:
+            outputs = self._render_sequential(jobs, writer)
+        elif self.jobs > 1:
+            with Pool(processes=self.jobs) as pool:
+                # L'animation reçoit les frames dans l'ordre (imap), sinon dès qu'elles sont prêtes
+                results = pool.imap(_render_frame, jobs) if writer is not None else \
+                    pool.imap_unordered(_render_frame, jobs)
+                for done, (index, output_file, elapsed, hit, framebuffer) in enumerate(results, 1):
+                    outputs[index] = output_file
+                    if writer is not None:
+                        writer.add_frame(framebuffer)
+                    self._report_frame(index, elapsed, hit, done, len(jobs))
+        else:
+            for done, job in enumerate(jobs, 1):
+                index, output_file, elapsed, hit, framebuffer = _render_frame(job)
+                outputs[index] = output_file
+                if writer is not None:
+                    writer.add_frame(framebuffer)
+                self._report_frame(index, elapsed, hit, done, len(jobs))
+
+        print(f"Rendu terminé en {time.perf_counter() - start:.1f}s")
+        if self.cache is not None:
+            print(self.cache.report())
+        return [outputs[index] for index in frames if outputs[index] is not None]
+
+    def _report_frame(self, index, elapsed, hit, done, total, detail=''):
+        if self.cache is not None:
+            self.cache.record(hit)
+        if hit:
+            detail = ", cache"
+        print(f"  Frame {index} OK ({elapsed:.1f}s{detail}) [{done}/{total}]")
+
+    def _render_sequential(self, jobs, writer=None):
+        """
+        Rend les frames l'une après l'autre ; le parallélisme se fait alors
+        par tuiles à l'intérieur de la frame (processus locaux ou workers du
+        coordinateur). En mode incrémental, la frame précédente est réutilisée.
+        """
+        options = dict(jobs[0][3]) if jobs else {}
+        if self.incremental and options.get('seed') is None:
+            # Même graine pour toutes les frames, sinon aucun pixel n'est réutilisable
+            options['seed'] = random_seed()
+
+        outputs = {}
+        previous_scene = previous_framebuffer = None
+        for done, (index, source, output_file, _) in enumerate(jobs, 1):
+            start = time.perf_counter()
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                scene = _load_frame(source)
+                renderer = _make_renderer(scene, options, workers=self.jobs,
+                                          coordinator=self.coordinator)
+                # Le framebuffer sert à la frame suivante (incrémental) ou à l'animation
+                need_framebuffer = self.incremental or writer is not None
+                key = render_key(renderer) if self.cache is not None else None
+                framebuffer, hit = _cached_frame(self.cache, key, output_file, need_framebuffer)
+                dirty = None
+                if not hit:
+                    if self.incremental and previous_scene is not None:
+                        dirty = dirty_tiles(previous_scene, scene, renderer)
+                    if dirty is None:
+                        framebuffer = renderer.render()
+                    else:
+                        framebuffer = renderer.render(previous=previous_framebuffer, dirty_tiles=dirty)
+                    if output_file is not None:
+                        _write_frame(output_file, framebuffer)
+                    _store_frame(self.cache, key, output_file, framebuffer, need_framebuffer)
+            if writer is not None:
+                writer.add_frame(framebuffer)
+
+            total = len(renderer.tiles())
+            traced = total if dirty is None else len(dirty)
+            outputs[index] = output_file
+            self._report_frame(index, time.perf_counter() - start, hit, done, len(jobs),
+                               f", {traced}/{total} tuiles retracées")
+            previous_scene, previous_framebuffer = scene, framebuffer
+        return outputs
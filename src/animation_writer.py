@@ -0,0 +1,337 @@
+"""
+Écriture d'animations GIF et APNG au fil du rendu, sans dépendance externe.
+
+Chaque frame est ajoutée dès qu'elle est rendue (add_frame(framebuffer)) et
+écrite aussitôt : seule la frame précédente est gardée, pour n'encoder que
+le rectangle qui a changé (les sphères qui tournent sur un fond fixe ne
+touchent qu'une petite partie de l'image).
+
+GIF : 256 couleurs au plus. Toutes les frames partagent une palette
+uniforme 6x7x6 (252 couleurs) ; la conversion d'un pixel ne coûte que des
+consultations de tables précalculées, avec un tramage ordonné (matrice de
+Bayer 4x4) qui évite les aplats en bandes sur les dégradés. Compression
+LZW en Python pur.
+
+APNG : PNG animé en couleurs 24 bits (fcTL + fdAT par frame), lisible par
+les navigateurs ; un lecteur PNG classique n'affiche que la première frame.
+
+L'animation est écrite dans un fichier temporaire, renommé à la fermeture :
+un rendu qui échoue (abort) ne laisse pas de fichier tronqué mais lisible.
+
+    with open_animation_writer("output/rotation.gif", 640, 360, delay_ms=100) as writer:
+        for framebuffer in frames:
+            writer.add_frame(framebuffer)
+"""
+
+import operator
+import os
+import struct
+import zlib
+
+from png_writer import PNG_SIGNATURE, png_chunk, filter_row
+
+ANIMATION_EXTENSIONS = ('.gif', '.png', '.apng')
+
+
+# ----------------------------------------------------------------------
+# Rectangle modifié entre deux frames
+# ----------------------------------------------------------------------
+
+def _common_prefix(a, b):
+    """Longueur du plus long préfixe commun de deux bytes (recherche dichotomique)."""
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def changed_rect(previous, current, width, height, bpp):
+    """
+    Plus petit rectangle (x0, y0, x1, y1) contenant tous les pixels qui
+    diffèrent, ou None si les deux frames sont identiques.
+    """
+    stride = width * bpp
+    rows = [j for j in range(height)
+            if previous[j * stride:(j + 1) * stride] != current[j * stride:(j + 1) * stride]]
+    if not rows:
+        return None
+
+    x0, x1 = width, 0
+    for j in rows:
+        old = previous[j * stride:(j + 1) * stride]
+        new = current[j * stride:(j + 1) * stride]
+        x0 = min(x0, _common_prefix(old, new) // bpp)
+        x1 = max(x1, width - _common_prefix(old[::-1], new[::-1]) // bpp)
+    return x0, rows[0], x1, rows[-1] + 1
+
+
+def crop(data, width, rect, bpp):
+    x0, y0, x1, y1 = rect
+    stride = width * bpp
+    return b''.join(data[j * stride + x0 * bpp:j * stride + x1 * bpp] for j in range(y0, y1))
+
+
+# ----------------------------------------------------------------------
+# GIF
+# ----------------------------------------------------------------------
+
+LEVELS = (6, 7, 6)  # niveaux par canal (r, g, b) : 252 couleurs
+BAYER = ((0, 8, 2, 10), (12, 4, 14, 6), (3, 11, 1, 9), (15, 7, 13, 5))
+
+
+def _palette():
+    palette = bytearray()
+    for r in range(LEVELS[0]):
+        for g in range(LEVELS[1]):
+            for b in range(LEVELS[2]):
+                palette += bytes((round(r * 255 / (LEVELS[0] - 1)),
+                                  round(g * 255 / (LEVELS[1] - 1)),
+                                  round(b * 255 / (LEVELS[2] - 1))))
+    return bytes(palette) + bytes(3 * 256 - len(palette))  # complétée à 256 entrées
+
+
+def _dither_tables():
+    """
+    tables[y % 4][x % 4][canal] : table bytes.translate qui donne, pour une
+    valeur 0..255, le niveau tramé du canal déjà multiplié par son poids
+    dans l'indice de palette (r * 42 + g * 6 + b).
+    """
+    weights = (LEVELS[1] * LEVELS[2], LEVELS[2], 1)
+    tables = []
+    for row in BAYER:
+        phases = []
+        for threshold in row:
+            offset = (threshold + 0.5) / 16
+            phases.append(tuple(
+                bytes(min(levels - 1, int(v * (levels - 1) / 255 + offset)) * weight
+                      for v in range(256))
+                for levels, weight in zip(LEVELS, weights)))
+        tables.append(phases)
+    return tables
+
+
+# Palette et tables communes à toutes les frames (calculées une fois)
+PALETTE = _palette()
+DITHER_TABLES = _dither_tables()
+
+
+def quantize_frame(rgb, width, height):
+    """Octets RGB -> indices dans PALETTE (1 octet par pixel)."""
+    stride = width * 3
+    levels = bytearray(len(rgb))
+    for j in range(height):
+        tables = DITHER_TABLES[j % 4]
+        start = j * stride
+        row = rgb[start:start + stride]
+        # Les pixels de même phase (x % 4) sont traités d'un bloc, canal par canal
+        for phase in range(4):
+            for channel in range(3):
+                k = phase * 3 + channel
+                levels[start + k:start + stride:12] = row[k::12].translate(tables[phase][channel])
+    # Indice = r * 42 + g * 6 + b (poids déjà appliqués par les tables)
+    return bytes(map(operator.add, map(operator.add, levels[0::3], levels[1::3]), levels[2::3]))
+
+
+def lzw_encode(indices, min_code_size=8):
+    """Compression LZW des indices (données d'image GIF, avant découpage en blocs)."""
+    clear = 1 << min_code_size
+    end = clear + 1
+    out = bytearray()
+    bits = 0       # bits en attente
+    bit_count = 0
+
+    codes = {}
+    next_code = end + 1
+    code_size = min_code_size + 1
+
+    def emit(code, size):
+        nonlocal bits, bit_count
+        bits |= code << bit_count
+        bit_count += size
+        while bit_count >= 8:
+            out.append(bits & 0xff)
+            bits >>= 8
+            bit_count -= 8
+
+    emit(clear, code_size)
+    prefix = indices[0]
+    for byte in indices[1:]:
+        key = (prefix << 8) | byte
+        code = codes.get(key)
+        if code is not None:
+            prefix = code
+            continue
+        emit(prefix, code_size)
+        if next_code < 4096:
+            codes[key] = next_code
+            next_code += 1
+            # Le décodeur a une entrée de retard : il change de taille au code suivant
+            if next_code > (1 << code_size) and code_size < 12:
+                code_size += 1
+        else:
+            # Table pleine : on repart de zéro
+            emit(clear, code_size)
+            codes.clear()
+            next_code = end + 1
+            code_size = min_code_size + 1
+        prefix = byte
+    emit(prefix, code_size)
+    emit(end, code_size)
+    if bit_count:
+        out.append(bits & 0xff)
+    return bytes(out)
+
+
+def _sub_blocks(data):
+    return b''.join(bytes((len(data[k:k + 255]),)) + data[k:k + 255]
+                    for k in range(0, len(data), 255)) + b'\0'
+
+
+class _AnimationWriter:
+    """Partie commune : frame précédente, rectangle modifié, context manager."""
+
+    def __init__(self, filename, width, height, delay_ms=100, loop=0):
+        self.filename = filename
+        self.width = width
+        self.height = height
+        self.delay_ms = delay_ms
+        self.loop = loop  # 0 = en boucle
+        self.frame_count = 0
+        self.previous = None
+        self.temp = filename + '.tmp'  # (mêmes droits qu'un fichier ouvert normalement)
+        self.file = open(self.temp, 'wb')
+
+    def add_frame(self, framebuffer):
+        if (framebuffer.width, framebuffer.height) != (self.width, self.height):
+            raise ValueError(f"Frame {framebuffer.width}x{framebuffer.height} au lieu de "
+                             f"{self.width}x{self.height}")
+        self.add_rgb8(framebuffer.to_rgb8())
+
+    def _delta(self, data, bpp):
+        """Rectangle à encoder pour cette frame (la première est entière)."""
+        if self.previous is None:
+            return 0, 0, self.width, self.height
+        # Frame identique : un pixel suffit (une frame doit avoir au moins 1x1)
+        return changed_rect(self.previous, data, self.width, self.height, bpp) or (0, 0, 1, 1)
+
+    def abort(self):
+        """Rendu interrompu : supprime le fichier temporaire, filename n'est pas touché."""
+        if self.file.closed:
+            return
+        self.file.close()
+        os.remove(self.temp)
+
+    def close(self):
+        if self.file.closed:
+            return
+        try:
+            self._finish()
+        except BaseException:
+            self.abort()
+            raise
+        self.file.close()
+        os.replace(self.temp, self.filename)
+        print(f"Animation sauvegardée: {self.filename} ({self.frame_count} frames)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+            return False
+        self.close()
+        return False
+
+
+class GIFStreamWriter(_AnimationWriter):
+
+    def __init__(self, filename, width, height, delay_ms=100, loop=0):
+        super().__init__(filename, width, height, delay_ms, loop)
+        # En-tête, écran logique avec palette globale (256 couleurs), boucle NETSCAPE2.0
+        self.file.write(b'GIF89a' + struct.pack('<HHBBB', width, height, 0xF7, 0, 0) + PALETTE)
+        self.file.write(b'\x21\xff\x0bNETSCAPE2.0\x03\x01' + struct.pack('<H', loop) + b'\0')
+
+    def add_rgb8(self, rgb):
+        indices = quantize_frame(rgb, self.width, self.height)
+        x0, y0, x1, y1 = rect = self._delta(indices, 1)
+        self.previous = indices
+
+        # Contrôle graphique : délai en centièmes, disposition 1 (la frame reste affichée)
+        delay = max(1, round(self.delay_ms / 10))
+        self.file.write(b'\x21\xf9\x04' + struct.pack('<BHBB', 1 << 2, delay, 0, 0))
+        self.file.write(b'\x2c' + struct.pack('<HHHHB', x0, y0, x1 - x0, y1 - y0, 0))
+        self.file.write(b'\x08' + _sub_blocks(lzw_encode(crop(indices, self.width, rect, 1))))
+        self.frame_count += 1
+
+    def _finish(self):
+        self.file.write(b'\x3b')
+
+
+# ----------------------------------------------------------------------
+# APNG
+# ----------------------------------------------------------------------
+
+class APNGStreamWriter(_AnimationWriter):
+
+    def __init__(self, filename, width, height, delay_ms=100, loop=0, level=6, frame_count=0):
+        super().__init__(filename, width, height, delay_ms, loop)
+        self.level = level
+        self.sequence = 0
+        self.file.write(PNG_SIGNATURE)
+        self.file.write(png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+        # Nombre de frames : corrigé à la fermeture s'il n'était pas connu
+        self.expected_frames = frame_count
+        self.actl_offset = self.file.tell()
+        self.file.write(self._actl(frame_count))
+
+    def _actl(self, count):
+        return png_chunk(b'acTL', struct.pack('>II', count, self.loop))
+
+    def _next_sequence(self):
+        self.sequence += 1
+        return self.sequence - 1
+
+    def add_rgb8(self, rgb):
+        x0, y0, x1, y1 = rect = self._delta(rgb, 3)
+        self.previous = rgb
+
+        # Lignes du rectangle, filtrées (filtre "sub") puis compressées
+        stride = (x1 - x0) * 3
+        pixels = crop(rgb, self.width, rect, 3)
+        raw = bytearray()
+        for dy in range(y1 - y0):
+            raw.append(1)
+            raw += filter_row(1, pixels[dy * stride:(dy + 1) * stride], bytes(stride))
+        data = zlib.compress(bytes(raw), self.level)
+
+        # fcTL : rectangle, délai (ms), dispose_op 0 (garder), blend_op 0 (remplacer)
+        self.file.write(png_chunk(b'fcTL', struct.pack(
+            '>IIIIIHHBB', self._next_sequence(), x1 - x0, y1 - y0, x0, y0,
+            self.delay_ms, 1000, 0, 0)))
+        if self.frame_count == 0:
+            self.file.write(png_chunk(b'IDAT', data))  # image par défaut
+        else:
+            self.file.write(png_chunk(b'fdAT', struct.pack('>I', self._next_sequence()) + data))
+        self.frame_count += 1
+
+    def _finish(self):
+        self.file.write(png_chunk(b'IEND', b''))
+        if self.frame_count != self.expected_frames:
+            self.file.seek(self.actl_offset)
+            self.file.write(self._actl(self.frame_count))
+
+
+def open_animation_writer(filename, width, height, delay_ms=100, loop=0, frame_count=0):
+    """GIF ou APNG (".png" / ".apng") selon l'extension."""
+    lower = filename.lower()
+    if lower.endswith('.gif'):
+        return GIFStreamWriter(filename, width, height, delay_ms, loop)
+    if lower.endswith(('.png', '.apng')):
+        return APNGStreamWriter(filename, width, height, delay_ms, loop, frame_count=frame_count)
+    raise ValueError(f"Format d'animation inconnu '{filename}' "
+                     f"(extensions: {', '.join(ANIMATION_EXTENSIONS)})")
@@ -0,0 +1,288 @@
+"""
+Hiérarchie de volumes englobants (BVH) sur les objets de la scène.
+
+Les objets bornés (ceux dont bounding_box() renvoie une boîte, comme les
+sphères) sont rangés dans un arbre de boîtes alignées sur les axes (AABB),
+construit une fois avec l'heuristique SAH par classes (binned SAH). Les
+objets non bornés (plans) sont gardés à part et testés pour chaque rayon.
+
+Une boîte est un tuple (min_x, min_y, min_z, max_x, max_y, max_z).
+
+Le même arbre sert aussi à l'intérieur d'un maillage (TriangleMesh) : les
+"objets" sont alors des numéros de triangles, avec leurs boîtes fournies à
+part (paramètre boxes), et candidates() donne les triangles à tester.
+"""
+
+import time
+
+INF = float('inf')
+
+SAH_BINS = 16         # nombre de classes pour l'évaluation SAH
+MAX_LEAF_SIZE = 4     # taille maximale d'une feuille forcée
+TRAVERSAL_COST = 1.0  # coût relatif d'un test de boîte / d'un test d'objet
+
+
+def _union(a, b):
+    return (min(a[0], b[0]), min(a[1], b[1]), min(a[2], b[2]),
+            max(a[3], b[3]), max(a[4], b[4]), max(a[5], b[5]))
+
+
+def _bounds(boxes):
+    """Boîte englobant une liste (non vide) de boîtes."""
+    x0, y0, z0, x1, y1, z1 = zip(*boxes)
+    return (min(x0), min(y0), min(z0), max(x1), max(y1), max(z1))
+
+
+def _surface_area(box):
+    dx = box[3] - box[0]
+    dy = box[4] - box[1]
+    dz = box[5] - box[2]
+    return 2.0 * (dx * dy + dy * dz + dz * dx)
+
+
+def _inverse(d):
+    # Évite la division par zéro (un rayon parallèle à un axe)
+    return 1.0 / d if d != 0.0 else 1e30
+
+
+class BVH:
+
+    def __init__(self, objects, leaf_size=MAX_LEAF_SIZE, bins=SAH_BINS, boxes=None):
+        start = time.perf_counter()
+
+        self.leaf_size = leaf_size
+        self.bins = bins
+        self.unbounded = []  # plans et autres objets infinis
+
+        if boxes is None:
+            boxes = [obj.bounding_box() if hasattr(obj, 'bounding_box') else None
+                     for obj in objects]
+
+        items = []
+        for obj, box in zip(objects, boxes):
+            if box is None:
+                self.unbounded.append(obj)
+            else:
+                centroid = ((box[0] + box[3]) * 0.5,
+                            (box[1] + box[4]) * 0.5,
+                            (box[2] + box[5]) * 0.5)
+                items.append((box, centroid, obj))
+
+        # Noeuds stockés à plat : pour une feuille, count > 0 et first indique
+        # le premier objet dans self.objects ; pour un noeud interne,
+        # l'enfant gauche suit directement le parent et right donne le droit.
+        self.node_bounds = []
+        self.node_right = []
+        self.node_first = []
+        self.node_count = []
+        self.objects = []
+        self.depth = 0
+
+        if items:
+            self._build(items, 1)
+
+        self.build_time = time.perf_counter() - start
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+
+    def _new_node(self, box):
+        self.node_bounds.append(box)
+        self.node_right.append(-1)
+        self.node_first.append(0)
+        self.node_count.append(0)
+        return len(self.node_bounds) - 1
+
+    def _make_leaf(self, node, items):
+        self.node_first[node] = len(self.objects)
+        self.node_count[node] = len(items)
+        self.objects.extend(obj for _, _, obj in items)
+
+    def _build(self, items, depth):
+        self.depth = max(self.depth, depth)
+
+        box = _bounds([item[0] for item in items])
+        cx, cy, cz = zip(*[item[1] for item in items])
+        cbox = (min(cx), min(cy), min(cz), max(cx), max(cy), max(cz))
+
+        node = self._new_node(box)
+        if len(items) <= 1:
+            self._make_leaf(node, items)
+            return node
+
+        split = self._find_split(items, box, cbox)
+        if split is None:
+            if len(items) <= self.leaf_size:
+                self._make_leaf(node, items)
+                return node
+            # SAH préfère une feuille mais elle serait trop grosse : médiane
+            axis = max(range(3), key=lambda k: cbox[k + 3] - cbox[k])
+            items.sort(key=lambda item: item[1][axis])
+            mid = len(items) // 2
+            left, right = items[:mid], items[mid:]
+        else:
+            left, right = split
+
+        self._build(left, depth + 1)
+        self.node_right[node] = self._build(right, depth + 1)
+        return node
+
+    def _find_split(self, items, box, cbox):
+        """Meilleure coupe SAH par classes, ou None si une feuille est moins chère."""
+        axis = max(range(3), key=lambda k: cbox[k + 3] - cbox[k])
+        lo, hi = cbox[axis], cbox[axis + 3]
+        if hi - lo <= 0.0:
+            return None  # centres confondus : impossible à séparer
+
+        # Avec peu d'objets, plus de classes que d'objets ne sert à rien
+        bins = min(self.bins, 2 * len(items))
+        scale = bins / (hi - lo)
+        item_bin = [min(bins - 1, int((item[1][axis] - lo) * scale)) for item in items]
+        bin_boxes = [[] for _ in range(bins)]
+        for item, b in zip(items, item_bin):
+            bin_boxes[b].append(item[0])
+        counts = [len(boxes) for boxes in bin_boxes]
+        bounds = [_bounds(boxes) if boxes else None for boxes in bin_boxes]
+
+        # Balayage gauche -> droite puis droite -> gauche des aires cumulées
+        left_area = [0.0] * bins
+        left_count = [0] * bins
+        acc_box, acc_count = None, 0
+        for b in range(bins - 1):
+            if bounds[b] is not None:
+                acc_box = bounds[b] if acc_box is None else _union(acc_box, bounds[b])
+            acc_count += counts[b]
+            left_area[b] = _surface_area(acc_box) if acc_box is not None else 0.0
+            left_count[b] = acc_count
+
+        best_cost, best_bin = INF, -1
+        acc_box, acc_count = None, 0
+        for b in range(bins - 1, 0, -1):
+            if bounds[b] is not None:
+                acc_box = bounds[b] if acc_box is None else _union(acc_box, bounds[b])
+            acc_count += counts[b]
+            if acc_count == 0 or left_count[b - 1] == 0:
+                continue
+            cost = left_area[b - 1] * left_count[b - 1] + _surface_area(acc_box) * acc_count
+            if cost < best_cost:
+                best_cost, best_bin = cost, b
+
+        area = _surface_area(box)
+        leaf_cost = len(items) * area
+        if best_bin < 0:
+            return None
+        if area > 0 and TRAVERSAL_COST * area + best_cost >= leaf_cost and len(items) <= self.leaf_size:
+            return None
+
+        left = [item for item, b in zip(items, item_bin) if b < best_bin]
+        right = [item for item, b in zip(items, item_bin) if b >= best_bin]
+        return left, right
+
+    # ------------------------------------------------------------------
+    # Requêtes
+    # ------------------------------------------------------------------
+
+    def candidates(self, ray, max_t):
+        """
+        Objets bornés dont la boîte est traversée par le rayon avant max_t[0]
+        (liste d'un élément, que l'appelant peut réduire pendant le parcours).
+        """
+        if not self.node_bounds:
+            return
+
+        o, d = ray.origin, ray.direction
+        ox, oy, oz = o.x, o.y, o.z
+        ix, iy, iz = _inverse(d.x), _inverse(d.y), _inverse(d.z)
+
+        bounds = self.node_bounds
+        right = self.node_right
+        first = self.node_first
+        count = self.node_count
+        objects = self.objects
+
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            b = bounds[node]
+
+            # Test des trois dalles (slab test)
+            t0 = (b[0] - ox) * ix
+            t1 = (b[3] - ox) * ix
+            tmin, tmax = (t0, t1) if t0 < t1 else (t1, t0)
+            t0 = (b[1] - oy) * iy
+            t1 = (b[4] - oy) * iy
+            if t0 > t1:
+                t0, t1 = t1, t0
+            if t0 > tmin:
+                tmin = t0
+            if t1 < tmax:
+                tmax = t1
+            t0 = (b[2] - oz) * iz
+            t1 = (b[5] - oz) * iz
+            if t0 > t1:
+                t0, t1 = t1, t0
+            if t0 > tmin:
+                tmin = t0
+            if t1 < tmax:
+                tmax = t1
+            if tmax < tmin or tmax < 0.0 or tmin > max_t[0]:
+                continue
+
+            n = count[node]
+            if n:
+                start = first[node]
+                for k in range(start, start + n):
+                    yield objects[k]
+            else:
+                stack.append(right[node])
+                stack.append(node + 1)
+
+    def closest_hit(self, ray):
+        """Objet le plus proche touché : (t, objet, normale) ou (inf, None, None)."""
+        closest_t = INF
+        closest_object = None
+
+        # Distances seulement : la normale n'est calculée que pour le gagnant
+        for obj in self.unbounded:
+            t = obj.hit_distance(ray)
+            if t is not None and t < closest_t:
+                closest_t, closest_object = t, obj
+
+        # max_t est partagé avec le parcours pour élaguer les noeuds plus lointains
+        max_t = [closest_t]
+        for obj in self.candidates(ray, max_t):
+            t = obj.hit_distance(ray)
+            if t is not None and t < max_t[0]:
+                max_t[0] = t
+                closest_object = obj
+
+        if closest_object is None:
+            return INF, None, None
+        return max_t[0], closest_object, closest_object.normal_at(ray, max_t[0])
+
+    def any_hit(self, ray, max_distance):
+        """
+        Premier objet trouvé qui coupe le rayon avant max_distance (ombres),
+        ou None. S'arrête au premier bloqueur, sans calculer de normale.
+        """
+        for obj in self.unbounded:
+            if obj.occludes(ray, max_distance):
+                return obj
+
+        for obj in self.candidates(ray, [max_distance]):
+            if obj.occludes(ray, max_distance):
+                return obj
+        return None
+
+    def stats(self):
+        leaves = [n for n in self.node_count if n > 0]
+        return {
+            'nodes': len(self.node_bounds),
+            'leaves': len(leaves),
+            'depth': self.depth,
+            'max_leaf_size': max(leaves) if leaves else 0,
+            'bounded_objects': len(self.objects),
+            'unbounded_objects': len(self.unbounded),
+            'build_time': self.build_time,
+        }
@@ -0,0 +1,145 @@
+"""
+Points de reprise des longs rendus.
+
+Pendant le rendu, chaque tuile terminée est ajoutée à un fichier voisin de
+l'image ("render.ppm.ckpt") ; le fichier est vidé vers le système à chaque
+tuile et forcé sur le disque (fsync) au plus toutes les SYNC_INTERVAL
+secondes, et à la fermeture. Si le processus est
+interrompu, "main.py --resume" relit ce fichier : les tuiles déjà rendues
+sont recopiées et seules les autres sont tracées. Le rendu de chaque pixel
+ne dépend que de la graine et de sa position, l'image finale est donc
+identique à celle d'un rendu sans interruption.
+
+Format : un en-tête (signature, graine, empreinte de la scène et des
+paramètres du rendu) puis une suite d'enregistrements (x0, y0, x1, y1,
+pixels en float). Un enregistrement incomplet (arrêt pendant l'écriture)
+est ignoré. Si l'empreinte ne correspond plus (scène ou paramètres
+modifiés), le fichier est ignoré et le rendu repart de zéro.
+"""
+
+import hashlib
+import os
+import struct
+import time
+from array import array
+
+from render_cache import render_key
+from sampling import MASK64
+
+CHECKPOINT_SUFFIX = '.ckpt'
+MAGIC = b'RTCKPT\0\0'
+VERSION = 1
+
+HEADER = struct.Struct('<8sHxxxxxxQ32s')  # signature, version, graine (64 bits), empreinte
+RECORD = struct.Struct('<IIII')           # tuile (x0, y0, x1, y1)
+
+# Délai maximal entre deux fsync (un arrêt du système peut perdre ces tuiles-là)
+SYNC_INTERVAL = 5.0
+
+
+def checkpoint_path(output_file):
+    return output_file + CHECKPOINT_SUFFIX
+
+
+def checkpoint_key(renderer):
+    """Empreinte de la scène et des paramètres (dont la taille des tuiles), ou None."""
+    key = render_key(renderer)
+    if key is None:
+        return None
+    return hashlib.sha256(f"{key}:{renderer.tile_size}".encode()).digest()
+
+
+def read_seed(path):
+    """Graine du rendu enregistré dans path, ou None (pas de fichier valide)."""
+    try:
+        with open(path, 'rb') as f:
+            magic, version, seed, _ = HEADER.unpack(f.read(HEADER.size))
+    except (OSError, struct.error):
+        return None
+    if magic != MAGIC or version != VERSION:
+        return None
+    return seed
+
+
+class Checkpoint:
+    """
+    Tuiles terminées d'un rendu, lues depuis (resume=True) et ajoutées à path.
+
+        checkpoint = Checkpoint("out.ppm.ckpt", renderer, resume=True)
+        renderer.checkpoint = checkpoint
+        renderer.render(writer)
+        checkpoint.remove()
+    """
+
+    def __init__(self, path, renderer, resume=False):
+        self.path = path
+        self.key = checkpoint_key(renderer)
+        if self.key is None:
+            raise ValueError("Scène non prise en charge par les points de reprise")
+        self.blocks = self._load(renderer) if resume else {}
+
+        # Réécrit le fichier avec les tuiles valides (supprime une fin tronquée)
+        self.file = open(path, 'wb')
+        # Graine ramenée à 64 bits comme dans sampling.seed_key (même image)
+        self.file.write(HEADER.pack(MAGIC, VERSION, renderer.seed & MASK64, self.key))
+        for tile, block in self.blocks.items():
+            self.file.write(RECORD.pack(*tile) + block.tobytes())
+        self._sync()
+
+    def _load(self, renderer):
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return {}
+
+        try:
+            magic, version, seed, key = HEADER.unpack_from(data)
+        except struct.error:
+            magic = None
+        if (magic != MAGIC or version != VERSION or seed != renderer.seed & MASK64
+                or key != self.key):
+            print(f"Point de reprise {self.path} ignoré (scène ou paramètres différents)")
+            return {}
+
+        blocks = {}
+        offset = HEADER.size
+        while offset + RECORD.size <= len(data):
+            x0, y0, x1, y1 = RECORD.unpack_from(data, offset)
+            size = (x1 - x0) * (y1 - y0) * 3 * 4
+            start = offset + RECORD.size
+            if x1 > renderer.width or y1 > renderer.height or start + size > len(data):
+                break  # enregistrement incomplet
+            block = array('f')
+            block.frombytes(data[start:start + size])
+            blocks[(x0, y0, x1, y1)] = block
+            offset = start + size
+        return blocks
+
+    def _sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.synced = time.monotonic()
+
+    def add(self, tile, block):
+        """
+        Enregistre une tuile terminée : confiée au système tout de suite
+        (survit à l'arrêt du processus), sur le disque au prochain fsync.
+        """
+        self.file.write(RECORD.pack(*tile) + block.tobytes())
+        if time.monotonic() - self.synced >= SYNC_INTERVAL:
+            self._sync()
+        else:
+            self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self._sync()
+            self.file.close()
+
+    def remove(self):
+        """Rendu terminé : le point de reprise ne sert plus (pas de fsync)."""
+        if not self.file.closed:
+            self.file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,127 @@
+"""
+Scène "compilée" pour la boucle de rendu Python.
+
+Construite une fois par rendu (Renderer.compiled_scene()), elle remplace les
+accès aux objets de la scène par des tuples de floats :
+- les lumières triées par type (ponctuelles, directionnelles), avec leur
+  indice dans scene.lights (clé du cache d'occultation) ; la lumière
+  ambiante est résolue une fois pour toutes ;
+- pour chaque matériau, le terme ambiant et les couleurs matériau x lumière
+  déjà multipliées par les coefficients diffus / spéculaire et l'intensité ;
+- la base de la caméra (coin inférieur gauche, horizontale, verticale).
+
+compute_lighting ne fait donc plus ni hasattr() ni accès aux Vec3 des
+lumières pour chaque point éclairé.
+"""
+
+import math
+
+from math_utils import Vec3
+from geometry import Ray
+
+
+class ShadingMaterial:
+    """
+    Constantes d'un matériau pour les lumières de la scène : terme ambiant,
+    puis pour chaque lumière (dans l'ordre de CompiledScene.point_lights /
+    directional_lights) les couleurs diffuse et spéculaire déjà multipliées
+    par les coefficients du matériau et l'intensité de la lumière :
+
+        diffuse  = couleur matériau x couleur lumière x diffuse x intensité
+        spéculaire = couleur lumière x specular x intensité
+    """
+
+    __slots__ = ('ambient', 'point_terms', 'directional_terms', 'shininess', 'reflectivity')
+
+    def __init__(self, material, compiled):
+        color = material.color
+        cr, cg, cb = color.x, color.y, color.z
+        ka = material.ambient
+
+        ambient = compiled.ambient_light
+        if ambient is None:
+            self.ambient = (cr * ka, cg * ka, cb * ka)
+        else:
+            # Lumière ambiante globale : remplace l'ambient par défaut
+            lr, lg, lb, intensity = ambient
+            k = ka * intensity
+            self.ambient = (cr * lr * k, cg * lg * k, cb * lb * k)
+
+        def terms(lights):
+            result = []
+            for light in lights:
+                lr, lg, lb = light.color.x, light.color.y, light.color.z
+                kd = material.diffuse * light.intensity
+                ks = material.specular * light.intensity
+                result.append((cr * lr * kd, cg * lg * kd, cb * lb * kd, lr * ks, lg * ks, lb * ks))
+            return tuple(result)
+
+        self.point_terms = terms(compiled.point_sources)
+        self.directional_terms = terms(compiled.directional_sources)
+        self.shininess = material.shininess
+        self.reflectivity = material.reflectivity
+
+
+class CompiledScene:
+    """
+    Données précalculées d'une scène :
+
+        compiled = CompiledScene(scene)
+        ray = compiled.camera_ray(u, v)
+        shading = compiled.material(obj.material)
+    """
+
+    def __init__(self, scene):
+        self.scene = scene
+        self.background_color = scene.background_color
+
+        # Lumières triées par type une fois pour toutes
+        self.point_sources = []
+        self.directional_sources = []
+        self.ambient_light = None  # (r, g, b, intensité) de la dernière lumière ambiante
+        point_lights = []
+        directional_lights = []
+        for index, light in enumerate(scene.lights):
+            if getattr(light, 'is_ambient', False):
+                lc = light.color
+                self.ambient_light = (lc.x, lc.y, lc.z, light.intensity)
+            elif getattr(light, 'is_directional', False):
+                # Direction vers la lumière (inversée car elle pointe vers la scène)
+                d = light.direction
+                self.directional_sources.append(light)
+                directional_lights.append((index, -d.x, -d.y, -d.z))
+            else:
+                p = light.position
+                self.point_sources.append(light)
+                point_lights.append((index, p.x, p.y, p.z))
+        # (indice dans scene.lights, x, y, z) : l'indice sert de clé au cache d'occultation
+        self.point_lights = tuple(point_lights)
+        self.directional_lights = tuple(directional_lights)
+
+        # Matériaux des objets de la scène (les autres sont ajoutés à la demande)
+        self.materials = {}
+        for obj in scene.objects:
+            self.material(obj.material)
+
+        camera = scene.camera
+        self.camera = camera
+        if camera is not None:
+            llc, h, v, pos = camera.lower_left_corner, camera.horizontal, camera.vertical, camera.position
+            self.camera_origin = pos
+            self.camera_basis = (llc.x - pos.x, llc.y - pos.y, llc.z - pos.z,
+                                 h.x, h.y, h.z, v.x, v.y, v.z)
+
+    def material(self, material):
+        shading = self.materials.get(material)
+        if shading is None:
+            shading = self.materials[material] = ShadingMaterial(material, self)
+        return shading
+
+    def camera_ray(self, u, v):
+        """Rayon primaire, comme Camera.get_ray, à partir de la base mise en cache."""
+        ox, oy, oz, hx, hy, hz, vx, vy, vz = self.camera_basis
+        dx = ox + hx * u + vx * v
+        dy = oy + hy * u + vy * v
+        dz = oz + hz * u + vz * v
+        length = math.sqrt(dx * dx + dy * dy + dz * dz)
+        return Ray(self.camera_origin, Vec3(dx / length, dy / length, dz / length), normalize=False)
@@ -0,0 +1,263 @@
+"""
+Rendu distribué par tuiles sur plusieurs machines.
+
+Le coordinateur (ce module) écoute sur une adresse TCP ; les workers
+(src/worker.py) s'y connectent et demandent des tuiles au fur et à mesure :
+
+    # machine principale (clé partagée dans RAYTRACER_AUTHKEY, sinon tirée au hasard et affichée)
+    RAYTRACER_AUTHKEY=... python src/main.py scenes/simple.txt output/render.ppm 3840 2160 --serve 0.0.0.0:5050
+    # chaque machine de calcul (ou plusieurs processus sur la même machine)
+    RAYTRACER_AUTHKEY=... python src/worker.py --connect hote:5050 --processes 4
+
+Échanges (multiprocessing.connection : messages picklés, authentifiés par
+une clé partagée, sur une connexion TCP) :
+
+    worker -> ('ready',)                          prêt à calculer
+    coord  -> ('tile', empreinte, tuile)          tuile à rendre
+    worker -> ('need_scene', empreinte)           scène inconnue du worker
+    coord  -> ('scene', empreinte, renderer)      renderer picklé (envoyé une fois)
+    worker -> ('result', tuile, pixels, compteurs, stats)
+    worker -> ('error', tuile, message)
+    coord  -> ('stop',)                           fin de session
+
+Chaque worker garde les scènes reçues par empreinte (sha256 du renderer
+picklé) : une scène n'est transmise qu'une fois par worker. Une tuile dont
+le worker se déconnecte, ne répond plus depuis TILE_TIMEOUT secondes (la
+connexion est alors fermée) ou échoue est remise dans la file et rendue par
+un autre worker ; après MAX_ATTEMPTS échecs, le rendu est abandonné. Si
+aucune tuile n'arrive pendant IDLE_TIMEOUT secondes (aucun worker connecté,
+ou tous bloqués), les tuiles restantes sont rendues localement.
+
+Les messages sont des pickles : qui connaît la clé peut exécuter du code
+de l'autre côté. Il n'y a donc pas de clé par défaut ; le coordinateur
+n'écoute que sur 127.0.0.1 si aucun hôte n'est donné, et le port ne doit
+pas être ouvert hors d'un réseau de confiance.
+"""
+
+import hashlib
+import os
+import pickle
+import queue
+import secrets
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener
+
+from parallel import render_tile_job
+
+DEFAULT_PORT = 5050
+AUTHKEY_VARIABLE = 'RAYTRACER_AUTHKEY'
+MAX_ATTEMPTS = 3
+# Délais (s) : sans aucune tuile reçue avant le rendu local des tuiles
+# restantes, et sans réponse d'un worker avant de lui reprendre sa tuile
+IDLE_TIMEOUT = 120.0
+TILE_TIMEOUT = 600.0
+
+
+def default_authkey():
+    """Clé partagée de la variable d'environnement RAYTRACER_AUTHKEY, ou None."""
+    key = os.environ.get(AUTHKEY_VARIABLE)
+    return key.encode() if key else None
+
+
+def parse_address(text, default_host='127.0.0.1'):
+    """"hote:port", ":port" ou "port" -> (hote, port)."""
+    host, _, port = text.rpartition(':')
+    try:
+        return host or default_host, int(port)
+    except ValueError:
+        raise ValueError(f"Adresse invalide '{text}' (attendu hote:port)") from None
+
+
+class RenderJob:
+    """Une image en cours de rendu distribué : scène, tuiles restantes et résultats."""
+
+    def __init__(self, renderer, tiles):
+        # Le renderer est envoyé tel quel aux workers, sans coordinateur
+        self.payload = pickle.dumps(renderer, protocol=pickle.HIGHEST_PROTOCOL)
+        self.fingerprint = hashlib.sha256(self.payload).hexdigest()
+        self.tiles = set(tiles)
+        self.done = set()
+        self.attempts = {}
+        self.results = queue.Queue()
+        self.finished = False
+
+
+class Coordinator:
+    """
+    Distribue les tuiles aux workers connectés et rassemble les résultats.
+
+        coordinator = Coordinator(('127.0.0.1', 5050))
+        coordinator.start()
+        Renderer(scene, ..., coordinator=coordinator).render()
+        coordinator.close()
+    """
+
+    def __init__(self, address, authkey=None, timeout=IDLE_TIMEOUT, tile_timeout=TILE_TIMEOUT):
+        self.address = address
+        # Sans clé fournie : clé aléatoire, affichée au démarrage pour les workers
+        self.generated_key = not (authkey or default_authkey())
+        self.authkey = authkey or default_authkey() or secrets.token_hex(16).encode()
+        # Délai maximal (s) sans aucune tuile reçue avant de finir le rendu
+        # localement, et sans réponse d'un worker avant de lui reprendre sa
+        # tuile (None = attente sans limite)
+        self.timeout = timeout
+        self.tile_timeout = tile_timeout
+        self.tasks = queue.Queue()  # (RenderJob, tuile) à distribuer
+        self.listener = None
+        self.connections = []
+        self.lock = threading.Lock()
+        self.closed = False
+
+    # ------------------------------------------------------------------
+    # Connexions
+    # ------------------------------------------------------------------
+
+    def start(self):
+        self.listener = Listener(self.address, authkey=self.authkey)
+        self.address = self.listener.address
+        threading.Thread(target=self._accept, daemon=True).start()
+        print(f"Coordinateur en écoute sur {self.address[0]}:{self.address[1]}")
+        if self.generated_key:
+            print(f"Clé des workers (aucune clé {AUTHKEY_VARIABLE} définie) :\n"
+                  f"    {AUTHKEY_VARIABLE}={self.authkey.decode()} python src/worker.py "
+                  f"--connect {self.address[0]}:{self.address[1]}")
+        return self
+
+    def _accept(self):
+        while not self.closed:
+            try:
+                conn = self.listener.accept()
+            except AuthenticationError:
+                print("Connexion refusée : clé d'authentification incorrecte")
+                continue
+            except (OSError, EOFError):
+                if self.closed:
+                    return
+                continue  # connexion coupée pendant l'authentification...
+            with self.lock:
+                self.connections.append(conn)
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        """Boucle de dialogue avec un worker : une tuile à la fois."""
+        current = None  # (job, tuile) en cours chez ce worker
+        try:
+            message = self._recv(conn)
+            print(f"Worker connecté ({len(self.connections)} au total)")
+            while True:
+                if message[0] == 'result':
+                    _, tile, block, counters, stats = message
+                    self._finish(current[0], tuple(tile), (block, counters, stats))
+                    current = None
+                elif message[0] == 'error':
+                    job, tile = current
+                    current = None
+                    self._retry(job, tile, message[2])
+
+                current = self._next_task()
+                if current is None:
+                    conn.send(('stop',))
+                    return
+                job, tile = current
+                conn.send(('tile', job.fingerprint, tile))
+                message = self._recv(conn)
+                if message[0] == 'need_scene':
+                    conn.send(('scene', job.fingerprint, job.payload))
+                    message = self._recv(conn)
+        except TimeoutError:
+            # Worker bloqué : la connexion est fermée, sa tuile rendue ailleurs
+            if current is not None:
+                self._retry(*current, f"pas de réponse du worker depuis {self.tile_timeout}s")
+        except (EOFError, OSError):
+            if current is not None:
+                self._retry(*current, "worker déconnecté")
+        finally:
+            with self.lock:
+                if conn in self.connections:
+                    self.connections.remove(conn)
+            conn.close()
+
+    def _recv(self, conn):
+        """Message suivant du worker ; TimeoutError après tile_timeout secondes sans réponse."""
+        if self.tile_timeout is not None and not conn.poll(self.tile_timeout):
+            raise TimeoutError
+        return conn.recv()
+
+    def _next_task(self):
+        """Prochaine tuile d'une image en cours (bloquant), ou None à la fermeture."""
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                return None
+            job, tile = task
+            if not job.finished and tile not in job.done:
+                return task
+
+    # ------------------------------------------------------------------
+    # Suivi des tuiles
+    # ------------------------------------------------------------------
+
+    def _finish(self, job, tile, result):
+        with self.lock:
+            if tile in job.done or job.finished:
+                return  # déjà rendue par un autre worker
+            job.done.add(tile)
+        job.results.put((tile, result))
+
+    def _retry(self, job, tile, reason):
+        with self.lock:
+            if job.finished or tile in job.done:
+                return
+            job.attempts[tile] = job.attempts.get(tile, 0) + 1
+            attempts = job.attempts[tile]
+        if attempts >= MAX_ATTEMPTS:
+            job.results.put((tile, RuntimeError(f"Tuile {tile} abandonnée après "
+                                                f"{attempts} échecs: {reason}")))
+        else:
+            print(f"Tuile {tile} remise en file ({reason})")
+            self.tasks.put((job, tile))
+
+    def render_tiles(self, renderer, tiles):
+        """Générateur des (tuile, pixels, compteurs, statistiques), dans l'ordre d'arrivée."""
+        job = RenderJob(renderer, tiles)
+        print(f"Rendu distribué: {len(tiles)} tuiles, {len(self.connections)} worker(s) connecté(s)")
+        for tile in tiles:
+            self.tasks.put((job, tile))
+
+        received = set()
+        try:
+            while len(received) < len(job.tiles):
+                try:
+                    tile, result = job.results.get(timeout=self.timeout)
+                except queue.Empty:
+                    yield from self._render_locally(job, received)
+                    return
+                if isinstance(result, Exception):
+                    raise result
+                received.add(tile)
+                block, counters, stats = result
+                yield tile, block, counters, stats
+        finally:
+            job.finished = True
+
+    def _render_locally(self, job, received):
+        """Rend dans ce processus les tuiles de job pas encore reçues."""
+        job.finished = True  # les workers n'en reçoivent plus ; leurs résultats sont ignorés
+        tiles = [tile for tile in job.tiles if tile not in received]
+        print(f"Aucune tuile reçue depuis {self.timeout}s ({len(self.connections)} worker(s) "
+              f"connecté(s)) : {len(tiles)} tuile(s) rendue(s) localement")
+        # Copie du renderer telle que la reçoivent les workers (sans coordinateur)
+        renderer = pickle.loads(job.payload)
+        for tile in sorted(tiles):
+            yield render_tile_job(renderer, tile)
+
+    def close(self):
+        """Arrête les workers connectés (message 'stop') et ferme l'écoute."""
+        self.closed = True
+        with self.lock:
+            count = len(self.connections)
+        for _ in range(count):
+            self.tasks.put(None)
+        if self.listener is not None:
+            self.listener.close()
@@ -0,0 +1,130 @@
+"""
+Framebuffer compact : les couleurs sont stockées à plat dans un array('f')
+(r, g, b, r, g, b, ...) ligne par ligne, au lieu d'une liste de listes de Vec3.
+Une image 1920x1080 tient ainsi en ~24 Mo, sans millions d'objets Python.
+"""
+
+from array import array
+from math_utils import Vec3
+
+try:
+    import numpy as np
+except ImportError:  # NumPy est optionnel (conversion en octets d'un bloc)
+    np = None
+
+
+def quantize(values):
+    """Suite de composantes dans [0,1] -> octets dans [0,255]."""
+    if np is not None:
+        if isinstance(values, array) and values.typecode in 'fd':
+            values = np.frombuffer(values, dtype=np.float32 if values.typecode == 'f' else np.float64)
+        # Calcul en float64 comme int(v * 255.999) ; astype tronque vers 0 comme int()
+        scaled = np.multiply(values, 255.999, dtype=np.float64)
+        return np.clip(scaled, 0, 255).astype(np.uint8).tobytes()
+    return bytes([max(0, min(255, int(v * 255.999))) for v in values])
+
+
+def flatten_row(row):
+    """Ligne de Vec3 (ou déjà à plat) -> array('f') de composantes."""
+    if isinstance(row, array):
+        return row
+    if len(row) and hasattr(row[0], 'x'):
+        flat = array('f')
+        for color in row:
+            flat.append(color.x)
+            flat.append(color.y)
+            flat.append(color.z)
+        return flat
+    return array('f', row)
+
+
+class Framebuffer:
+
+    def __init__(self, width, height, data=None):
+        self.width = width
+        self.height = height
+        size = width * height * 3
+        if data is None:
+            data = array('f', bytes(4 * size))  # tout à 0 (noir)
+        elif len(data) != size:
+            raise ValueError(f"Taille incorrecte: {len(data)} composantes au lieu de {size}")
+        self.data = data
+
+    # ------------------------------------------------------------------
+    # Conversions avec l'ancienne forme (liste 2D de Vec3)
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def from_list(cls, image):
+        height = len(image)
+        width = len(image[0]) if height > 0 else 0
+        framebuffer = cls(width, height)
+        for j, row in enumerate(image):
+            framebuffer.set_row(j, row)
+        return framebuffer
+
+    def to_list(self):
+        data = self.data
+        return [[Vec3(data[k], data[k + 1], data[k + 2])
+                 for k in range(j * self.width * 3, (j + 1) * self.width * 3, 3)]
+                for j in range(self.height)]
+
+    # ------------------------------------------------------------------
+    # Accès aux pixels et aux lignes
+    # ------------------------------------------------------------------
+
+    def _offset(self, i, j):
+        return (j * self.width + i) * 3
+
+    def get_pixel(self, i, j):
+        k = self._offset(i, j)
+        return Vec3(self.data[k], self.data[k + 1], self.data[k + 2])
+
+    def set_pixel(self, i, j, color):
+        k = self._offset(i, j)
+        self.data[k:k + 3] = array('f', (color.x, color.y, color.z))
+
+    def row(self, j):
+        """Vue (sans copie) sur les composantes de la ligne j."""
+        start = j * self.width * 3
+        return self.memoryview()[start:start + self.width * 3]
+
+    def set_row(self, j, row, x0=0):
+        """Écrit une ligne (ou un morceau de ligne à partir de x0)."""
+        flat = flatten_row(row)
+        start = self._offset(x0, j)
+        self.data[start:start + len(flat)] = flat
+
+    def set_block(self, x0, y0, x1, y1, block):
+        """Copie un bloc à plat (tuile) de (x1 - x0) x (y1 - y0) pixels."""
+        stride = (x1 - x0) * 3
+        for dy in range(y1 - y0):
+            start = self._offset(x0, y0 + dy)
+            self.data[start:start + stride] = block[dy * stride:(dy + 1) * stride]
+
+    def get_block(self, x0, y0, x1, y1):
+        """Copie à plat (array('f')) du bloc [x0, x1) x [y0, y1)."""
+        block = array('f')
+        for j in range(y0, y1):
+            start = self._offset(x0, j)
+            block.extend(self.data[start:start + (x1 - x0) * 3])
+        return block
+
+    def memoryview(self):
+        """Vue mémoire (format 'f') sur tout le buffer, pour les writers."""
+        return memoryview(self.data)
+
+    # ------------------------------------------------------------------
+    # Export
+    # ------------------------------------------------------------------
+
+    def row_rgb8(self, j):
+        return quantize(self.row(j))
+
+    def to_rgb8(self):
+        """Image entière en octets RGB (3 octets par pixel)."""
+        return quantize(self.data)
+
+    def to_pil_image(self):
+        from PIL import Image
+        return Image.frombytes('RGB', (self.width, self.height), self.to_rgb8())
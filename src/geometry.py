@@ -1,11 +1,26 @@
 from math_utils import Vec3
+from bvh import BVH
+from array import array
 import math
 
+# Distance minimale d'un impact (évite l'auto-intersection)
+EPSILON = 0.001
+
+
+def _numpy():
+    # NumPy n'est nécessaire qu'aux méthodes *_batch (backend numpy)
+    import numpy
+    return numpy
+
+
 class Ray:
     
-    def __init__(self, origin, direction):
+    __slots__ = ('origin', 'direction')
+    
+    def __init__(self, origin, direction, normalize=True):
         self.origin = origin
-        self.direction = direction.normalize() # vecteur unitaire
+        # vecteur unitaire (normalize=False si l'appelant l'a déjà normalisé)
+        self.direction = direction.normalize() if normalize else direction
 
     def at(self, t):
         return self.origin + self.direction * t
@@ -18,40 +33,107 @@ class Sphere:
         self.radius = radius
         self.material = material
     
-    def intersect(self, ray):
-        oc = ray.origin - self.center
+    def bounding_box(self):
+        c, r = self.center, self.radius
+        return (c.x - r, c.y - r, c.z - r, c.x + r, c.y + r, c.z + r)
+    
+    def hit_distance(self, ray):
+        """Distance t du premier impact (ou None), sans calculer la normale."""
+        o, d, c = ray.origin, ray.direction, self.center
+        dx, dy, dz = d.x, d.y, d.z
+        ocx, ocy, ocz = o.x - c.x, o.y - c.y, o.z - c.z
         
         # coeff equation quadratique
-        a = ray.direction.dot(ray.direction)
-        b = 2.0 * oc.dot(ray.direction)
-        c = oc.dot(oc) - self.radius * self.radius
+        a = dx * dx + dy * dy + dz * dz
+        b = 2.0 * (ocx * dx + ocy * dy + ocz * dz)
+        c = ocx * ocx + ocy * ocy + ocz * ocz - self.radius * self.radius
         
         discriminant = b * b - 4 * a * c
         
         # si pas d'intersection
         if discriminant < 0:
-            return False, None, None
+            return None
         
         sqrt_discriminant = math.sqrt(discriminant)
         t1 = (-b - sqrt_discriminant) / (2 * a)
-        t2 = (-b + sqrt_discriminant) / (2 * a)
-
+        
         # on prend la plus petite valeur positive
-        t = None
         if t1 > 0.001: # évite auto-intersection
-            t = t1
-        elif t2 > 0.001:
-            t = t2
-        else:
+            return t1
+        t2 = (-b + sqrt_discriminant) / (2 * a)
+        if t2 > 0.001:
+            return t2
+        return None
+    
+    def occludes(self, ray, max_distance):
+        """Test "any-hit" des rayons d'ombre : coupe-t-on le rayon avant max_distance ?"""
+        o, d, c = ray.origin, ray.direction, self.center
+        dx, dy, dz = d.x, d.y, d.z
+        ocx, ocy, ocz = o.x - c.x, o.y - c.y, o.z - c.z
+        
+        a = dx * dx + dy * dy + dz * dz
+        b = 2.0 * (ocx * dx + ocy * dy + ocz * dz)
+        c = ocx * ocx + ocy * ocy + ocz * ocz - self.radius * self.radius
+        discriminant = b * b - 4 * a * c
+        if discriminant < 0:
+            return False
+        
+        # Pas de normale ni de point d'impact : seule la distance compte
+        sqrt_discriminant = math.sqrt(discriminant)
+        t = (-b - sqrt_discriminant) / (2 * a)
+        if t <= 0.001:
+            t = (-b + sqrt_discriminant) / (2 * a)
+            if t <= 0.001:
+                return False
+        return t < max_distance
+    
+    def normal_at(self, ray, t):
+        """Normale au point d'impact ray(t), t donné par hit_distance."""
+        # Vecteur perpendiculaire à la surface : du centre vers le point d'impact
+        o, d, c = ray.origin, ray.direction, self.center
+        nx = o.x + d.x * t - c.x
+        ny = o.y + d.y * t - c.y
+        nz = o.z + d.z * t - c.z
+        length = math.sqrt(nx * nx + ny * ny + nz * nz)
+        return Vec3(nx / length, ny / length, nz / length)
+    
+    def intersect(self, ray):
+        t = self.hit_distance(ray)
+        if t is None:
             return False, None, None
-
-        # Calcul du point d'intersection
-        hit_point = ray.at(t)
+        return True, t, self.normal_at(ray, t)
+    
+    def intersect_batch(self, origins, directions, t_max=math.inf):
+        """
+        Intersections d'un paquet de rayons (tableaux numpy (N, 3)) :
+        (t, hit), t = distance du premier impact (inf si aucun) et
+        hit = impact avant t_max (scalaire ou tableau (N,)). Pas de normale :
+        voir normals_batch, à appeler seulement pour les impacts retenus.
+        """
+        np = _numpy()
+        oc = origins - np.array((self.center.x, self.center.y, self.center.z))
+        a = np.einsum('ij,ij->i', directions, directions)
+        b = 2.0 * np.einsum('ij,ij->i', oc, directions)
+        c = np.einsum('ij,ij->i', oc, oc) - self.radius * self.radius
+        discriminant = b * b - 4 * a * c
         
-        # Calcul de la normale (vecteur perpendiculaire à la surface)
-        normal = (hit_point - self.center).normalize()
+        hit = discriminant >= 0
+        sqrt_discriminant = np.sqrt(np.where(hit, discriminant, 0.0))
+        t1 = (-b - sqrt_discriminant) / (2 * a)
+        t2 = (-b + sqrt_discriminant) / (2 * a)
         
-        return True, t, normal
+        # on prend la plus petite valeur positive
+        t = np.where(t1 > EPSILON, t1, np.where(t2 > EPSILON, t2, np.inf))
+        t = np.where(hit, t, np.inf)
+        return t, t < t_max
+    
+    def normals_batch(self, points):
+        """Normales (N, 3) aux points d'impact points (tableau (N, 3))."""
+        np = _numpy()
+        v = points - np.array((self.center.x, self.center.y, self.center.z))
+        length = np.sqrt(np.einsum('ij,ij->i', v, v))
+        safe = np.where(length > 0, length, 1.0)
+        return np.where((length > 0)[:, None], v / safe[:, None], 0.0)
 
 
 class Plane:
@@ -61,16 +143,172 @@ class Plane:
         self.normal = normal.normalize()
         self.material = material
     
-    def intersect(self, ray):
-        denom = ray.direction.dot(self.normal)
+    def bounding_box(self):
+        return None  # plan infini : testé à part, hors du BVH
+    
+    def hit_distance(self, ray):
+        """Distance t de l'impact (ou None)."""
+        o, d, n, p = ray.origin, ray.direction, self.normal, self.point
+        denom = d.x * n.x + d.y * n.y + d.z * n.z
         
         # Si le dénominateur est proche de 0, le rayon est parallèle au plan
         if abs(denom) < 1e-6:
-            return False, None, None
+            return None
         
-        t = (self.point - ray.origin).dot(self.normal) / denom
+        t = ((p.x - o.x) * n.x + (p.y - o.y) * n.y + (p.z - o.z) * n.z) / denom
         
         if t < 0.001:
+            return None
+        return t
+    
+    def occludes(self, ray, max_distance):
+        t = self.hit_distance(ray)
+        return t is not None and t < max_distance
+    
+    def normal_at(self, ray, t):
+        return self.normal
+    
+    def intersect(self, ray):
+        t = self.hit_distance(ray)
+        if t is None:
             return False, None, None
-        
         return True, t, self.normal
+    
+    def intersect_batch(self, origins, directions, t_max=math.inf):
+        """Même interface que Sphere.intersect_batch."""
+        np = _numpy()
+        n, p = self.normal, self.point
+        normal = np.array((n.x, n.y, n.z))
+        denom = directions @ normal
+        parallel = np.abs(denom) < 1e-6
+        safe = np.where(parallel, 1.0, denom)
+        t = ((np.array((p.x, p.y, p.z)) - origins) @ normal) / safe
+        t = np.where(parallel | (t < EPSILON), np.inf, t)
+        return t, t < t_max
+    
+    def normals_batch(self, points):
+        np = _numpy()
+        n = self.normal
+        return np.broadcast_to(np.array((n.x, n.y, n.z)), points.shape)
+
+
+class TriangleMesh:
+    """
+    Maillage de triangles stocké à plat : vertices = array('d') (x, y, z, ...)
+    et indices = array('i') (a, b, c, ...), sans objet Python par triangle.
+    Les triangles sont rangés dans un BVH propre au maillage, et testés avec
+    l'algorithme de Möller-Trumbore. Les faces sont visibles des deux côtés.
+    """
+    
+    EPSILON = 1e-12  # déterminant minimal (rayon parallèle au triangle)
+    
+    def __init__(self, vertices, indices, material):
+        if len(indices) % 3 != 0:
+            raise ValueError("Le nombre d'indices doit être un multiple de 3")
+        if len(indices) == 0:
+            raise ValueError("Maillage vide")
+        
+        self.vertices = vertices
+        self.indices = indices
+        self.material = material
+        
+        # Pour chaque triangle : sommet v0 puis arêtes e1 = v1 - v0 et
+        # e2 = v2 - v0 (9 doubles), ce qu'utilise directement Möller-Trumbore
+        triangles = array('d')
+        boxes = []
+        v = vertices
+        for k in range(0, len(indices), 3):
+            a, b, c = 3 * indices[k], 3 * indices[k + 1], 3 * indices[k + 2]
+            ax, ay, az = v[a], v[a + 1], v[a + 2]
+            bx, by, bz = v[b], v[b + 1], v[b + 2]
+            cx, cy, cz = v[c], v[c + 1], v[c + 2]
+            triangles.extend((ax, ay, az, bx - ax, by - ay, bz - az, cx - ax, cy - ay, cz - az))
+            boxes.append((min(ax, bx, cx), min(ay, by, cy), min(az, bz, cz),
+                          max(ax, bx, cx), max(ay, by, cy), max(az, bz, cz)))
+        self.triangles = triangles
+        self.bvh = BVH(range(len(boxes)), boxes=boxes)
+        self.box = self.bvh.node_bounds[0]
+    
+    @property
+    def triangle_count(self):
+        return len(self.indices) // 3
+    
+    def bounding_box(self):
+        return self.box
+    
+    def _trace(self, ray, max_distance, any_hit=False):
+        """(t, numéro du triangle) de l'impact le plus proche avant max_distance, ou None."""
+        o, d = ray.origin, ray.direction
+        ox, oy, oz = o.x, o.y, o.z
+        dx, dy, dz = d.x, d.y, d.z
+        tri = self.triangles
+        eps = self.EPSILON
+        
+        max_t = [max_distance]
+        best = None
+        for k in self.bvh.candidates(ray, max_t):
+            b = 9 * k
+            e1x, e1y, e1z = tri[b + 3], tri[b + 4], tri[b + 5]
+            e2x, e2y, e2z = tri[b + 6], tri[b + 7], tri[b + 8]
+            
+            # p = d x e2 ; det = e1 . p
+            px = dy * e2z - dz * e2y
+            py = dz * e2x - dx * e2z
+            pz = dx * e2y - dy * e2x
+            det = e1x * px + e1y * py + e1z * pz
+            if -eps < det < eps:
+                continue
+            inv = 1.0 / det
+            
+            # Coordonnées barycentriques (u, v)
+            sx, sy, sz = ox - tri[b], oy - tri[b + 1], oz - tri[b + 2]
+            u = (sx * px + sy * py + sz * pz) * inv
+            if u < 0.0 or u > 1.0:
+                continue
+            qx = sy * e1z - sz * e1y
+            qy = sz * e1x - sx * e1z
+            qz = sx * e1y - sy * e1x
+            v = (dx * qx + dy * qy + dz * qz) * inv
+            if v < 0.0 or u + v > 1.0:
+                continue
+            
+            t = (e2x * qx + e2y * qy + e2z * qz) * inv
+            if 0.001 < t < max_t[0]:
+                if any_hit:
+                    return t, k
+                max_t[0] = t
+                best = k
+        
+        return None if best is None else (max_t[0], best)
+    
+    def hit_distance(self, ray):
+        hit = self._trace(ray, float('inf'))
+        return None if hit is None else hit[0]
+    
+    def occludes(self, ray, max_distance):
+        return self._trace(ray, max_distance, any_hit=True) is not None
+    
+    def normal_at(self, ray, t):
+        # Triangle touché en t : le parcours ne visite que ce qui est avant t
+        hit = self._trace(ray, math.nextafter(t, math.inf))
+        return self._face_normal(hit[1], ray.direction)
+    
+    def intersect(self, ray):
+        hit = self._trace(ray, float('inf'))
+        if hit is None:
+            return False, None, None
+        t, k = hit
+        return True, t, self._face_normal(k, ray.direction)
+    
+    def _face_normal(self, k, d):
+        # Normale de la face (e1 x e2), tournée vers l'origine du rayon
+        tri, b = self.triangles, 9 * k
+        e1x, e1y, e1z = tri[b + 3], tri[b + 4], tri[b + 5]
+        e2x, e2y, e2z = tri[b + 6], tri[b + 7], tri[b + 8]
+        nx = e1y * e2z - e1z * e2y
+        ny = e1z * e2x - e1x * e2z
+        nz = e1x * e2y - e1y * e2x
+        length = math.sqrt(nx * nx + ny * ny + nz * nz)
+        if nx * d.x + ny * d.y + nz * d.z > 0:
+            length = -length
+        return Vec3(nx / length, ny / length, nz / length)
@@ -1,25 +1,106 @@
 import sys
 import os
+import json
+import argparse
 from scene_loader import load_scene
 from renderer import Renderer
-from ppm_writer import write_ppm
+from ppm_writer import PPMStreamWriter, FORMATS
+from png_writer import PNGStreamWriter, FILTER_CHOICES
+from parallel import default_workers
+from stats import profile_call
+from distributed import Coordinator, parse_address
+from render_cache import RenderCache, render_key, DEFAULT_DIRECTORY
+from checkpoint import Checkpoint, checkpoint_path, read_seed
+from ray_table import DEFAULT_DIRECTORY as RAY_TABLE_DIRECTORY
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Ray tracer")
+    # Paramètres positionnels (optionnels) avec leurs valeurs par défaut
+    parser.add_argument("scene", nargs="?", default="scenes/simple.txt")
+    parser.add_argument("output", nargs="?", default="output/render.ppm")
+    parser.add_argument("width", nargs="?", type=int, default=1920)
+    parser.add_argument("height", nargs="?", type=int, default=1080)
+    parser.add_argument("--backend", choices=Renderer.BACKENDS, default="python",
+                        help="moteur de rendu: python (scalaire) ou numpy (vectorisé)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="nombre de processus de rendu (0 = tous les cœurs)")
+    parser.add_argument("--tile-size", type=int, default=None,
+                        help="côté des tuiles en pixels")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="graine de l'anti-aliasing (rendu reproductible)")
+    parser.add_argument("--spp", type=int, default=4,
+                        help="échantillons par pixel (anti-aliasing)")
+    parser.add_argument("--max-depth", type=int, default=3,
+                        help="nombre maximal de rebonds (réflexions) par rayon")
+    parser.add_argument("--min-weight", type=float, default=0.0,
+                        help="arrête les rayons réfléchis dont le poids (produit des "
+                             "réflectivités) passe sous ce seuil (0 = jusqu'à --max-depth)")
+    parser.add_argument("--roulette", action="store_true",
+                        help="roulette russe sous --min-weight : certains rayons continuent, "
+                             "avec un poids compensé (image non biaisée)")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="échantillonnage adaptatif (plus d'échantillons sur les bords/reflets)")
+    parser.add_argument("--max-samples", type=int, default=16,
+                        help="plafond d'échantillons par pixel en mode adaptatif")
+    parser.add_argument("--adaptive-threshold", type=float, default=0.01,
+                        help="erreur de luminance tolérée en mode adaptatif")
+    parser.add_argument("--frame", type=int, default=0,
+                        help="frame à rendre pour un fichier de scène animé")
+    parser.add_argument("--stats", metavar="FICHIER.json", default=None,
+                        help="enregistre les statistiques détaillées du rendu (rayons, tests, tuiles)")
+    parser.add_argument("--profile", metavar="FICHIER.prof", nargs="?", const="", default=None,
+                        help="profile le rendu avec cProfile (et enregistre le profil si un fichier est donné)")
+    parser.add_argument("--serve", metavar="HOTE:PORT", default=None,
+                        help="distribue les tuiles aux workers (python src/worker.py --connect HOTE:PORT, "
+                             "avec la même clé RAYTRACER_AUTHKEY) ; sans hôte, écoute sur "
+                             "127.0.0.1. Réseau de confiance uniquement : les messages sont des pickles")
+    parser.add_argument("--cache", metavar="DOSSIER", nargs="?", const=DEFAULT_DIRECTORY, default=None,
+                        help=f"réutilise une image déjà rendue avec la même scène et les mêmes "
+                             f"paramètres (dossier par défaut: {DEFAULT_DIRECTORY})")
+    parser.add_argument("--cache-size", type=int, default=512,
+                        help="taille maximale du cache de rendu en Mo")
+    parser.add_argument("--ray-table", metavar="DOSSIER", nargs="?", const=RAY_TABLE_DIRECTORY,
+                        default=None,
+                        help=f"garde les rayons primaires dans une table réutilisée par les rendus de "
+                             f"même caméra (dossier par défaut: {RAY_TABLE_DIRECTORY})")
+    parser.add_argument("--ray-table-size", type=int, default=1024,
+                        help="taille maximale du dossier des tables de rayons en Mo")
+    parser.add_argument("--resume", action="store_true",
+                        help="reprend un rendu interrompu à partir des tuiles déjà terminées")
+    parser.add_argument("--no-checkpoint", action="store_true",
+                        help="n'enregistre pas les tuiles terminées (pas de reprise possible)")
+    parser.add_argument("--ppm-format", choices=FORMATS, default="P6",
+                        help="P6 (binaire, par défaut) ou P3 (ASCII, compatibilité)")
+    parser.add_argument("--png-level", type=int, choices=range(10), default=6, metavar="0-9",
+                        help="niveau de compression zlib des sorties PNG")
+    parser.add_argument("--png-filter", choices=FILTER_CHOICES, default="sub",
+                        help="filtre des lignes PNG (adaptive: le meilleur par ligne, plus lent)")
+    return parser.parse_args(argv)
+
+# Format de l'image choisi d'après l'extension du fichier de sortie
+OUTPUT_EXTENSIONS = ('.ppm', '.png')
+
+def open_writer(output_file, width, height, args):
+    """Writer en flux (PPM ou PNG) qui reçoit les lignes pendant le rendu."""
+    if output_file.lower().endswith('.png'):
+        return PNGStreamWriter(output_file, width, height, args.png_level, args.png_filter)
+    return PPMStreamWriter(output_file, width, height, args.ppm_format)
+
+def cache_suffix(output_file, args):
+    """Suffixe de l'image dans le cache de rendu (format et options d'encodage)."""
+    if output_file.lower().endswith('.png'):
+        return f"{args.png_level}{args.png_filter}.png"
+    return f"{args.ppm_format}.ppm"
 
 def main():
-    # Paramètres par défaut
-    scene_file = "scenes/simple.txt"
-    output_file = "output/render.ppm"
-    width = 1920
-    height = 1080
-    
-    # Arguments en ligne de commande
-    if len(sys.argv) > 1:
-        scene_file = sys.argv[1]
-    if len(sys.argv) > 2:
-        output_file = sys.argv[2]
-    if len(sys.argv) > 3:
-        width = int(sys.argv[3])
-    if len(sys.argv) > 4:
-        height = int(sys.argv[4])
+    args = parse_args()
+    scene_file = args.scene
+    output_file = args.output
+    width = args.width
+    height = args.height
+    workers = args.workers if args.workers > 0 else default_workers()
+    if args.roulette and args.min_weight <= 0:
+        print("Note: --roulette n'a d'effet qu'avec --min-weight (ex. --min-weight 0.05)")
     
     print(f"Ray Tracer - Rendu {width}x{height}")
     print(f"Scène: {scene_file}")
@@ -28,26 +109,101 @@ def main():
         print(f"Erreur: fichier '{scene_file}' introuvable")
         return 1
     
+    if os.path.splitext(output_file)[1].lower() not in OUTPUT_EXTENSIONS:
+        # Comme avant l'écriture PNG : toute autre extension donne un PPM
+        print(f"Note: extension de '{output_file}' non reconnue ({', '.join(OUTPUT_EXTENSIONS)}) ; "
+              f"image écrite au format PPM ({args.ppm_format})")
+    
     # Crée le dossier de sortie
     output_dir = os.path.dirname(output_file)
     if output_dir and not os.path.exists(output_dir):
         os.makedirs(output_dir)
     
+    coordinator = checkpoint = None
     try:
-        scene = load_scene(scene_file)
+        scene = load_scene(scene_file, args.frame)
         
         if scene.camera is None:
             print("Erreur: pas de caméra dans la scène")
             return 1
         
+        if args.serve:
+            coordinator = Coordinator(parse_address(args.serve)).start()
+        
         # Rendu avec anti-aliasing
-        renderer = Renderer(scene, width, height, max_depth=3, samples_per_pixel=4)
+        renderer = Renderer(scene, width, height, max_depth=args.max_depth, samples_per_pixel=args.spp,
+                            backend=args.backend, workers=workers,
+                            tile_size=args.tile_size, seed=args.seed,
+                            adaptive=args.adaptive, max_samples=args.max_samples,
+                            adaptive_threshold=args.adaptive_threshold,
+                            stats=args.stats is not None, coordinator=coordinator,
+                            ray_table=args.ray_table,
+                            ray_table_size=args.ray_table_size * 1024 * 1024,
+                            min_weight=args.min_weight,
+                            russian_roulette=args.roulette)
+        
+        ckpt_file = checkpoint_path(output_file)
+        seeded = args.seed is not None
+        if args.resume and args.seed is None:
+            # Sans --seed, on reprend avec la graine du rendu interrompu
+            seed = read_seed(ckpt_file)
+            if seed is not None:
+                renderer.seed = seed
+                seeded = True
+        
+        if renderer.ray_table and not seeded and (args.spp > 1 or args.adaptive):
+            # Rayons décalés selon la graine : une graine tirée au hasard
+            # donnerait une table qui ne resservirait jamais
+            print("Note: sans --seed, la table de rayons primaires ne serait pas réutilisée ; ignorée")
+            renderer.ray_table = None
+        
+        cache = key = None
+        if args.cache is not None:
+            if args.seed is None:
+                print("Note: sans --seed, la graine est tirée au hasard et l'image ne sera pas réutilisée")
+            cache = RenderCache(args.cache, args.cache_size * 1024 * 1024)
+            key = render_key(renderer)
+            if key is None:
+                print("Note: scène non prise en charge par le cache de rendu")
+                cache = None
+            elif cache.get_file(key, cache_suffix(output_file, args), output_file):
+                cache.record(True)
+                print(cache.report())
+                print(f"Terminé! Image (depuis le cache): {output_file}")
+                return 0
+        
+        if not args.no_checkpoint:
+            if args.resume and not os.path.exists(ckpt_file):
+                print(f"Aucun point de reprise ({ckpt_file}), rendu complet")
+            try:
+                checkpoint = Checkpoint(ckpt_file, renderer, resume=args.resume)
+            except ValueError as e:
+                print(f"Note: {e}")
+            renderer.checkpoint = checkpoint
         
         print("Rendu en cours...")
-        image = renderer.render()
+        # Les lignes sont écrites dans le fichier dès qu'elles sont terminées
+        with open_writer(output_file, width, height, args) as writer:
+            if args.profile is None:
+                renderer.render(writer)
+            else:
+                profile_call(lambda: renderer.render(writer), args.profile or None)
+        
+        if checkpoint is not None:
+            checkpoint.remove()
+            checkpoint = None
+        
+        if cache is not None:
+            cache.put_file(key, cache_suffix(output_file, args), output_file)
+            cache.record(False)
+            print(cache.report())
         
-        print("Sauvegarde...")
-        write_ppm(output_file, image)
+        if renderer.stats is not None:
+            for line in renderer.stats.summary():
+                print(line)
+            with open(args.stats, 'w', encoding='utf-8') as f:
+                json.dump(renderer.stats.to_dict(renderer.counters), f, indent=2)
+            print(f"Statistiques: {args.stats}")
         
         print(f"Terminé! Image: {output_file}")
         return 0
@@ -55,6 +211,13 @@ def main():
     except Exception as e:
         print(f"Erreur: {e}")
         return 1
+    finally:
+        if coordinator is not None:
+            coordinator.close()
+        if checkpoint is not None:
+            # Rendu interrompu : les tuiles terminées restent pour --resume
+            checkpoint.close()
+            print(f"Tuiles terminées conservées dans {checkpoint.path} (--resume pour reprendre)")
 
 if __name__ == "__main__":
     sys.exit(main())
@@ -2,10 +2,14 @@ import math
 
 class Vec3:
     
+    # pas de __dict__ par vecteur : création plus rapide et moins de mémoire
+    __slots__ = ('x', 'y', 'z')
+    
     def __init__(self, x=0.0, y=0.0, z=0.0):
-        self.x = float(x)
-        self.y = float(y)
-        self.z = float(z)
+        # pas de float() : les appelants passent déjà des nombres
+        self.x = x
+        self.y = y
+        self.z = z
     
     def __add__(self, other):
         return Vec3(self.x + other.x, self.y + other.y, self.z + other.z)
@@ -45,9 +49,10 @@ class Vec3:
         return math.sqrt(self.x * self.x + self.y * self.y + self.z * self.z)
     
     def normalize(self):
-        length = self.length()
+        x, y, z = self.x, self.y, self.z
+        length = math.sqrt(x * x + y * y + z * z)
         if length > 0:
-            return self / length
+            return Vec3(x / length, y / length, z / length)
         return Vec3(0, 0, 0)
     
     def multiply_components(self, other):
@@ -63,3 +68,19 @@ class Vec3:
 
 def reflect(incident, normal):
     return incident - normal * 2 * incident.dot(normal)
+
+
+# Versions "à plat" (sur des floats) pour les chemins critiques :
+# elles évitent de créer des Vec3 temporaires.
+
+def normalize3(x, y, z):
+    length = math.sqrt(x * x + y * y + z * z)
+    if length > 0:
+        return x / length, y / length, z / length
+    return 0.0, 0.0, 0.0
+
+
+def reflect3(ix, iy, iz, nx, ny, nz):
+    # même calcul que reflect() : incident - normal * 2 * (incident . normal)
+    d = 2 * (ix * nx + iy * ny + iz * nz)
+    return ix - nx * d, iy - ny * d, iz - nz * d
@@ -0,0 +1,417 @@
+"""
+Backend de rendu vectorisé (NumPy).
+
+Au lieu de tracer un rayon à la fois, on génère tous les rayons primaires
+d'une tuile sous forme de tableaux (N, 3), puis on calcule les
+intersections, l'éclairage, les ombres et les réflexions avec des opérations
+masquées sur ces tableaux. Les formules sont exactement celles de
+Renderer.trace_ray / compute_lighting / is_in_shadow : le résultat correspond
+au rendu scalaire à une petite tolérance près (arrondis flottants).
+"""
+
+from array import array
+from geometry import Sphere, Plane
+from sampling import seed_key, INV_2_32, INV_2_53, PATH_BIT
+
+try:
+    import numpy as np
+except ImportError:  # NumPy est optionnel
+    np = None
+
+EPSILON = 0.001  # même décalage que le rendu scalaire (évite l'auto-intersection)
+
+
+def numpy_available():
+    return np is not None
+
+
+def _vec(v):
+    return np.array([v.x, v.y, v.z], dtype=np.float64)
+
+
+def _normalize(v):
+    length = np.sqrt(np.einsum('ij,ij->i', v, v))
+    safe = np.where(length > 0, length, 1.0)
+    return np.where((length > 0)[:, None], v / safe[:, None], 0.0)
+
+
+def _dot(a, b):
+    return np.einsum('ij,ij->i', a, b)
+
+
+class NumpyBackend:
+    """Rend une scène par paquets de rayons (rendu en front d'onde)."""
+
+    def __init__(self, renderer, chunk_size=65536):
+        if np is None:
+            raise RuntimeError("NumPy est requis pour le backend 'numpy' (pip install numpy)")
+
+        self.renderer = renderer
+        self.scene = renderer.scene
+        self.chunk_size = chunk_size  # nombre max de rayons traités d'un coup
+
+        objects = self.scene.objects
+        for obj in objects:
+            if not isinstance(obj, (Sphere, Plane)):
+                raise ValueError(f"Objet non supporté par le backend numpy: {type(obj).__name__}")
+
+        # Tableaux de matériaux, indexés par numéro d'objet
+        materials = [obj.material for obj in objects]
+        self.mat_color = np.array([[m.color.x, m.color.y, m.color.z] for m in materials],
+                                  dtype=np.float64).reshape(-1, 3)
+        self.mat_ambient = np.array([m.ambient for m in materials], dtype=np.float64)
+        self.mat_diffuse = np.array([m.diffuse for m in materials], dtype=np.float64)
+        self.mat_specular = np.array([m.specular for m in materials], dtype=np.float64)
+        self.mat_shininess = np.array([m.shininess for m in materials], dtype=np.float64)
+        self.mat_reflectivity = np.array([m.reflectivity for m in materials], dtype=np.float64)
+
+        # Géométrie : chaque primitive teste elle-même un paquet de rayons
+        # (intersect_batch), dans l'ordre de la scène
+        self.primitives = list(enumerate(objects))
+
+        self.background = _vec(self.scene.background_color)
+
+    # ------------------------------------------------------------------
+    # Intersections
+    # ------------------------------------------------------------------
+
+    def _each_t(self, origins, directions, t_max=float('inf')):
+        """(index d'objet, distances t, impacts avant t_max, type d'objet), dans l'ordre de la scène."""
+        for k, obj in self.primitives:
+            t, hit = obj.intersect_batch(origins, directions, t_max)
+            yield k, t, hit, type(obj).__name__
+
+    def closest_hit(self, origins, directions):
+        """Renvoie (t, index d'objet) ; index = -1 si aucun objet touché."""
+        n = len(origins)
+        closest_t = np.full(n, np.inf)
+        closest_obj = np.full(n, -1, dtype=np.int64)
+
+        # Même ordre que la boucle scalaire : en cas d'égalité le premier gagne
+        stats = self.renderer.stats
+        for k, t, hit, kind in self._each_t(origins, directions):
+            if stats is not None:
+                stats.test(kind, int(hit.sum()), n)
+            closer = t < closest_t
+            closest_t = np.where(closer, t, closest_t)
+            closest_obj = np.where(closer, k, closest_obj)
+
+        return closest_t, closest_obj
+
+    def any_hit(self, origins, directions, max_distance):
+        """Masque des rayons bloqués avant max_distance (rayons d'ombre)."""
+        blocked = np.zeros(len(origins), dtype=bool)
+        stats = self.renderer.stats
+        for _, _, hit, kind in self._each_t(origins, directions, max_distance):
+            if stats is not None:
+                stats.test(kind, int(hit.sum()), len(origins))
+            blocked |= hit
+        return blocked
+
+    def normals_at(self, points, obj_index):
+        """Normales calculées seulement pour l'objet touché par chaque point."""
+        normals = np.zeros_like(points)
+        for k, obj in self.primitives:
+            mask = obj_index == k
+            if mask.any():
+                normals[mask] = obj.normals_batch(points[mask])
+        return normals
+
+    # ------------------------------------------------------------------
+    # Éclairage
+    # ------------------------------------------------------------------
+
+    def compute_lighting(self, points, normals, view_dirs, obj_index):
+        stats = self.renderer.stats
+        if stats is not None:
+            stats.shading_points += len(points)
+
+        color = self.mat_color[obj_index]
+        ambient = color * self.mat_ambient[obj_index][:, None]
+        diffuse = np.zeros_like(points)
+        specular = np.zeros_like(points)
+
+        k_diffuse = self.mat_diffuse[obj_index]
+        k_specular = self.mat_specular[obj_index]
+        shininess = self.mat_shininess[obj_index]
+        view_normalized = -_normalize(view_dirs)
+        shadow_origins = points + normals * EPSILON
+
+        for light in self.scene.lights:
+            light_color = _vec(light.color)
+
+            if hasattr(light, 'is_ambient') and light.is_ambient:
+                # Lumière ambiante globale : remplace l'ambient par défaut
+                ambient = (color * light_color) * (self.mat_ambient[obj_index] * light.intensity)[:, None]
+                continue
+
+            if hasattr(light, 'is_directional') and light.is_directional:
+                light_dirs = np.broadcast_to(-_vec(light.direction), points.shape)
+                light_distance = np.full(len(points), np.inf)
+            else:
+                to_light = _vec(light.position) - points
+                light_dirs = _normalize(to_light)
+                light_distance = np.sqrt(_dot(to_light, to_light))
+
+            in_shadow = self.any_hit(shadow_origins, _normalize(light_dirs), light_distance)
+            self.renderer.count('shadow_rays', len(points))
+            if stats is not None:
+                stats.ray('shadow', count=len(points))
+            lit = ~in_shadow
+
+            diff_intensity = np.maximum(0.0, _dot(normals, light_dirs))
+            diffuse += np.where(lit[:, None], (color * light_color) *
+                                (k_diffuse * diff_intensity * light.intensity)[:, None], 0.0)
+
+            # Spéculaire (seulement si la surface est éclairée)
+            reflect_dirs = -light_dirs + normals * (2 * _dot(light_dirs, normals))[:, None]
+            spec_intensity = np.maximum(0.0, _dot(reflect_dirs, view_normalized))
+            spec_intensity = np.power(spec_intensity, shininess)
+            has_spec = lit & (diff_intensity > 0)
+            specular += np.where(has_spec[:, None], light_color *
+                                 (k_specular * spec_intensity * light.intensity)[:, None], 0.0)
+
+        return np.clip(ambient + diffuse + specular, 0.0, 1.0)
+
+    # ------------------------------------------------------------------
+    # Tracé
+    # ------------------------------------------------------------------
+
+    def trace(self, origins, directions, paths=None):
+        """
+        Version itérative de trace_ray : chaque rayon porte un poids
+        (produit des réflectivités) et la contribution locale est accumulée
+        à chaque rebond, jusqu'à max_depth ou jusqu'à ce que le poids passe
+        sous min_weight (roulette russe si paths, clés des chemins, est donné).
+        """
+        n = len(origins)
+        result = np.zeros((n, 3))
+        weight = np.ones(n)
+        active = np.arange(n)
+
+        renderer = self.renderer
+        stats = renderer.stats
+        min_weight = renderer.min_weight
+        for depth in range(renderer.max_depth):
+            if len(active) == 0:
+                break
+            if depth > 0:
+                self.renderer.count('reflection_rays', len(active))
+            if stats is not None:
+                stats.ray('primary' if depth == 0 else 'reflection', depth, len(active))
+
+            t, obj = self.closest_hit(origins, directions)
+
+            miss = obj < 0
+            result[active[miss]] += weight[miss][:, None] * self.background
+
+            hit = ~miss
+            active, weight = active[hit], weight[hit]
+            origins, directions, t, obj = origins[hit], directions[hit], t[hit], obj[hit]
+            if len(active) == 0:
+                break
+
+            points = origins + directions * t[:, None]
+            normals = self.normals_at(points, obj)
+            local = self.compute_lighting(points, normals, directions, obj)
+
+            reflectivity = self.mat_reflectivity[obj]
+            local_weight = np.where(reflectivity > 0, 1 - reflectivity, 1.0)
+            result[active] += (weight * local_weight)[:, None] * local
+
+            # Rayons réfléchis (seulement pour les matériaux réfléchissants)
+            bounce = reflectivity > 0
+            active, weight = active[bounce], weight[bounce] * reflectivity[bounce]
+            normals, directions = normals[bounce], directions[bounce]
+            reflect_dirs = directions - normals * (2 * _dot(directions, normals))[:, None]
+            origins = points[bounce] + normals * EPSILON
+            directions = _normalize(reflect_dirs)
+            if paths is not None:
+                paths = paths[hit][bounce]
+
+            # Chemins dont le poids est trop faible (inutile au dernier rebond : rien n'est tracé)
+            if min_weight > 0 and depth + 1 < renderer.max_depth:
+                low = weight < min_weight
+                if low.any():
+                    keep = ~low
+                    if paths is not None:
+                        # Survivants : probabilité weight / min_weight, poids ramené à min_weight
+                        survive = low & (roulette_random(paths, depth + 1) * min_weight < weight)
+                        weight = np.where(survive, min_weight, weight)
+                        keep |= survive
+                        paths = paths[keep]
+                    renderer.count('paths_terminated', int(len(keep) - keep.sum()))
+                    active, weight = active[keep], weight[keep]
+                    origins, directions = origins[keep], directions[keep]
+
+        # Au-delà de max_depth, la contribution est noire (comme trace_ray)
+        return result
+
+    def sample_rays(self, ii, jj, ss=None):
+        """
+        Rayons primaires des échantillons (ii, jj, ss) (tableaux uint64) ;
+        sans ss, un rayon au coin du pixel comme le rendu scalaire à 1 spp.
+        """
+        renderer = self.renderer
+        camera = self.scene.camera
+        width, height = renderer.width, renderer.height
+
+        directions = self.table_directions(ii, jj, ss)
+        if directions is not None:
+            origins = np.broadcast_to(_vec(camera.position), directions.shape)
+            return np.ascontiguousarray(origins), directions
+
+        if ss is not None:
+            du, dv = sample_offsets(seed_key(renderer.seed), ii, jj, ss)
+            u = (ii + du) / (width - 1)
+            v = 1.0 - ((jj + dv) / (height - 1))
+        else:
+            u = ii / (width - 1)
+            v = 1.0 - (jj / (height - 1))
+
+        points = (_vec(camera.lower_left_corner)
+                  + np.outer(u, _vec(camera.horizontal))
+                  + np.outer(v, _vec(camera.vertical)))
+        origins = np.broadcast_to(_vec(camera.position), points.shape)
+        directions = _normalize(points - origins)
+        return np.ascontiguousarray(origins), directions
+
+    def table_directions(self, ii, jj, ss=None):
+        """Directions lues dans la table des rayons primaires, ou None (absente ou incomplète)."""
+        table = self.renderer.primary_rays()
+        if table is None or table.jitter != (ss is not None) or len(ii) == 0:
+            return None
+        if ss is not None and int(ss.max()) >= table.samples:
+            return None  # échantillons supplémentaires du mode adaptatif
+        if getattr(self, '_table', None) is not table:
+            self._table = table
+            self._table_rows = np.frombuffer(table.directions, dtype=np.float64).reshape(-1, 3)
+        index = (jj * np.uint64(table.width) + ii) * np.uint64(table.samples)
+        if ss is not None:
+            index += ss
+        return self._table_rows[index]
+
+    def trace_samples(self, ii, jj, ss=None):
+        """Couleurs des échantillons, tracées par paquets de chunk_size rayons."""
+        colors = np.empty((len(ii), 3))
+        for start in range(0, len(ii), self.chunk_size):
+            stop = start + self.chunk_size
+            origins, directions = self.sample_rays(
+                ii[start:stop], jj[start:stop], None if ss is None else ss[start:stop])
+            paths = None
+            if self.renderer.russian_roulette and self.renderer.min_weight > 0:
+                paths = path_keys(seed_key(self.renderer.seed), ii[start:stop], jj[start:stop],
+                                  None if ss is None else ss[start:stop])
+            colors[start:stop] = self.trace(origins, directions, paths)
+        return colors
+
+    @staticmethod
+    def _pixel_grid(x0, y0, x1, y1):
+        jj, ii = np.meshgrid(np.arange(y0, y1, dtype=np.uint64),
+                             np.arange(x0, x1, dtype=np.uint64), indexing='ij')
+        return ii.reshape(-1), jj.reshape(-1)
+
+    def render_block(self, x0, y0, x1, y1):
+        """Rend une tuile et renvoie un tableau (hauteur, largeur, 3)."""
+        if self.renderer.adaptive:
+            return self.render_block_adaptive(x0, y0, x1, y1)
+
+        spp = max(self.renderer.samples_per_pixel, 1)
+        ii, jj = self._pixel_grid(x0, y0, x1, y1)
+        ii, jj = np.repeat(ii, spp), np.repeat(jj, spp)
+        ss = None
+        if self.renderer.samples_per_pixel > 1:
+            ss = np.tile(np.arange(spp, dtype=np.uint64), len(ii) // spp)
+
+        colors = self.trace_samples(ii, jj, ss)
+        self.renderer.count('samples', len(ii))
+        return colors.reshape(y1 - y0, x1 - x0, spp, 3).mean(axis=2)
+
+    def render_block_adaptive(self, x0, y0, x1, y1):
+        """Même algorithme que Renderer.render_tile_adaptive, par paquets."""
+        from renderer import EDGE_CONTRAST
+
+        renderer = self.renderer
+        height, width = y1 - y0, x1 - x0
+        threshold = renderer.adaptive_threshold
+        first = max(1, renderer.min_samples)
+        cap = max(first, renderer.max_samples)
+        weights = np.array([0.2126, 0.7152, 0.0722])
+
+        ii, jj = self._pixel_grid(x0, y0, x1, y1)
+        color_sum = np.zeros((len(ii), 3))
+        lum_sum = np.zeros(len(ii))
+        lum_sq = np.zeros(len(ii))
+        counts = np.zeros(len(ii), dtype=np.uint64)
+
+        def add_samples(pixels):
+            colors = self.trace_samples(ii[pixels], jj[pixels], counts[pixels])
+            lum = colors @ weights
+            color_sum[pixels] += colors
+            lum_sum[pixels] += lum
+            lum_sq[pixels] += lum * lum
+            counts[pixels] += np.uint64(1)
+
+        # 1. Premier passage
+        everyone = np.arange(len(ii))
+        for _ in range(first):
+            add_samples(everyone)
+
+        # 2. Contraste avec les voisins de la tuile
+        means = (lum_sum / counts).reshape(height, width)
+        contrast = np.zeros_like(means)
+        contrast[:, 1:] = np.maximum(contrast[:, 1:], np.abs(means[:, 1:] - means[:, :-1]))
+        contrast[:, :-1] = np.maximum(contrast[:, :-1], np.abs(means[:, :-1] - means[:, 1:]))
+        contrast[1:, :] = np.maximum(contrast[1:, :], np.abs(means[1:, :] - means[:-1, :]))
+        contrast[:-1, :] = np.maximum(contrast[:-1, :], np.abs(means[:-1, :] - means[1:, :]))
+        edge_target = max(first, renderer.samples_per_pixel)
+        targets = np.where(contrast.reshape(-1) > EDGE_CONTRAST, edge_target, first)
+
+        # 3. Raffinement : un échantillon de plus par pixel non convergé, par vague
+        while True:
+            n = counts.astype(np.float64)
+            mean = lum_sum / n
+            safe = np.maximum(n - 1, 1)
+            variance = np.maximum(0.0, (lum_sq / n - mean * mean) * n / safe)
+            error = np.where(n >= 2, np.sqrt(variance / n), 0.0)
+            pending = (n < cap) & ((n < targets) | (error > threshold))
+            if not pending.any():
+                break
+            add_samples(np.nonzero(pending)[0])
+
+        renderer.count('samples', int(counts.sum()))
+        return (color_sum / counts[:, None].astype(np.float64)).reshape(height, width, 3)
+
+    def render_tile(self, x0, y0, x1, y1):
+        # Même forme que Renderer.render_tile : array('f') à plat
+        return array('f', self.render_block(x0, y0, x1, y1).astype(np.float32).tobytes())
+
+
+def mix64(z):
+    """Version vectorisée de sampling.mix64 (arithmétique uint64 modulo 2^64)."""
+    with np.errstate(over='ignore'):
+        z = z + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def sample_offsets(key, ii, jj, ss):
+    """Version vectorisée de sampling.sample_offsets (mêmes valeurs)."""
+    h = mix64(np.uint64(key) ^ ((jj << np.uint64(42)) | (ii << np.uint64(21)) | ss))
+    du = (h >> np.uint64(32)).astype(np.float64) * INV_2_32
+    dv = (h & np.uint64(0xFFFFFFFF)).astype(np.float64) * INV_2_32
+    return du, dv
+
+
+def path_keys(key, ii, jj, ss=None):
+    """Version vectorisée de sampling.path_key (ss absent : échantillon 0)."""
+    index = (jj << np.uint64(42)) | (ii << np.uint64(21))
+    if ss is not None:
+        index = index | ss
+    return mix64(np.uint64(key) ^ np.uint64(PATH_BIT) ^ index)
+
+
+def roulette_random(paths, depth):
+    """Version vectorisée de sampling.roulette_random."""
+    return (mix64(paths ^ np.uint64(depth)) >> np.uint64(11)).astype(np.float64) * INV_2_53
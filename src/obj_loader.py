@@ -0,0 +1,52 @@
+"""
+Lecture des fichiers Wavefront OBJ (géométrie seulement).
+
+Seules les lignes "v x y z" (sommets) et "f a b c ..." (faces) sont lues ;
+les faces à plus de trois sommets sont découpées en éventail, les formes
+"a/b/c" et les indices négatifs (relatifs à la fin) sont acceptés. Les
+normales, coordonnées de texture, groupes et matériaux sont ignorés.
+"""
+
+from array import array
+
+
+def read_obj(filename):
+    """Fichier OBJ -> (vertices array('d') à plat, indices array('i') par triangle)."""
+    vertices = array('d')
+    indices = array('i')
+
+    with open(filename, 'rb') as f:
+        data = f.read()
+
+    for line_num, line in enumerate(data.splitlines(), 1):
+        if line.startswith(b'v '):
+            parts = line.split()
+            if len(parts) < 4:
+                raise ValueError(f"{filename}:{line_num}: sommet incomplet")
+            vertices.extend((float(parts[1]), float(parts[2]), float(parts[3])))
+
+        elif line.startswith(b'f '):
+            count = len(vertices) // 3
+            face = []
+            for part in line.split()[1:]:
+                k = int(part.split(b'/', 1)[0])
+                k = k - 1 if k > 0 else count + k  # OBJ compte à partir de 1
+                if not 0 <= k < count:
+                    raise ValueError(f"{filename}:{line_num}: sommet {part.decode()} inexistant")
+                face.append(k)
+            if len(face) < 3:
+                raise ValueError(f"{filename}:{line_num}: face à moins de 3 sommets")
+            for n in range(1, len(face) - 1):
+                indices.extend((face[0], face[n], face[n + 1]))
+
+    return vertices, indices
+
+
+def transform_vertices(vertices, scale=1.0, offset=(0.0, 0.0, 0.0)):
+    """Met à l'échelle puis déplace les sommets (sur place)."""
+    ox, oy, oz = offset
+    for k in range(0, len(vertices), 3):
+        vertices[k] = vertices[k] * scale + ox
+        vertices[k + 1] = vertices[k + 1] * scale + oy
+        vertices[k + 2] = vertices[k + 2] * scale + oz
+    return vertices
@@ -0,0 +1,57 @@
+"""
+Rendu multi-cœur par tuiles.
+
+La scène (avec le Renderer) est envoyée une seule fois à chaque processus
+du pool, via l'initialiseur ; ensuite seules les coordonnées des tuiles
+circulent. Les tuiles sont rendues dans l'ordre d'arrivée et c'est le
+Renderer qui les réassemble dans l'ordre (voir TileAssembler).
+"""
+
+import os
+import time
+from multiprocessing import Pool
+
+from stats import RenderStats
+
+# Renderer propre à chaque processus du pool (initialisé par _init_worker)
+_worker_renderer = None
+
+
+def _init_worker(renderer):
+    global _worker_renderer
+    _worker_renderer = renderer
+
+
+def _render_tile(tile):
+    return render_tile_job(_worker_renderer, tile)
+
+
+def render_tile_job(renderer, tile):
+    """
+    Rend une tuile pour le compte d'un autre processus (pool ou worker
+    distant) : (tuile, pixels, compteurs, statistiques ou None).
+    """
+    # Compteurs (et statistiques) remis à zéro par tuile : le processus
+    # principal les additionne
+    renderer.counters = {}
+    if renderer.stats is None:
+        return tile, renderer.render_tile(*tile), renderer.counters, None
+
+    renderer.stats = RenderStats()
+    start = time.perf_counter()
+    block = renderer.render_tile(*tile)
+    renderer.stats.tile(tile, time.perf_counter() - start)
+    return tile, block, renderer.counters, renderer.stats
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def render_tiles_parallel(renderer, tiles):
+    """Générateur des (tuile, pixels, compteurs, statistiques) rendus par renderer.workers processus."""
+    print(f"Rendu parallèle: {renderer.workers} processus, {len(tiles)} tuiles")
+
+    with Pool(processes=renderer.workers, initializer=_init_worker,
+              initargs=(renderer,)) as pool:
+        yield from pool.imap_unordered(_render_tile, tiles)
@@ -0,0 +1,193 @@
+"""
+Écriture PNG sans dépendance externe (zlib + struct de la bibliothèque standard).
+
+Structure d'un PNG : signature, puis des blocs (chunks) longueur + type +
+données + CRC : IHDR (dimensions), IDAT (pixels compressés), IEND (fin).
+Chaque ligne de pixels est précédée d'un octet de filtre : la ligne est
+remplacée par sa différence avec une prédiction (pixel de gauche, du
+dessus...), ce qui se compresse bien mieux sur des dégradés.
+
+PNGStreamWriter encode l'image ligne par ligne pendant le rendu : seule la
+ligne précédente (nécessaire aux filtres) est gardée en mémoire, et les
+données compressées sont écrites au fil de l'eau dans des blocs IDAT.
+"""
+
+import struct
+import zlib
+
+from framebuffer import Framebuffer, flatten_row, quantize
+
+try:
+    import numpy as np
+except ImportError:  # NumPy est optionnel (filtres calculés d'un bloc par ligne)
+    np = None
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# Filtres PNG (type de filtre = indice)
+FILTERS = ('none', 'sub', 'up', 'average', 'paeth')
+# 'adaptive' : pour chaque ligne, le filtre qui donne les plus petits écarts
+FILTER_CHOICES = FILTERS + ('adaptive',)
+
+BYTES_PER_PIXEL = 3  # RGB 8 bits
+IDAT_SIZE = 1 << 16  # taille des blocs IDAT écrits pendant le rendu
+
+
+def png_chunk(kind, data):
+    return (struct.pack('>I', len(data)) + kind + data
+            + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+
+
+# ----------------------------------------------------------------------
+# Filtres
+# ----------------------------------------------------------------------
+
+def _paeth(a, b, c):
+    p = a + b - c
+    pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+    if pa <= pb and pa <= pc:
+        return a
+    return b if pb <= pc else c
+
+
+def filter_row(kind, row, previous, bpp=BYTES_PER_PIXEL):
+    """Applique le filtre kind (0 à 4) à la ligne row (octets) ; previous = ligne du dessus."""
+    if kind == 0:
+        return row
+    if np is not None:
+        return _filter_row_numpy(kind, row, previous, bpp)
+    left = bytes(bpp) + row[:-bpp]
+    if kind == 1:
+        return bytes([(x - a) & 0xff for x, a in zip(row, left)])
+    if kind == 2:
+        return bytes([(x - b) & 0xff for x, b in zip(row, previous)])
+    if kind == 3:
+        return bytes([(x - ((a + b) >> 1)) & 0xff for x, a, b in zip(row, left, previous)])
+    upper_left = bytes(bpp) + previous[:-bpp]
+    return bytes([(x - _paeth(a, b, c)) & 0xff
+                  for x, a, b, c in zip(row, left, previous, upper_left)])
+
+
+def _filter_row_numpy(kind, row, previous, bpp):
+    # Même calcul que filter_row, sur toute la ligne à la fois (uint8 : le & 0xff est implicite)
+    x = np.frombuffer(row, dtype=np.uint8)
+    a = np.zeros_like(x)
+    a[bpp:] = x[:-bpp]
+    if kind == 1:
+        return (x - a).tobytes()
+    # Ligne du dessus (previous None : ligne de zéros, comme au-dessus de la première)
+    b = np.zeros_like(x) if previous is None else np.frombuffer(previous, dtype=np.uint8)
+    if kind == 2:
+        return (x - b).tobytes()
+    if kind == 3:
+        return (x - ((a.astype(np.uint16) + b) >> 1).astype(np.uint8)).tobytes()
+    c = np.zeros_like(b)
+    c[bpp:] = b[:-bpp]
+    a16, b16, c16 = a.astype(np.int16), b.astype(np.int16), c.astype(np.int16)
+    p = a16 + b16 - c16
+    pa, pb, pc = np.abs(p - a16), np.abs(p - b16), np.abs(p - c16)
+    predictor = np.where((pa <= pb) & (pa <= pc), a, np.where(pb <= pc, b, c))
+    return (x - predictor).tobytes()
+
+
+def _cost(data):
+    # Somme des écarts en valeur absolue (octets lus comme signés)
+    if np is not None:
+        return int(np.abs(np.frombuffer(data, dtype=np.int8).astype(np.int16)).sum())
+    return sum(v if v < 128 else 256 - v for v in data)
+
+
+def choose_filter(row, previous, bpp=BYTES_PER_PIXEL):
+    """(type, ligne filtrée) du filtre aux plus petits écarts (heuristique de la spec PNG)."""
+    best = None
+    for kind in range(len(FILTERS)):
+        filtered = filter_row(kind, row, previous, bpp)
+        cost = _cost(filtered)
+        if best is None or cost < best[0]:
+            best = (cost, kind, filtered)
+    return best[1], best[2]
+
+
+# ----------------------------------------------------------------------
+# Écriture
+# ----------------------------------------------------------------------
+
+class PNGStreamWriter:
+    """
+    Écrit un PNG ligne par ligne, au fur et à mesure du rendu (même
+    interface que PPMStreamWriter) :
+
+        with PNGStreamWriter("out.png", 800, 600) as writer:
+            renderer.render(writer)
+    """
+
+    def __init__(self, filename, width, height, level=6, row_filter='sub'):
+        if row_filter not in FILTER_CHOICES:
+            raise ValueError(f"Filtre PNG inconnu '{row_filter}' (choix: {', '.join(FILTER_CHOICES)})")
+        self.filename = filename
+        self.width = width
+        self.height = height
+        self.filter = None if row_filter == 'adaptive' else FILTERS.index(row_filter)
+        self.rows_written = 0
+        self.previous = bytes(width * BYTES_PER_PIXEL)  # ligne "au-dessus" de la première
+        self.compressor = zlib.compressobj(level)
+        self.pending = bytearray()  # données compressées pas encore écrites
+
+        self.file = open(filename, 'wb')
+        self.file.write(PNG_SIGNATURE)
+        ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)  # RGB, 8-bit
+        self.file.write(png_chunk(b'IHDR', ihdr))
+
+    def write_row(self, row):
+        self.write_rgb8(quantize(flatten_row(row)))
+
+    def write_rgb8(self, rgb):
+        """Ajoute une ligne déjà en octets RGB."""
+        if self.filter is None:
+            kind, filtered = choose_filter(rgb, self.previous)
+        else:
+            kind, filtered = self.filter, filter_row(self.filter, rgb, self.previous)
+        self.previous = rgb
+        self.pending += self.compressor.compress(bytes((kind,)) + filtered)
+        self.rows_written += 1
+        if len(self.pending) >= IDAT_SIZE:
+            self._flush_idat()
+
+    def _flush_idat(self):
+        if self.pending:
+            self.file.write(png_chunk(b'IDAT', bytes(self.pending)))
+            self.pending.clear()
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.pending += self.compressor.flush()
+        self._flush_idat()
+        self.file.write(png_chunk(b'IEND', b''))
+        self.file.close()
+        if self.rows_written != self.height:
+            raise ValueError(f"Image incomplète: {self.rows_written}/{self.height} lignes écrites")
+        print(f"Image sauvegardée: {self.filename}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.file.close()  # pas de vérification si le rendu a échoué
+            return False
+        self.close()
+        return False
+
+
+def write_png(filename, image, level=6, row_filter='sub'):
+    """
+    Écrit une image PNG (RGB 8 bits).
+    image: Framebuffer (ou liste 2D de Vec3), couleurs entre 0 et 1
+    """
+    if not isinstance(image, Framebuffer):
+        image = Framebuffer.from_list(image)
+
+    with PNGStreamWriter(filename, image.width, image.height, level, row_filter) as writer:
+        for j in range(image.height):
+            writer.write_rgb8(image.row_rgb8(j))
@@ -5,38 +5,96 @@ Structure d'un fichier PPM (P3 = ASCII):
     largeur hauteur
     255
     r1 g1 b1  r2 g2 b2  r3 g3 b3  ...
+
+Le format P6 a le même en-tête mais les pixels sont stockés en binaire
+(3 octets par pixel) : fichier ~4x plus petit et beaucoup plus rapide à écrire.
 """
 
-def write_ppm(filename, image):
+from framebuffer import Framebuffer, flatten_row, quantize
+
+FORMATS = ('P3', 'P6')
+
+
+def encode_row(row):
+    """Ligne (Vec3 ou composantes à plat) -> octets RGB (3 octets par pixel)."""
+    # Convertit les couleurs de [0,1] vers [0,255]
+    return quantize(flatten_row(row))
+
+
+def _header(fmt, width, height):
+    if fmt not in FORMATS:
+        raise ValueError(f"Format PPM inconnu '{fmt}' (choix: {', '.join(FORMATS)})")
+    return f"{fmt}\n{width} {height}\n255\n".encode('ascii')
+
+
+def _ascii_row(rgb):
+    # Une ligne P3 : "r g b  r g b  ..."
+    return ("  ".join(f"{rgb[k]} {rgb[k + 1]} {rgb[k + 2]}"
+                      for k in range(0, len(rgb), 3)) + "\n").encode('ascii')
+
+
+def write_ppm(filename, image, fmt='P6'):
     """
     Écrit une image au format PPM.
     filename: nom du fichier de sortie (str)
-    image: liste 2D de Vec3 (couleurs entre 0 et 1)
+    image: Framebuffer (ou liste 2D de Vec3), couleurs entre 0 et 1
+    fmt: 'P6' (binaire, par défaut) ou 'P3' (ASCII)
     """
-    height = len(image)
-    width = len(image[0]) if height > 0 else 0
-    
-    with open(filename, 'w') as f:
-        # En-tête PPM
-        f.write("P3\n")  # P3 = format ASCII
-        f.write(f"{width} {height}\n")
-        f.write("255\n")  # Valeur maximale pour chaque composante
-        
-        # Pour chaque pixel
-        for row in image:
-            for color in row:
-                # Convertit les couleurs de [0,1] vers [0,255]
-                r = int(color.x * 255.999)
-                g = int(color.y * 255.999)
-                b = int(color.z * 255.999)
-                
-                # Assure que les valeurs sont dans la plage [0, 255]
-                r = max(0, min(255, r))
-                g = max(0, min(255, g))
-                b = max(0, min(255, b))
-                
-                # Écrit les valeurs RGB
-                f.write(f"{r} {g} {b}  ")
-            f.write("\n")
-    
+    if not isinstance(image, Framebuffer):
+        image = Framebuffer.from_list(image)
+
+    # Tout est préparé en mémoire puis écrit en une seule fois
+    data = bytearray(_header(fmt, image.width, image.height))
+    if fmt == 'P6':
+        data += image.to_rgb8()
+    else:
+        for j in range(image.height):
+            data += _ascii_row(image.row_rgb8(j))
+
+    with open(filename, 'wb') as f:
+        f.write(data)
+
     print(f"Image sauvegardée: {filename}")
+
+
+class PPMStreamWriter:
+    """
+    Écrit un PPM ligne par ligne, au fur et à mesure du rendu :
+    seule la ligne courante est gardée en mémoire.
+
+        with PPMStreamWriter("out.ppm", 800, 600) as writer:
+            renderer.render(writer)
+    """
+
+    def __init__(self, filename, width, height, fmt='P6'):
+        self.filename = filename
+        self.width = width
+        self.height = height
+        self.fmt = fmt
+        self.rows_written = 0
+        header = _header(fmt, width, height)  # format vérifié avant d'écraser filename
+        self.file = open(filename, 'wb')
+        self.file.write(header)
+
+    def write_row(self, row):
+        rgb = encode_row(row)
+        self.file.write(rgb if self.fmt == 'P6' else _ascii_row(rgb))
+        self.rows_written += 1
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.file.close()
+        if self.rows_written != self.height:
+            raise ValueError(f"Image incomplète: {self.rows_written}/{self.height} lignes écrites")
+        print(f"Image sauvegardée: {self.filename}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.file.close()  # pas de vérification si le rendu a échoué
+            return False
+        self.close()
+        return False
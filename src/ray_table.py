@@ -0,0 +1,222 @@
+"""
+Tables de rayons primaires, réutilisables d'un rendu à l'autre.
+
+La direction d'un rayon primaire ne dépend que de la caméra, de la
+résolution, de l'échantillon (décalage tiré de la graine) : dans une
+animation où la caméra ne bouge pas, toutes les frames tracent exactement
+les mêmes rayons primaires. La table les calcule une fois (dx, dy, dz en
+float64, pixel par pixel et échantillon par échantillon) ; les rendus qui
+partagent caméra, résolution, échantillonnage et graine la relisent.
+
+Deux modes :
+- en mémoire : gardée par le processus (les dernières tables utilisées),
+  pour les frames rendues les unes après les autres ;
+- dans un dossier : écrite une fois dans "<clé>.rays", puis projetée en
+  mémoire (mmap) par chaque processus ou worker qui en a besoin ; les pages
+  sont partagées par le système au lieu d'être recopiées. Comme pour le
+  cache de rendu, le dossier est borné (max_bytes) : les tables les moins
+  récemment utilisées sont supprimées.
+
+Les rayons sont calculés comme CompiledScene.camera_ray : l'image est
+identique avec ou sans table.
+"""
+
+import hashlib
+import math
+import mmap
+import os
+import struct
+import tempfile
+import time
+from array import array
+from collections import OrderedDict
+
+from math_utils import Vec3
+from geometry import Ray
+from compiled_scene import CompiledScene
+from sampling import seed_key, sample_offsets
+
+DEFAULT_DIRECTORY = '.ray_tables'
+SUFFIX = 'rays'
+MAGIC = b'RTRAYS\0\0'
+VERSION = 1
+
+HEADER = struct.Struct('<8sHxxIII32s')  # signature, version, largeur, hauteur, échantillons, clé
+
+# Taille maximale du dossier des tables (octets)
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+# Tables gardées en mémoire par processus (les plus récemment utilisées)
+MAX_TABLES = 2
+_tables = OrderedDict()
+
+
+def ray_table_key(compiled, width, height, samples, jitter, seed):
+    """Empreinte (sha256) de la caméra et des paramètres d'échantillonnage."""
+    h = hashlib.sha256()
+    pos = compiled.camera_origin
+    h.update(array('d', compiled.camera_basis + (pos.x, pos.y, pos.z)).tobytes())
+    # Sans jitter (1 rayon au coin du pixel), la graine ne compte pas
+    h.update(repr((VERSION, width, height, samples, jitter, seed if jitter else None)).encode())
+    return h.digest()
+
+
+class PrimaryRayTable:
+    """
+    Directions des rayons primaires : samples rayons par pixel, rangés
+    ligne par ligne ; (i, j, s) -> indice ((j * largeur + i) * samples + s) * 3.
+
+        table = PrimaryRayTable.build(compiled, 640, 360, samples=4, jitter=True, seed=42)
+        ray = table.ray(i, j, s)
+    """
+
+    def __init__(self, key, width, height, samples, jitter, directions, origin):
+        self.key = key
+        self.width = width
+        self.height = height
+        self.samples = samples
+        self.jitter = jitter
+        # array('d'), ou memoryview d'un mmap (qui reste ouvert tant que la table existe)
+        self.directions = directions
+        self.origin = origin
+
+    @property
+    def nbytes(self):
+        return len(self.directions) * 8
+
+    @classmethod
+    def build(cls, compiled, width, height, samples, jitter, seed):
+        ox, oy, oz, hx, hy, hz, vx, vy, vz = compiled.camera_basis
+        key = seed_key(seed)
+        directions = array('d')
+        append = directions.append
+        for j in range(height):
+            for i in range(width):
+                for s in range(samples):
+                    if jitter:
+                        du, dv = sample_offsets(key, i, j, s)
+                        u = (i + du) / (width - 1)
+                        v = 1.0 - ((j + dv) / (height - 1))
+                    else:
+                        u = i / (width - 1)
+                        v = 1.0 - (j / (height - 1))
+                    dx = ox + hx * u + vx * v
+                    dy = oy + hy * u + vy * v
+                    dz = oz + hz * u + vz * v
+                    length = math.sqrt(dx * dx + dy * dy + dz * dz)
+                    append(dx / length)
+                    append(dy / length)
+                    append(dz / length)
+        return cls(ray_table_key(compiled, width, height, samples, jitter, seed),
+                   width, height, samples, jitter, directions, compiled.camera_origin)
+
+    def ray(self, i, j, s=0):
+        d = self.directions
+        k = ((j * self.width + i) * self.samples + s) * 3
+        return Ray(self.origin, Vec3(d[k], d[k + 1], d[k + 2]), normalize=False)
+
+    # ------------------------------------------------------------------
+    # Fichier
+    # ------------------------------------------------------------------
+
+    def save(self, path):
+        # Fichier temporaire puis renommage : un worker ne lit jamais une table à moitié écrite
+        directory = os.path.dirname(path) or '.'
+        fd, temp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, VERSION, self.width, self.height, self.samples, self.key))
+                f.write(self.directions)
+            os.replace(temp, path)
+        except OSError:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+
+    @classmethod
+    def load(cls, path, key, jitter, origin):
+        """Table projetée en mémoire depuis path, ou None (absente ou différente)."""
+        try:
+            with open(path, 'rb') as f:
+                mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None  # absente, ou vide (ValueError)
+        try:
+            magic, version, width, height, samples, stored_key = HEADER.unpack_from(mapping)
+        except struct.error:
+            magic = None
+        size = HEADER.size + width * height * samples * 3 * 8 if magic is not None else -1
+        if magic != MAGIC or version != VERSION or stored_key != key or len(mapping) != size:
+            mapping.close()
+            return None
+        directions = memoryview(mapping)[HEADER.size:].cast('d')
+        return cls(key, width, height, samples, jitter, directions, origin)
+
+
+def evict(directory, max_bytes, keep=None):
+    """
+    Supprime les tables les moins récemment utilisées (date de modification,
+    mise à jour à chaque lecture) au-delà de max_bytes ; keep (la table en
+    cours) est toujours gardée. Une table supprimée reste lisible par les
+    processus qui l'ont déjà projetée en mémoire.
+    """
+    entries = []
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.name.endswith('.' + SUFFIX) and entry.path != keep:
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    if keep is not None and os.path.exists(keep):
+        total += os.path.getsize(keep)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def primary_ray_table(scene, width, height, samples, jitter, seed, directory=None,
+                      max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Table des rayons primaires de scene.camera : reprise de la mémoire du
+    processus, ou du dossier (mmap), ou construite (et écrite dans le
+    dossier, ramené ensuite à max_bytes).
+    """
+    compiled = scene if isinstance(scene, CompiledScene) else CompiledScene(scene)
+    key = ray_table_key(compiled, width, height, samples, jitter, seed)
+    path = None if directory is None else os.path.join(directory, f"{key.hex()}.{SUFFIX}")
+
+    table = _tables.get(key)
+    if table is None and path is not None:
+        table = PrimaryRayTable.load(path, key, jitter, compiled.camera_origin)
+    if table is None:
+        start = time.perf_counter()
+        table = PrimaryRayTable.build(compiled, width, height, samples, jitter, seed)
+        print(f"Table de rayons primaires: {table.nbytes / (1024 * 1024):.1f} Mo "
+              f"(construite en {time.perf_counter() - start:.1f}s)")
+
+    if path is not None:
+        if os.path.exists(path):
+            try:
+                os.utime(path)  # récemment utilisée (éviction)
+            except FileNotFoundError:
+                pass
+        else:
+            # Écrite pour les autres processus, puis relue par mmap (la mémoire
+            # de la table construite est libérée)
+            os.makedirs(directory, exist_ok=True)
+            table.save(path)
+            table = PrimaryRayTable.load(path, key, jitter, compiled.camera_origin) or table
+            evict(directory, max_bytes, keep=path)
+
+    _tables[key] = table
+    _tables.move_to_end(key)
+    while len(_tables) > MAX_TABLES:
+        _tables.popitem(last=False)
+    return table
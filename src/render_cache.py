@@ -0,0 +1,251 @@
+"""
+Cache des rendus, adressé par contenu.
+
+La clé d'une image est le sha256 du contenu de la scène (objets, matériaux,
+lumières, caméra, fond), de la résolution, de la profondeur, de
+l'échantillonnage, de la graine, du backend et de RENDERER_VERSION : deux
+rendus de même clé produisent les mêmes pixels, quel que soit le fichier
+d'où vient la scène. Une frame d'animation identique à une autre (ou à un
+rendu précédent) n'est donc ni retracée ni réencodée.
+
+Chaque entrée est un fichier du dossier du cache :
+    <clé>.rtframe   Framebuffer (en-tête + composantes float)
+    <clé>.<format>  image déjà encodée (ex. "P6.ppm", "png")
+
+La taille totale est bornée : au-delà de max_bytes, les entrées les moins
+récemment utilisées (date de modification, mise à jour à chaque lecture)
+sont supprimées.
+"""
+
+import hashlib
+import os
+import shutil
+import struct
+import tempfile
+from array import array
+
+from geometry import Sphere, Plane, TriangleMesh
+from framebuffer import Framebuffer
+from renderer import RENDERER_VERSION
+
+DEFAULT_DIRECTORY = '.render_cache'
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+FRAME_SUFFIX = 'rtframe'
+FRAME_MAGIC = b'RTFRAME\0'
+FRAME_HEADER = struct.Struct('<8sII')  # signature, largeur, hauteur
+
+
+# ----------------------------------------------------------------------
+# Clés
+# ----------------------------------------------------------------------
+
+def _doubles(*values):
+    return array('d', values).tobytes()
+
+
+def _vec(v):
+    return _doubles(v.x, v.y, v.z)
+
+
+def _material(material):
+    return _vec(material.color) + _doubles(material.ambient, material.diffuse, material.specular,
+                                           material.shininess, material.reflectivity)
+
+
+def _object(obj):
+    if isinstance(obj, Sphere):
+        return _vec(obj.center) + _doubles(obj.radius)
+    if isinstance(obj, Plane):
+        return _vec(obj.point) + _vec(obj.normal)
+    if isinstance(obj, TriangleMesh):
+        return obj.vertices.tobytes() + obj.indices.tobytes()
+    return None
+
+
+def _light(light):
+    if getattr(light, 'is_ambient', False):
+        vector = b''
+    elif getattr(light, 'is_directional', False):
+        vector = _vec(light.direction)
+    else:
+        vector = _vec(light.position)
+    return vector + _doubles(light.intensity) + _vec(light.color)
+
+
+def scene_fingerprint(scene):
+    """
+    sha256 du contenu de la scène (ne dépend pas du fichier d'origine), ou
+    None si un objet n'est pas pris en charge.
+    """
+    h = hashlib.sha256()
+    h.update(_vec(scene.background_color))
+    camera = scene.camera
+    if camera is not None:
+        h.update(b'camera' + _vec(camera.position) + _vec(camera.look_at) + _vec(camera.up)
+                 + _doubles(camera.fov, camera.aspect_ratio))
+    for light in scene.lights:
+        h.update(type(light).__name__.encode() + _light(light))
+    for obj in scene.objects:
+        # Type et tailles en tête : deux listes différentes ne se confondent pas
+        data = _object(obj)
+        if data is None:
+            return None
+        h.update(type(obj).__name__.encode() + struct.pack('<Q', len(data)) + data
+                 + _material(obj.material))
+    return h.hexdigest()
+
+
+def render_key(renderer):
+    """Clé d'une image : scène + paramètres du rendu + version du renderer (None : pas de cache)."""
+    fingerprint = scene_fingerprint(renderer.scene)
+    if fingerprint is None:
+        return None
+    settings = [RENDERER_VERSION, renderer.backend, renderer.width, renderer.height,
+                renderer.max_depth, renderer.samples_per_pixel, renderer.seed]
+    if renderer.min_weight > 0:
+        settings += ['min_weight', renderer.min_weight, renderer.russian_roulette]
+    if renderer.adaptive:
+        # Le contraste est mesuré entre voisins d'une même tuile
+        settings += ['adaptive', renderer.min_samples, renderer.max_samples,
+                     renderer.adaptive_threshold, renderer.tile_size]
+    text = fingerprint + repr(settings)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+# ----------------------------------------------------------------------
+# Cache sur disque
+# ----------------------------------------------------------------------
+
+class RenderCache:
+    """
+    Dossier d'images rendues, borné en taille (LRU).
+
+        cache = RenderCache('.render_cache')
+        key = render_key(renderer)
+        framebuffer = cache.get_framebuffer(key)
+        if framebuffer is None:
+            framebuffer = renderer.render()
+            cache.put_framebuffer(key, framebuffer)
+    """
+
+    def __init__(self, directory=DEFAULT_DIRECTORY, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # Comptés par l'appelant (record), qui sait si une image a été évitée
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        self.evict()  # la limite a pu changer depuis le dernier rendu
+
+    def path(self, key, suffix):
+        return os.path.join(self.directory, f"{key}.{suffix}")
+
+    def record(self, hit):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def report(self):
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        return (f"Cache de rendu: {self.hits} succès, {self.misses} échec(s) ({rate:.0f}%), "
+                f"{self.size() / (1024 * 1024):.1f} Mo dans {self.directory}")
+
+    # ------------------------------------------------------------------
+    # Lecture
+    # ------------------------------------------------------------------
+
+    def _open(self, key, suffix):
+        """Chemin de l'entrée (marquée comme récemment utilisée), ou None."""
+        path = self.path(key, suffix)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def get_file(self, key, suffix, destination):
+        """Copie l'image encodée vers destination ; False si absente."""
+        path = self._open(key, suffix)
+        if path is None:
+            return False
+        try:
+            shutil.copyfile(path, destination)
+        except FileNotFoundError:
+            return False  # supprimée entre-temps par un autre processus
+        return True
+
+    def get_framebuffer(self, key):
+        path = self._open(key, FRAME_SUFFIX)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                magic, width, height = FRAME_HEADER.unpack(f.read(FRAME_HEADER.size))
+                data = array('f')
+                data.frombytes(f.read())
+        except (FileNotFoundError, struct.error):
+            return None
+        if magic != FRAME_MAGIC or len(data) != width * height * 3:
+            return None
+        return Framebuffer(width, height, data)
+
+    # ------------------------------------------------------------------
+    # Écriture
+    # ------------------------------------------------------------------
+
+    def _write(self, key, suffix, chunks):
+        # Fichier temporaire puis renommage : pas d'entrée à moitié écrite
+        fd, temp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            os.replace(temp, self.path(key, suffix))
+        except OSError:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+        self.evict()
+
+    def put_file(self, key, suffix, source):
+        """Garde une copie de l'image encodée source."""
+        with open(source, 'rb') as f:
+            self._write(key, suffix, iter(lambda: f.read(1 << 20), b''))
+
+    def put_framebuffer(self, key, framebuffer):
+        header = FRAME_HEADER.pack(FRAME_MAGIC, framebuffer.width, framebuffer.height)
+        self._write(key, FRAME_SUFFIX, (header, framebuffer.data.tobytes()))
+
+    # ------------------------------------------------------------------
+    # Éviction
+    # ------------------------------------------------------------------
+
+    def _entries(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith('.tmp'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """Supprime les entrées les moins récemment utilisées au-delà de max_bytes."""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
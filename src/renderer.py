@@ -1,157 +1,636 @@
-from math_utils import Vec3, reflect
+from array import array
+from math_utils import Vec3, normalize3, reflect3
 from geometry import Ray
+from bvh import BVH
+from compiled_scene import CompiledScene, ShadingMaterial
+from framebuffer import Framebuffer
+from sampling import MASK64, random_seed, seed_key, sample_offsets, path_key, roulette_random
+from stats import RenderStats, InstrumentedBVH
 import math
+import time
+
+# Écart de luminance avec un voisin au-delà duquel un pixel est traité comme un bord
+EDGE_CONTRAST = 0.1
+
+INFINITY = float('inf')
+BLACK = Vec3(0, 0, 0)
+
+# Version du rendu, à incrémenter dès qu'une modification change les pixels
+# produits : les images du cache de rendu (render_cache.py) sont alors ignorées
+RENDERER_VERSION = 2
+
+
+class ProgressReporter:
+    """Affiche l'avancement du rendu (tuiles terminées), environ tous les 10%."""
+    
+    def __init__(self, total, step=10.0):
+        self.total = total
+        self.done = 0
+        self.step = step
+        self.next_report = step
+    
+    def advance(self, count=1):
+        self.done += count
+        progress = (self.done / self.total) * 100 if self.total else 100.0
+        if progress >= self.next_report or self.done == self.total:
+            print(f"{progress:.1f}% ({self.done}/{self.total} tuiles)")
+            while self.next_report <= progress:
+                self.next_report += self.step
+
+
+class TileAssembler:
+    """
+    Range les tuiles (reçues dans n'importe quel ordre) dans leur bande de
+    lignes et rend les lignes des bandes complètes, dans l'ordre : seules
+    les bandes en cours sont gardées en mémoire.
+    """
+    
+    def __init__(self, width, height, tile_size):
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.tiles_per_band = -(-width // tile_size)
+        self.bands = {}  # y0 -> [Framebuffer de la bande, tuiles manquantes]
+        self.next_band = 0
+    
+    def add(self, tile, block):
+        x0, y0, x1, y1 = tile
+        band = self.bands.get(y0)
+        if band is None:
+            band_height = min(self.tile_size, self.height - y0)
+            band = self.bands[y0] = [Framebuffer(self.width, band_height), self.tiles_per_band]
+        band[0].set_block(x0, 0, x1, y1 - y0, block)
+        band[1] -= 1
+        
+        finished = []
+        while self.next_band in self.bands and self.bands[self.next_band][1] == 0:
+            band_buffer, _ = self.bands.pop(self.next_band)
+            stride = self.width * 3
+            finished.extend((self.next_band + dy, band_buffer.data[dy * stride:(dy + 1) * stride])
+                            for dy in range(band_buffer.height))
+            self.next_band += self.tile_size
+        return finished
+
 
 class Renderer:
     
-    def __init__(self, scene, width=800, height=600, max_depth=3, samples_per_pixel=4):
+    BACKENDS = ('python', 'numpy')
+    
+    def __init__(self, scene, width=800, height=600, max_depth=3, samples_per_pixel=4,
+                 backend='python', workers=1, tile_size=None, seed=None,
+                 adaptive=False, min_samples=2, max_samples=16, adaptive_threshold=0.01,
+                 stats=None, coordinator=None, ray_table=None, ray_table_size=None,
+                 min_weight=0.0, russian_roulette=False):
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Backend inconnu '{backend}' (choix: {', '.join(self.BACKENDS)})")
+        
         self.scene = scene
         self.width = width
         self.height = height
         self.max_depth = max_depth
+        # Arrêt des chemins réfléchis : un rayon dont le poids (produit des
+        # réflectivités) passe sous min_weight n'est pas tracé (0 = jusqu'à
+        # max_depth) ; avec la roulette russe, il continue avec une
+        # probabilité poids / min_weight et un poids ramené à min_weight
+        # (sans biais en moyenne)
+        self.min_weight = min_weight
+        self.russian_roulette = russian_roulette
         self.samples_per_pixel = samples_per_pixel # nbr rayon/pixel pour anti-aliasing
+        self.backend = backend # 'python' (rayon par rayon) ou 'numpy' (vectorisé)
+        self.workers = workers # nbr de processus (1 = rendu dans le processus courant)
+        # côté des tuiles (en pixels) ; le backend numpy préfère de gros paquets
+        self.tile_size = tile_size or (256 if backend == 'numpy' else 32)
+        # Graine de l'anti-aliasing : même graine => image identique (seuls
+        # ses 64 bits de poids faible comptent, voir sampling.seed_key)
+        self.seed = (seed if seed is not None else random_seed()) & MASK64
+        
+        # Échantillonnage adaptatif : min_samples par pixel, puis jusqu'à
+        # max_samples là où la variance (ou le contraste) reste élevé
+        self.adaptive = adaptive
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self.adaptive_threshold = adaptive_threshold
+        
+        # Compteurs du dernier rendu (ex. 'samples' = rayons primaires tracés)
+        self.counters = {}
+        # Statistiques détaillées (voir stats.py) : None = désactivées
+        self.stats = RenderStats() if stats is True else (stats or None)
+        # Rendu distribué : tuiles envoyées aux workers d'un Coordinator (voir distributed.py)
+        self.coordinator = coordinator
+        # Point de reprise (voir checkpoint.py) : tuiles déjà rendues, et
+        # enregistrement de chaque nouvelle tuile terminée
+        self.checkpoint = None
+        # Table des rayons primaires (voir ray_table.py) : None = désactivée,
+        # True = gardée en mémoire, ou dossier des tables partagées (mmap)
+        # dont la taille est bornée par ray_table_size (octets, None = défaut)
+        self.ray_table = ray_table
+        self.ray_table_size = ray_table_size
+    
+    @property
+    def samples_spent(self):
+        return self.counters.get('samples', 0)
+    
+    def tiles(self):
+        """Découpe l'image en tuiles (x0, y0, x1, y1), ligne par ligne."""
+        size = self.tile_size
+        return [(x0, y0, min(x0 + size, self.width), min(y0 + size, self.height))
+                for y0 in range(0, self.height, size)
+                for x0 in range(0, self.width, size)]
     
-    def render(self):
+    def render(self, writer=None, previous=None, dirty_tiles=None):
+        """
+        Rend l'image. Sans writer, renvoie un Framebuffer ; avec un writer
+        (ex. PPMStreamWriter), chaque ligne terminée lui est envoyée via
+        writer.write_row(row) et rien n'est conservé.
+        
+        Rendu incrémental : si previous (Framebuffer de la frame précédente)
+        et dirty_tiles (ensemble de tuiles à retracer) sont donnés, les
+        autres tuiles sont recopiées depuis previous.
+        """
+        framebuffer = Framebuffer(self.width, self.height) if writer is None else None
+        
+        for j, row in self.render_rows(previous, dirty_tiles):
+            if writer is None:
+                framebuffer.set_row(j, row)
+            else:
+                writer.write_row(row)
+        
+        return framebuffer
+    
+    def render_rows(self, previous=None, dirty_tiles=None):
+        """
+        Générateur des lignes (j, array('f') des composantes r, g, b), dans
+        l'ordre, dès qu'elles sont finies.
+        """
         print(f"Rendu {self.width}x{self.height}...")
         
-        image = []
+        # Construit le BVH (et la scène compilée) avant d'envoyer le
+        # renderer aux processus
+        if self.backend == 'python':
+            self._compiled = CompiledScene(self.scene)
+            stats = self.acceleration().stats()
+            print(f"BVH: {stats['nodes']} noeuds, profondeur {stats['depth']}, "
+                  f"{stats['unbounded_objects']} objet(s) non borné(s)")
+        # Table des rayons primaires : écrite avant que les processus ne la relisent
+        self._primary_rays = None
+        self.primary_rays()
         
-        for j in range(self.height):
-            row = []
-            
-            for i in range(self.width):
-                # Anti-aliasing
-                if self.samples_per_pixel > 1:
-                    color_sum = Vec3(0, 0, 0)
-                    
-                    for _ in range(self.samples_per_pixel):
-                        import random
-                        u = (i + random.random()) / (self.width - 1)
-                        v = 1.0 - ((j + random.random()) / (self.height - 1))
-                        ray = self.scene.camera.get_ray(u, v)
-                        color_sum = color_sum + self.trace_ray(ray, depth=0)
-                    
-                    color = color_sum / self.samples_per_pixel
+        tiles = self.tiles()
+        assembler = TileAssembler(self.width, self.height, self.tile_size)
+        self.counters = {}
+        stats = self.stats
+        if stats is not None:
+            stats.reset()
+            render_start = time.perf_counter()
+        
+        if previous is not None and dirty_tiles is not None:
+            # Tuiles inchangées : recopiées depuis la frame précédente
+            reused = [tile for tile in tiles if tile not in dirty_tiles]
+            tiles = [tile for tile in tiles if tile in dirty_tiles]
+            self.count('tiles_reused', len(reused))
+            print(f"Rendu incrémental: {len(tiles)} tuile(s) à retracer, {len(reused)} recopiée(s)")
+            for tile in reused:
+                yield from assembler.add(tile, previous.get_block(*tile))
+        
+        checkpoint = self.checkpoint
+        if checkpoint is not None and checkpoint.blocks:
+            resumed = [tile for tile in tiles if tile in checkpoint.blocks]
+            tiles = [tile for tile in tiles if tile not in checkpoint.blocks]
+            self.count('tiles_resumed', len(resumed))
+            print(f"Reprise: {len(resumed)} tuile(s) déjà rendue(s), {len(tiles)} restante(s)")
+            for tile in resumed:
+                yield from assembler.add(tile, checkpoint.blocks[tile])
+        
+        progress = ProgressReporter(len(tiles))
+        if self.coordinator is not None or self.workers > 1:
+            if self.coordinator is not None:
+                results = self.coordinator.render_tiles(self, tiles)
+            else:
+                from parallel import render_tiles_parallel
+                results = render_tiles_parallel(self, tiles)
+            for tile, block, counters, tile_stats in results:
+                self.merge_counters(counters)
+                if tile_stats is not None:
+                    stats.merge(tile_stats)
+                if checkpoint is not None:
+                    checkpoint.add(tile, block)
+                progress.advance()
+                yield from assembler.add(tile, block)
+        else:
+            for tile in tiles:
+                if stats is None:
+                    block = self.render_tile(*tile)
                 else:
-                    u = i / (self.width - 1)
-                    v = 1.0 - (j / (self.height - 1))
-                    ray = self.scene.camera.get_ray(u, v)
-                    color = self.trace_ray(ray, depth=0)
-                
-                row.append(color)
+                    start = time.perf_counter()
+                    block = self.render_tile(*tile)
+                    stats.tile(tile, time.perf_counter() - start)
+                if checkpoint is not None:
+                    checkpoint.add(tile, block)
+                progress.advance()
+                yield from assembler.add(tile, block)
+        
+        if stats is not None:
+            stats.render_time = time.perf_counter() - render_start
+        
+        pixels = self.width * self.height
+        print(f"Échantillons: {self.samples_spent} ({self.samples_spent / pixels:.2f}/pixel)")
+        reflection_rays = self.counters.get('reflection_rays', 0)
+        if reflection_rays:
+            print(f"Rayons réfléchis: {reflection_rays}")
+        terminated = self.counters.get('paths_terminated', 0)
+        if terminated:
+            print(f"Chemins arrêtés (poids < {self.min_weight:g}): {terminated}")
+        shadow_rays = self.counters.get('shadow_rays', 0)
+        if shadow_rays:
+            tests = self.counters.get('occluder_cache_tests', 0)
+            hits = self.counters.get('occluder_cache_hits', 0)
+            rate = (hits / tests) * 100 if tests else 0.0
+            print(f"Rayons d'ombre: {shadow_rays}, cache d'occultation: "
+                  f"{hits}/{tests} ({rate:.1f}%)")
+    
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+    
+    def merge_counters(self, counters):
+        for name, amount in counters.items():
+            self.count(name, amount)
+    
+    def render_tile(self, x0, y0, x1, y1):
+        """
+        Rend la tuile [x0, x1) x [y0, y1) et renvoie ses pixels à plat
+        (array('f') r, g, b ligne par ligne).
+        """
+        if self.backend == 'numpy':
+            return self.numpy_backend().render_tile(x0, y0, x1, y1)
+        
+        # Dernier bloqueur par lumière, propre à la tuile : les pixels voisins
+        # sont souvent masqués par le même objet
+        self.occluder_cache = {}
+        if self.adaptive:
+            return self.render_tile_adaptive(x0, y0, x1, y1)
+        
+        block = array('f')
+        for j in range(y0, y1):
+            for i in range(x0, x1):
+                color = self.render_pixel(i, j)
+                block.append(color.x)
+                block.append(color.y)
+                block.append(color.z)
+        return block
+    
+    def acceleration(self):
+        # BVH construit une fois sur scene.objects (reconstruit si la liste change)
+        bvh = getattr(self, '_bvh', None)
+        if bvh is None or self._bvh_objects is not self.scene.objects or \
+                self._bvh_count != len(self.scene.objects):
+            self._bvh = BVH(self.scene.objects)
+            self._bvh_objects = self.scene.objects
+            self._bvh_count = len(self.scene.objects)
+        if self.stats is not None:
+            # Version qui compte les tests d'intersection (statistiques actives)
+            wrapper = getattr(self, '_stats_bvh', None)
+            if wrapper is None or wrapper.bvh is not self._bvh or wrapper.collector is not self.stats:
+                self._stats_bvh = InstrumentedBVH(self._bvh, self.stats)
+            return self._stats_bvh
+        return self._bvh
+    
+    def compiled_scene(self):
+        # Recompilée à chaque rendu (render_rows) : la scène a pu changer entre deux
+        compiled = getattr(self, '_compiled', None)
+        if compiled is None or compiled.scene is not self.scene:
+            compiled = self._compiled = CompiledScene(self.scene)
+        return compiled
+    
+    def primary_rays(self):
+        """
+        Table des rayons primaires (None si désactivée) : les samples_per_pixel
+        échantillons de chaque pixel, ou les min_samples du premier passage
+        en mode adaptatif.
+        """
+        if not self.ray_table:
+            return None
+        table = getattr(self, '_primary_rays', None)
+        if table is None:
+            from ray_table import primary_ray_table
+            if self.adaptive:
+                samples, jitter = max(1, self.min_samples), True
+            elif self.samples_per_pixel > 1:
+                samples, jitter = self.samples_per_pixel, True
+            else:
+                samples, jitter = 1, False  # un rayon au coin du pixel
+            directory = None if self.ray_table is True else self.ray_table
+            options = {} if self.ray_table_size is None else {'max_bytes': self.ray_table_size}
+            table = self._primary_rays = primary_ray_table(
+                self.scene, self.width, self.height, samples, jitter, self.seed, directory, **options)
+        return table
+    
+    def numpy_backend(self):
+        # Construit une seule fois (conversion de la scène en tableaux)
+        if getattr(self, '_numpy_backend', None) is None:
+            from numpy_backend import NumpyBackend
+            self._numpy_backend = NumpyBackend(self)
+        return self._numpy_backend
+    
+    def __getstate__(self):
+        # Le backend numpy est reconstruit dans chaque processus ; le
+        # coordinateur (sockets, threads) et le point de reprise (fichier
+        # ouvert) restent dans le processus principal
+        state = self.__dict__.copy()
+        state.pop('_numpy_backend', None)
+        state.pop('_stats_bvh', None)
+        if self.ray_table is not True:
+            state.pop('_primary_rays', None)  # relue (mmap) par le processus
+        # sinon la table en mémoire est envoyée avec le Renderer (une fois par
+        # processus du pool) au lieu d'être reconstruite par chacun
+        state['coordinator'] = None
+        state['checkpoint'] = None
+        return state
+    
+    def render_pixel(self, i, j):
+        # Anti-aliasing
+        if self.samples_per_pixel > 1:
+            key = seed_key(self.seed)
+            color_sum = Vec3(0, 0, 0)
             
-            image.append(row)
+            for s in range(self.samples_per_pixel):
+                color_sum = color_sum + self.sample(key, i, j, s)
             
-            if (j + 1) % 50 == 0 or (j + 1) == self.height:
-                progress = ((j + 1) / self.height) * 100
-                print(f"{progress:.1f}% ({j + 1}/{self.height})")
+            self.count('samples', self.samples_per_pixel)
+            return color_sum / self.samples_per_pixel
         
-        return image
+        table = self.primary_rays()
+        if table is not None:
+            ray = table.ray(i, j)
+        else:
+            u = i / (self.width - 1)
+            v = 1.0 - (j / (self.height - 1))
+            ray = self.compiled_scene().camera_ray(u, v)
+        self.count('samples')
+        return self.trace_ray(ray, path=self.path(i, j, 0))
     
-    def trace_ray(self, ray, depth):
-        if depth >= self.max_depth:
-            return Vec3(0, 0, 0)
+    def sample(self, key, i, j, s):
+        """Couleur de l'échantillon s (décalé aléatoirement) du pixel (i, j)."""
+        table = self.primary_rays()
+        path = self.path(i, j, s)
+        if table is not None and s < table.samples:
+            return self.trace_ray(table.ray(i, j, s), path=path)
+        du, dv = sample_offsets(key, i, j, s)
+        u = (i + du) / (self.width - 1)
+        v = 1.0 - ((j + dv) / (self.height - 1))
+        return self.trace_ray(self.compiled_scene().camera_ray(u, v), path=path)
+    
+    def render_tile_adaptive(self, x0, y0, x1, y1):
+        """
+        Rend une tuile en échantillonnage adaptatif :
+        1. min_samples échantillons pour chaque pixel ;
+        2. on marque les pixels dont l'erreur estimée (écart-type de la
+           moyenne de luminance) dépasse le seuil, ou qui contrastent avec
+           un voisin de la tuile (bords d'objets, reflets, ombres) ;
+        3. ces pixels reçoivent des échantillons supplémentaires, jusqu'à
+           convergence ou max_samples.
+        """
+        key = seed_key(self.seed)
+        width = x1 - x0
+        count = (y1 - y0) * width
+        threshold = self.adaptive_threshold
+        first = max(1, self.min_samples)
+        cap = max(first, self.max_samples)
         
-        # Trouve l'objet le plus proche
-        closest_t = float('inf')
-        closest_object = None
-        closest_normal = None
+        # Sommes par pixel : r, g, b, luminance, luminance², nbr d'échantillons
+        sums = [[0.0, 0.0, 0.0, 0.0, 0.0, 0] for _ in range(count)]
         
-        for obj in self.scene.objects:
-            hit, t, normal = obj.intersect(ray)
-            if hit and t < closest_t:
-                closest_t = t
-                closest_object = obj
-                closest_normal = normal
+        def add_sample(k, i, j):
+            acc = sums[k]
+            color = self.sample(key, i, j, acc[5])
+            lum = 0.2126 * color.x + 0.7152 * color.y + 0.0722 * color.z
+            acc[0] += color.x
+            acc[1] += color.y
+            acc[2] += color.z
+            acc[3] += lum
+            acc[4] += lum * lum
+            acc[5] += 1
         
-        if closest_object is None:
-            return self.scene.background_color
+        def error(acc):
+            n = acc[5]
+            if n < 2:
+                return 0.0
+            mean = acc[3] / n
+            variance = max(0.0, (acc[4] / n - mean * mean) * n / (n - 1))
+            return math.sqrt(variance / n)
         
-        hit_point = ray.at(closest_t)
-        material = closest_object.material
+        # 1. Premier passage
+        for k in range(count):
+            j, i = y0 + k // width, x0 + k % width
+            for _ in range(first):
+                add_sample(k, i, j)
         
-        # Calcule l'éclairage
-        color = self.compute_lighting(hit_point, closest_normal, ray.direction, material)
+        # 2. Contraste avec les voisins (dans la tuile : indépendant de l'ordre des tuiles)
+        means = [acc[3] / acc[5] for acc in sums]
+        targets = []
+        for k, acc in enumerate(sums):
+            di, dj = k % width, k // width
+            contrast = 0.0
+            for nk in (k - 1 if di > 0 else -1, k + 1 if di < width - 1 else -1,
+                       k - width, k + width):
+                if 0 <= nk < count:
+                    contrast = max(contrast, abs(means[k] - means[nk]))
+            # Un bord marqué reçoit au moins la qualité du mode non adaptatif
+            target = max(first, self.samples_per_pixel) if contrast > EDGE_CONTRAST else first
+            targets.append(target)
         
-        # Ajoute les réflexions
-        if material.reflectivity > 0:
-            reflect_dir = reflect(ray.direction, closest_normal)
-            reflect_ray = Ray(hit_point + closest_normal * 0.001, reflect_dir) # type: ignore
-            reflect_color = self.trace_ray(reflect_ray, depth + 1)
-            color = color * (1 - material.reflectivity) + reflect_color * material.reflectivity
+        # 3. Raffinement des pixels marqués
+        for k, acc in enumerate(sums):
+            j, i = y0 + k // width, x0 + k % width
+            while acc[5] < cap and (acc[5] < targets[k] or error(acc) > threshold):
+                add_sample(k, i, j)
         
+        block = array('f')
+        spent = 0
+        for acc in sums:
+            n = acc[5]
+            spent += n
+            block.append(acc[0] / n)
+            block.append(acc[1] / n)
+            block.append(acc[2] / n)
+        self.count('samples', spent)
+        return block
+    
+    def path(self, i, j, s):
+        """Clé du chemin (i, j, s) pour la roulette russe, ou None si elle est désactivée."""
+        if self.russian_roulette and self.min_weight > 0:
+            return path_key(seed_key(self.seed), i, j, s)
+        return None
+    
+    def trace_ray(self, ray, depth=0, path=None):
+        """
+        Couleur vue par le rayon, rebonds compris. Boucle sur les réflexions
+        (pas de récursion) : chaque rebond garde sa couleur locale et ses
+        poids, et la couleur finale est recomposée en partant du dernier.
+        path : clé du chemin (voir Renderer.path), pour la roulette russe.
+        """
+        stats = self.stats
+        compiled = self.compiled_scene()
+        min_weight = self.min_weight
+        bounces = []  # (couleur locale, 1 - réflectivité, poids du rebond suivant)
+        weight = 1.0  # produit des réflectivités jusqu'au rayon courant
+        color = BLACK  # au-delà de max_depth (ou chemin arrêté), contribution noire
+        
+        while depth < self.max_depth:
+            if stats is not None:
+                stats.ray('primary' if depth == 0 else 'reflection', depth)
+            
+            # Trouve l'objet le plus proche (via le BVH)
+            closest_t, closest_object, closest_normal = self.acceleration().closest_hit(ray)
+            if closest_object is None:
+                color = compiled.background_color
+                break
+            
+            o, d = ray.origin, ray.direction
+            hit_point = Vec3(o.x + d.x * closest_t, o.y + d.y * closest_t, o.z + d.z * closest_t)
+            shading = compiled.material(closest_object.material)
+            
+            # Calcule l'éclairage
+            local = self.compute_lighting(hit_point, closest_normal, d, shading)
+            reflectivity = shading.reflectivity
+            if reflectivity <= 0:
+                color = local
+                break
+            
+            # Réflexion : poids du rayon réfléchi
+            keep = 1 - reflectivity
+            depth += 1
+            if depth >= self.max_depth:
+                bounces.append((local, keep, reflectivity))
+                break
+            weight *= reflectivity
+            if weight < min_weight:
+                if path is None or roulette_random(path, depth) * min_weight >= weight:
+                    self.count('paths_terminated')
+                    bounces.append((local, keep, reflectivity))
+                    break
+                # Survit avec la probabilité weight / min_weight : contribution divisée d'autant
+                reflectivity *= min_weight / weight
+                weight = min_weight
+            bounces.append((local, keep, reflectivity))
+            
+            n = closest_normal
+            rx, ry, rz = reflect3(d.x, d.y, d.z, n.x, n.y, n.z)
+            origin = Vec3(hit_point.x + n.x * 0.001, hit_point.y + n.y * 0.001, hit_point.z + n.z * 0.001)
+            ray = Ray(origin, Vec3(rx, ry, rz))
+            self.count('reflection_rays')
+        
+        # Recomposition depuis le dernier rebond (mêmes opérations que la récursion)
+        for local, keep, reflectivity in reversed(bounces):
+            color = Vec3(local.x * keep + color.x * reflectivity,
+                         local.y * keep + color.y * reflectivity,
+                         local.z * keep + color.z * reflectivity)
         return color
     
     def compute_lighting(self, point, normal, view_dir, material):
-        # Lumière ambiante : commence avec le matériau par défaut
-        ambient = material.color * material.ambient
-        diffuse = Vec3(0, 0, 0)
-        specular = Vec3(0, 0, 0)
-        
-        for light in self.scene.lights:
-            # Gestion des différents types de lumière
-            if hasattr(light, 'is_ambient') and light.is_ambient:
-                # Lumière ambiante globale : remplace l'ambient par défaut
-                ambient = material.color.multiply_components(light.color) * (
-                    material.ambient * light.intensity
-                )
-            elif hasattr(light, 'is_directional') and light.is_directional:
-                # Lumière directionnelle : direction fixe
-                light_dir = -light.direction  # Inverse car direction pointe vers la scène
-                light_distance = float('inf')  # Distance infinie
-                
-                # Vérifie les ombres
-                shadow_ray = Ray(point + normal * 0.001, light_dir)
-                in_shadow = self.is_in_shadow(shadow_ray, light_distance)
-                
-                if not in_shadow:
-                    # Diffuse
-                    diff_intensity = max(0, normal.dot(light_dir))
-                    diffuse = diffuse + material.color.multiply_components(light.color) * (
-                        material.diffuse * diff_intensity * light.intensity
-                    )
-                    
-                    # Spéculaire
-                    if diff_intensity > 0:
-                        reflect_dir = reflect(-light_dir, normal)
-                        view_dir_normalized = -view_dir.normalize()
-                        spec_intensity = max(0, reflect_dir.dot(view_dir_normalized))
-                        spec_intensity = pow(spec_intensity, material.shininess)
-                        specular = specular + light.color * (
-                            material.specular * spec_intensity * light.intensity
-                        )
-            else:
-                # Lumière ponctuelle : calculer direction et distance
-                light_dir = (light.position - point).normalize()
-                light_distance = (light.position - point).length()
-                
-                # Vérifie les ombres
-                shadow_ray = Ray(point + normal * 0.001, light_dir)
-                in_shadow = self.is_in_shadow(shadow_ray, light_distance)
-                
-                if not in_shadow:
-                    # Diffuse
-                    diff_intensity = max(0, normal.dot(light_dir))
-                    diffuse = diffuse + material.color.multiply_components(light.color) * (
-                        material.diffuse * diff_intensity * light.intensity
-                    )
-                    
-                    # Spéculaire
-                    if diff_intensity > 0:
-                        reflect_dir = reflect(-light_dir, normal)
-                        view_dir_normalized = -view_dir.normalize()
-                        spec_intensity = max(0, reflect_dir.dot(view_dir_normalized))
-                        spec_intensity = pow(spec_intensity, material.shininess)
-                        specular = specular + light.color * (
-                            material.specular * spec_intensity * light.intensity
-                        )
-        
-        final_color = ambient + diffuse + specular
-        return final_color.clamp(0, 1)
-    
-    def is_in_shadow(self, shadow_ray, light_distance):
-        for obj in self.scene.objects:
-            hit, t, _ = obj.intersect(shadow_ray)
-            if hit and t < light_distance:
-                return True
-        return False
+        """
+        Éclairage local (ambiant + diffus + spéculaire) en point.
+        material : ShadingMaterial de la scène compilée (ou Material, compilé à la volée).
+        """
+        if self.stats is not None:
+            self.stats.shading_points += 1
+        
+        compiled = self.compiled_scene()
+        if not isinstance(material, ShadingMaterial):
+            material = compiled.material(material)
+        
+        # Tout le calcul se fait sur des floats : un seul Vec3 créé à la fin
+        px, py, pz = point.x, point.y, point.z
+        nx, ny, nz = normal.x, normal.y, normal.z
+        shininess = material.shininess
+        
+        # Terme ambiant résolu à la compilation (lumière ambiante ou matériau)
+        ar, ag, ab = material.ambient
+        dr = dg = db = 0.0
+        sr = sg = sb = 0.0
+        
+        # Direction vers l'observateur, calculée une seule fois
+        vx, vy, vz = normalize3(view_dir.x, view_dir.y, view_dir.z)
+        vx, vy, vz = -vx, -vy, -vz
+        shadow_origin = Vec3(px + nx * 0.001, py + ny * 0.001, pz + nz * 0.001)
+        
+        # Lumières ponctuelles : direction et distance vers le point
+        for (light_index, qx, qy, qz), terms in zip(compiled.point_lights, material.point_terms):
+            tx, ty, tz = qx - px, qy - py, qz - pz
+            light_distance = math.sqrt(tx * tx + ty * ty + tz * tz)
+            if light_distance == 0:
+                continue
+            lx, ly, lz = tx / light_distance, ty / light_distance, tz / light_distance
+            
+            # Lumière derrière la surface : pas besoin de rayon d'ombre
+            diff_intensity = nx * lx + ny * ly + nz * lz
+            if diff_intensity <= 0:
+                continue
+            if self.is_in_shadow(Ray(shadow_origin, Vec3(lx, ly, lz), normalize=False),
+                                 light_distance, light_index):
+                continue
+            
+            kr, kg, kb, er, eg, eb = terms
+            dr += kr * diff_intensity
+            dg += kg * diff_intensity
+            db += kb * diff_intensity
+            
+            rx, ry, rz = reflect3(-lx, -ly, -lz, nx, ny, nz)
+            spec_intensity = rx * vx + ry * vy + rz * vz
+            if spec_intensity > 0:
+                k = pow(spec_intensity, shininess)
+                sr += er * k
+                sg += eg * k
+                sb += eb * k
+        
+        # Lumières directionnelles : direction fixe, distance infinie
+        for (light_index, lx, ly, lz), terms in zip(compiled.directional_lights,
+                                                    material.directional_terms):
+            diff_intensity = nx * lx + ny * ly + nz * lz
+            if diff_intensity <= 0:
+                continue
+            if self.is_in_shadow(Ray(shadow_origin, Vec3(lx, ly, lz), normalize=False),
+                                 INFINITY, light_index):
+                continue
+            
+            kr, kg, kb, er, eg, eb = terms
+            dr += kr * diff_intensity
+            dg += kg * diff_intensity
+            db += kb * diff_intensity
+            
+            rx, ry, rz = reflect3(-lx, -ly, -lz, nx, ny, nz)
+            spec_intensity = rx * vx + ry * vy + rz * vz
+            if spec_intensity > 0:
+                k = pow(spec_intensity, shininess)
+                sr += er * k
+                sg += eg * k
+                sb += eb * k
+        
+        return Vec3(min(1.0, max(0.0, ar + dr + sr)),
+                    min(1.0, max(0.0, ag + dg + sg)),
+                    min(1.0, max(0.0, ab + db + sb)))
+    
+    def is_in_shadow(self, shadow_ray, light_distance, light_index=None):
+        self.count('shadow_rays')
+        stats = self.stats
+        if stats is not None:
+            stats.ray('shadow')
+        
+        # On teste d'abord le dernier bloqueur de cette lumière
+        cache = getattr(self, 'occluder_cache', None)
+        if cache is not None and light_index is not None:
+            occluder = cache.get(light_index)
+            if occluder is not None:
+                self.count('occluder_cache_tests')
+                hit = occluder.occludes(shadow_ray, light_distance)
+                if stats is not None:
+                    stats.test(type(occluder).__name__, hit)
+                if hit:
+                    self.count('occluder_cache_hits')
+                    return True
+        
+        occluder = self.acceleration().any_hit(shadow_ray, light_distance)
+        if occluder is None:
+            return False
+        if cache is not None and light_index is not None:
+            cache[light_index] = occluder
+        return True
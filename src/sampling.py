@@ -0,0 +1,53 @@
+"""
+Échantillonnage déterministe pour l'anti-aliasing.
+
+Le décalage (jitter) d'un échantillon ne dépend que de la graine et de sa
+position (pixel i, j et numéro d'échantillon s) : on obtient donc la même
+image quel que soit l'ordre de rendu des tuiles ou le nombre de processus.
+"""
+
+import random
+
+MASK64 = (1 << 64) - 1
+INV_2_32 = 1.0 / 4294967296.0
+
+
+def mix64(z):
+    """Fonction de hachage 64 bits (finaliseur de SplitMix64)."""
+    z = (z + 0x9E3779B97F4A7C15) & MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    return z ^ (z >> 31)
+
+
+def random_seed():
+    """Graine aléatoire quand l'utilisateur n'en fournit pas."""
+    return random.getrandbits(63)
+
+
+def seed_key(seed):
+    """Prépare la graine une fois par rendu (évite de la re-hacher par échantillon)."""
+    return mix64(seed & MASK64)
+
+
+def sample_offsets(key, i, j, s):
+    """Décalage (du, dv) dans [0, 1)² de l'échantillon s du pixel (i, j)."""
+    # 21 bits par coordonnée : jusqu'à 2 millions de pixels / échantillons
+    h = mix64(key ^ ((j << 42) | (i << 21) | s))
+    return (h >> 32) * INV_2_32, (h & 0xFFFFFFFF) * INV_2_32
+
+
+# Bit 63 inutilisé par les indices (j << 42 tient sur 63 bits) : les hachages
+# des chemins sont distincts de ceux du jitter
+PATH_BIT = 1 << 63
+INV_2_53 = 1.0 / 9007199254740992.0
+
+
+def path_key(key, i, j, s):
+    """Clé du chemin de l'échantillon s du pixel (i, j) (tirages de la roulette russe)."""
+    return mix64(key ^ PATH_BIT ^ ((j << 42) | (i << 21) | s))
+
+
+def roulette_random(path, depth):
+    """Nombre dans [0, 1) tiré au rebond depth du chemin path."""
+    return (mix64(path ^ depth) >> 11) * INV_2_53
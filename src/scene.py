@@ -1,6 +1,7 @@
 # scene.py
 
 from math_utils import Vec3
+from geometry import Ray
 import math
 
 class Material:
@@ -65,12 +66,14 @@ class Camera:
         self.vertical = self.up_corrected * (2 * half_height)
     
     def get_ray(self, u, v):
-        from geometry import Ray
-        point = (self.lower_left_corner 
-                + self.horizontal * u 
-                + self.vertical * v)
-        direction = (point - self.position).normalize()
-        return Ray(self.position, direction)
+        # Calcul à plat : point visé sur l'écran, puis direction normalisée
+        llc, h, vert, pos = self.lower_left_corner, self.horizontal, self.vertical, self.position
+        dx = llc.x + h.x * u + vert.x * v - pos.x
+        dy = llc.y + h.y * u + vert.y * v - pos.y
+        dz = llc.z + h.z * u + vert.z * v - pos.z
+        length = math.sqrt(dx * dx + dy * dy + dz * dz)
+        direction = Vec3(dx / length, dy / length, dz / length)
+        return Ray(self.position, direction, normalize=False)
 
 
 class Scene:
@@ -0,0 +1,276 @@
+"""
+Cache binaire des scènes : "scene.txt" est compilé en "scene.txt.rtscene".
+
+Le fichier contient un en-tête (signature, version, sha256 du texte source,
+nombre d'objets et de lumières) suivi de tableaux de doubles rangés par champ
+(struct-of-arrays) : centres et rayons des sphères, points et normales des
+plans, matériaux, lumières, caméra et fond. Au chargement suivant, le fichier
+est ouvert avec mmap et les objets sont construits en lisant les doubles
+directement dans le fichier projeté (vues memoryview, sans liste
+intermédiaire), sans découpage de texte ni float() par nombre. Si le sha256 ne correspond plus au texte (fichier
+modifié), le cache est ignoré puis réécrit.
+
+Les scènes animées et les types d'objets inconnus ne sont pas mis en cache.
+"""
+
+import gc
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from math_utils import Vec3
+from geometry import Sphere, Plane
+from scene import Scene, Camera, Material, Light, DirectionalLight, AmbientLight
+
+CACHE_SUFFIX = '.rtscene'
+MAGIC = b'RTSCENE\0'
+VERSION = 1
+
+# signature, version, octets little-endian ?, caméra présente ?, sha256,
+# objets, sphères, plans, lumières (64 octets : les doubles restent alignés)
+HEADER = struct.Struct('<8sHB?32sIIII4x')
+
+SPHERE, PLANE = 0, 1
+POINT_LIGHT, DIRECTIONAL_LIGHT, AMBIENT_LIGHT = 0, 1, 2
+
+CAMERA_SIZE = 11  # position, look_at, up, fov, aspect_ratio
+
+
+def cache_path(filename):
+    return filename + CACHE_SUFFIX
+
+
+def source_hash(filename):
+    with open(filename, 'rb') as f:
+        return hashlib.sha256(f.read()).digest()
+
+
+def _sections(n_objects, n_spheres, n_planes, n_lights):
+    """(nom, nombre de doubles) des tableaux, dans l'ordre du fichier."""
+    return [
+        ('camera', CAMERA_SIZE), ('background', 3),
+        ('centers', 3 * n_spheres), ('radii', n_spheres),
+        ('points', 3 * n_planes), ('normals', 3 * n_planes),
+        ('colors', 3 * n_objects), ('ambient', n_objects), ('diffuse', n_objects),
+        ('specular', n_objects), ('shininess', n_objects), ('reflectivity', n_objects),
+        ('light_vectors', 3 * n_lights), ('intensities', n_lights), ('light_colors', 3 * n_lights),
+    ]
+
+
+# ----------------------------------------------------------------------
+# Écriture
+# ----------------------------------------------------------------------
+
+def _light_kind(light):
+    if getattr(light, 'is_ambient', False):
+        return AMBIENT_LIGHT
+    if isinstance(light, DirectionalLight):
+        return DIRECTIONAL_LIGHT
+    if isinstance(light, Light):
+        return POINT_LIGHT
+    return None
+
+
+def compile_scene(scene, digest):
+    """Scène -> contenu binaire du cache, ou None si elle n'est pas représentable."""
+    arrays = {name: array('d') for name, _ in _sections(0, 0, 0, 0)}
+    object_kinds = bytearray()
+    light_kinds = bytearray()
+
+    camera = scene.camera
+    if camera is not None:
+        arrays['camera'].extend((camera.position.x, camera.position.y, camera.position.z,
+                                 camera.look_at.x, camera.look_at.y, camera.look_at.z,
+                                 camera.up.x, camera.up.y, camera.up.z,
+                                 camera.fov, camera.aspect_ratio))
+    else:
+        arrays['camera'].extend([0.0] * CAMERA_SIZE)
+    bg = scene.background_color
+    arrays['background'].extend((bg.x, bg.y, bg.z))
+
+    for obj in scene.objects:
+        if type(obj) is Sphere:
+            object_kinds.append(SPHERE)
+            arrays['centers'].extend((obj.center.x, obj.center.y, obj.center.z))
+            arrays['radii'].append(obj.radius)
+        elif type(obj) is Plane:
+            object_kinds.append(PLANE)
+            arrays['points'].extend((obj.point.x, obj.point.y, obj.point.z))
+            arrays['normals'].extend((obj.normal.x, obj.normal.y, obj.normal.z))
+        else:
+            return None
+        m = obj.material
+        arrays['colors'].extend((m.color.x, m.color.y, m.color.z))
+        arrays['ambient'].append(m.ambient)
+        arrays['diffuse'].append(m.diffuse)
+        arrays['specular'].append(m.specular)
+        arrays['shininess'].append(m.shininess)
+        arrays['reflectivity'].append(m.reflectivity)
+
+    for light in scene.lights:
+        kind = _light_kind(light)
+        if kind is None:
+            return None
+        light_kinds.append(kind)
+        v = light.direction if kind == DIRECTIONAL_LIGHT else getattr(light, 'position', Vec3(0, 0, 0))
+        arrays['light_vectors'].extend((v.x, v.y, v.z))
+        arrays['intensities'].append(light.intensity)
+        arrays['light_colors'].extend((light.color.x, light.color.y, light.color.z))
+
+    n_spheres = object_kinds.count(SPHERE)
+    header = HEADER.pack(MAGIC, VERSION, sys.byteorder == 'little', camera is not None, digest,
+                         len(scene.objects), n_spheres, len(scene.objects) - n_spheres,
+                         len(scene.lights))
+
+    data = bytearray(header)
+    for name, _ in _sections(0, 0, 0, 0):
+        data += arrays[name].tobytes()
+    data += object_kinds
+    data += light_kinds
+    return bytes(data)
+
+
+def save_cache(filename, scene, digest=None):
+    """Écrit le cache de filename ; renvoie son chemin, ou None s'il n'a pas pu l'être."""
+    if digest is None:
+        digest = source_hash(filename)
+    data = compile_scene(scene, digest)
+    if data is None:
+        return None
+
+    # Écriture dans un fichier temporaire puis renommage : plusieurs processus
+    # peuvent compiler la même scène en même temps
+    path = cache_path(filename)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return None  # dossier en lecture seule... on se passe du cache
+    return path
+
+
+# ----------------------------------------------------------------------
+# Lecture
+# ----------------------------------------------------------------------
+
+def _triples(values):
+    return [Vec3(values[k], values[k + 1], values[k + 2]) for k in range(0, len(values), 3)]
+
+
+def _read(view, digest):
+    """
+    Tableaux du cache, ou None s'il est périmé ou invalide. Les tableaux de
+    doubles sont des vues (memoryview 'd') sur view, à libérer avec
+    _release() avant de fermer le mmap.
+    """
+    if len(view) < HEADER.size:
+        return None
+    (magic, version, little, has_camera, cached_digest,
+     n_objects, n_spheres, n_planes, n_lights) = HEADER.unpack_from(view)
+    if (magic != MAGIC or version != VERSION or cached_digest != digest
+            or little != (sys.byteorder == 'little')):
+        return None
+
+    sections = _sections(n_objects, n_spheres, n_planes, n_lights)
+    end = HEADER.size + 8 * sum(size for _, size in sections)
+    if len(view) != end + n_objects + n_lights:
+        return None
+
+    arrays = {}
+    doubles = view[HEADER.size:end].cast('d')
+    offset = 0
+    for name, size in sections:
+        arrays[name] = doubles[offset:offset + size]
+        offset += size
+    arrays['doubles'] = doubles
+    arrays['object_kinds'] = bytes(view[end:end + n_objects])
+    arrays['light_kinds'] = bytes(view[end + n_objects:])
+    arrays['has_camera'] = has_camera
+    return arrays
+
+
+def _release(arrays):
+    for value in arrays.values():
+        if isinstance(value, memoryview):
+            value.release()
+
+
+def _build_scene(arrays):
+    scene = Scene()
+
+    if arrays['has_camera']:
+        c = arrays['camera']
+        scene.set_camera(Camera(Vec3(c[0], c[1], c[2]), Vec3(c[3], c[4], c[5]),
+                                Vec3(c[6], c[7], c[8]), c[9], c[10]))
+    scene.set_background(Vec3(*arrays['background']))
+
+    colors = _triples(arrays['colors'])
+    centers = iter(_triples(arrays['centers']))
+    radii = iter(arrays['radii'])
+    points = iter(_triples(arrays['points']))
+    normals = iter(_triples(arrays['normals']))
+    materials = zip(colors, arrays['ambient'], arrays['diffuse'], arrays['specular'],
+                    arrays['shininess'], arrays['reflectivity'])
+    for kind, material in zip(arrays['object_kinds'], materials):
+        material = Material(*material)
+        if kind == SPHERE:
+            scene.add_object(Sphere(next(centers), next(radii), material))
+        else:
+            scene.add_object(Plane(next(points), next(normals), material))
+
+    lights = zip(arrays['light_kinds'], _triples(arrays['light_vectors']),
+                 arrays['intensities'], _triples(arrays['light_colors']))
+    for kind, vector, intensity, color in lights:
+        if kind == AMBIENT_LIGHT:
+            scene.add_light(AmbientLight(intensity, color))
+        elif kind == DIRECTIONAL_LIGHT:
+            scene.add_light(DirectionalLight(vector, intensity, color))
+        else:
+            scene.add_light(Light(vector, intensity, color))
+    return scene
+
+
+def load_cache(filename, digest=None):
+    """Scène lue depuis le cache de filename, ou None s'il est absent ou périmé."""
+    path = cache_path(filename)
+    if not os.path.exists(path):
+        return None
+    if digest is None:
+        digest = source_hash(filename)
+
+    try:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                arrays = _read(view, digest)
+                if arrays is None:
+                    return None
+                # Objets construits pendant que le fichier est projeté : les
+                # vues doivent être libérées avant la fermeture du mmap
+                try:
+                    return _build(arrays)
+                finally:
+                    _release(arrays)
+            finally:
+                view.release()
+    except (OSError, ValueError):
+        return None  # fichier vide ou illisible : on recompile
+
+
+def _build(arrays):
+    # Des centaines de milliers d'objets créés d'un coup, sans cycle : le
+    # ramasse-miettes n'aurait rien à libérer mais parcourrait tout le tas
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _build_scene(arrays)
+    finally:
+        if enabled:
+            gc.enable()
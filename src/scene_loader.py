@@ -1,121 +1,267 @@
+import os
+
 from math_utils import Vec3
-from geometry import Sphere, Plane
+from geometry import Sphere, Plane, TriangleMesh
 from scene import Scene, Camera, Material, Light, DirectionalLight, AmbientLight
+from animated_scene import AnimatedScene, ExpressionTrack, KeyframeTrack, PARAMETERS
+from obj_loader import read_obj, transform_vertices
+import scene_cache
+
+def parse_command(scene, command, tokens, line_num, base_dir=''):
+    """
+    Applique une ligne de scène (déjà découpée en tokens) à `scene`.
+    base_dir: dossier du fichier de scène (chemins des modèles OBJ).
+    Renvoie False si la commande est inconnue.
+    """
+    if command == 'CAMERA':
+        if len(tokens) < 8:
+            print(f"Ligne {line_num}: CAMERA nécessite 7 paramètres")
+            return True
+        position = Vec3(float(tokens[1]), float(tokens[2]), float(tokens[3]))
+        look_at = Vec3(float(tokens[4]), float(tokens[5]), float(tokens[6]))
+        fov = float(tokens[7])
+        up = Vec3(0, 1, 0)  # Vecteur "haut" par défaut
+        aspect_ratio = 16.0 / 9.0  # Ratio par défaut
+        camera = Camera(position, look_at, up, fov, aspect_ratio)
+        scene.set_camera(camera)
+
+    elif command == 'LIGHT':
+        if len(tokens) < 5:
+            print(f"Ligne {line_num}: LIGHT nécessite au moins 4 paramètres")
+            return True
+        position = Vec3(float(tokens[1]), float(tokens[2]), float(tokens[3]))
+        intensity = float(tokens[4])
+        color = Vec3(1, 1, 1)  # Blanc par défaut
+        if len(tokens) >= 8:
+            color = Vec3(float(tokens[5]), float(tokens[6]), float(tokens[7]))
+        light = Light(position, intensity, color)
+        scene.add_light(light)
+
+    elif command == 'DIRECTIONAL_LIGHT':
+        if len(tokens) < 5:
+            print(f"Ligne {line_num}: DIRECTIONAL_LIGHT nécessite au moins 4 paramètres")
+            return True
+        direction = Vec3(float(tokens[1]), float(tokens[2]), float(tokens[3]))
+        intensity = float(tokens[4])
+        color = Vec3(1, 1, 1)  # Blanc par défaut
+        if len(tokens) >= 8:
+            color = Vec3(float(tokens[5]), float(tokens[6]), float(tokens[7]))
+        light = DirectionalLight(direction, intensity, color)
+        scene.add_light(light)
+
+    elif command == 'AMBIENT_LIGHT':
+        if len(tokens) < 2:
+            print(f"Ligne {line_num}: AMBIENT_LIGHT nécessite au moins 1 paramètre")
+            return True
+        intensity = float(tokens[1])
+        color = Vec3(1, 1, 1)  # Blanc par défaut
+        if len(tokens) >= 5:
+            color = Vec3(float(tokens[2]), float(tokens[3]), float(tokens[4]))
+        light = AmbientLight(intensity, color)
+        scene.add_light(light)
+
+    elif command == 'SPHERE':
+        if len(tokens) < 8:
+            print(f"Ligne {line_num}: SPHERE nécessite au moins 7 paramètres")
+            return True
+        center = Vec3(float(tokens[1]), float(tokens[2]), float(tokens[3]))
+        radius = float(tokens[4])
+        color = Vec3(float(tokens[5]), float(tokens[6]), float(tokens[7]))
+
+        ambient = float(tokens[8]) if len(tokens) > 8 else 0.1
+        diffuse = float(tokens[9]) if len(tokens) > 9 else 0.7
+        specular = float(tokens[10]) if len(tokens) > 10 else 0.2
+        shininess = float(tokens[11]) if len(tokens) > 11 else 32.0
+        reflectivity = float(tokens[12]) if len(tokens) > 12 else 0.0
+
+        material = Material(color, ambient, diffuse, specular, shininess, reflectivity) # type: ignore
+        sphere = Sphere(center, radius, material)
+        scene.add_object(sphere)
+
+    elif command == 'PLANE':
+        if len(tokens) < 10:
+            print(f"Ligne {line_num}: PLANE nécessite au moins 9 paramètres")
+            return True
+        point = Vec3(float(tokens[1]), float(tokens[2]), float(tokens[3]))
+        normal = Vec3(float(tokens[4]), float(tokens[5]), float(tokens[6]))
+        color = Vec3(float(tokens[7]), float(tokens[8]), float(tokens[9]))
+
+        ambient = float(tokens[10]) if len(tokens) > 10 else 0.1
+        diffuse = float(tokens[11]) if len(tokens) > 11 else 0.7
+        specular = float(tokens[12]) if len(tokens) > 12 else 0.1
+        shininess = 10.0
+        reflectivity = float(tokens[13]) if len(tokens) > 13 else 0.0
+
+        material = Material(color, ambient, diffuse, specular, shininess, reflectivity) # type: ignore
+        plane = Plane(point, normal, material)
+        scene.add_object(plane)
+
+    elif command == 'MESH':
+        # MESH fichier.obj  x y z  échelle  r g b  [ambient diffuse specular shininess reflectivity]
+        if len(tokens) < 9:
+            print(f"Ligne {line_num}: MESH nécessite au moins 8 paramètres")
+            return True
+        path = resolve_path(tokens[1], base_dir)
+        offset = (float(tokens[2]), float(tokens[3]), float(tokens[4]))
+        scale = float(tokens[5])
+        color = Vec3(float(tokens[6]), float(tokens[7]), float(tokens[8]))
+
+        ambient = float(tokens[9]) if len(tokens) > 9 else 0.1
+        diffuse = float(tokens[10]) if len(tokens) > 10 else 0.7
+        specular = float(tokens[11]) if len(tokens) > 11 else 0.2
+        shininess = float(tokens[12]) if len(tokens) > 12 else 32.0
+        reflectivity = float(tokens[13]) if len(tokens) > 13 else 0.0
+
+        try:
+            vertices, indices = read_obj(path)
+        except OSError as e:
+            raise ValueError(f"modèle illisible '{path}': {e.strerror}")
+        transform_vertices(vertices, scale, offset)
+        material = Material(color, ambient, diffuse, specular, shininess, reflectivity) # type: ignore
+        scene.add_object(TriangleMesh(vertices, indices, material))
+
+    elif command == 'BACKGROUND':
+        if len(tokens) < 4:
+            print(f"Ligne {line_num}: BACKGROUND nécessite 3 paramètres")
+            return True
+        color = Vec3(float(tokens[1]), float(tokens[2]), float(tokens[3]))
+        scene.set_background(color)
+
+    else:
+        return False
+    
+    return True
+
+
+def resolve_path(path, base_dir):
+    """Chemin relatif au dossier de la scène, sinon au dossier courant."""
+    candidate = os.path.join(base_dir, path)
+    if base_dir and not os.path.isabs(path) and os.path.exists(candidate):
+        return candidate
+    return path
 
-def load_scene(filename):
+
+def iter_commands(lines):
+    """Lignes utiles d'un fichier de scène : (numéro, COMMANDE, tokens)."""
+    for line_num, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        
+        # Divise la ligne en tokens
+        tokens = line.split()
+        if not tokens:
+            continue
+        
+        yield line_num, tokens[0].upper(), tokens
+
+
+def parse_target(text):
+    """"SPHERE#2" -> ('SPHERE', 2) ; "CAMERA" -> ('CAMERA', 1)."""
+    kind, _, number = text.upper().partition('#')
+    if kind not in PARAMETERS:
+        raise ValueError(f"cible inconnue '{text}' (choix: {', '.join(PARAMETERS)})")
+    if kind == 'CAMERA':
+        return kind, 1
+    if not number.isdigit() or int(number) < 1:
+        raise ValueError(f"numéro manquant dans '{text}' (ex. {kind}#1)")
+    return kind, int(number)
+
+
+def parse_animation_command(animation, command, tokens, line_num):
+    """
+    Commandes d'animation :
+        FRAMES 30
+        ANIMATE SPHERE#1 center -2*cos(tau*t), 1, -2*sin(tau*t)
+        KEY CAMERA position 0  0 2 8  [linear|step|smooth]
+    Renvoie False si la commande n'en est pas une.
+    """
+    if command == 'FRAMES':
+        if len(tokens) < 2:
+            print(f"Ligne {line_num}: FRAMES nécessite 1 paramètre")
+            return True
+        animation['frames'] = int(tokens[1])
+        return True
+
+    if command not in ('ANIMATE', 'KEY'):
+        return False
+
+    if len(tokens) < 4:
+        print(f"Ligne {line_num}: {command} nécessite une cible, un paramètre et des valeurs")
+        return True
+    kind, number = parse_target(tokens[1])
+    param = tokens[2].lower()
+    size = PARAMETERS[kind].get(param)
+    if size is None:
+        raise ValueError(f"paramètre '{param}' inconnu pour {kind} "
+                         f"(choix: {', '.join(PARAMETERS[kind])})")
+
+    tracks = animation['tracks']
+    key = (kind, number, param)
+    if command == 'ANIMATE':
+        tracks[key] = ExpressionTrack(' '.join(tokens[3:]), size)
+        return True
+
+    if len(tokens) < 4 + size:
+        print(f"Ligne {line_num}: KEY {param} nécessite une frame et {size} valeurs")
+        return True
+    track = tracks.get(key)
+    if not isinstance(track, KeyframeTrack):
+        track = tracks[key] = KeyframeTrack(size)
+    values = [float(v) for v in tokens[4:4 + size]]
+    interpolation = tokens[4 + size].lower() if len(tokens) > 4 + size else 'linear'
+    track.add_key(int(tokens[3]), values, interpolation)
+    return True
+
+
+def load_animation(filename):
+    """
+    Charge un fichier de scène, animé ou non, en AnimatedScene : la partie
+    statique n'est lue qu'une fois, les frames sont produites à la demande.
+    """
     scene = Scene()
+    animation = {'frames': 1, 'tracks': {}}
+    base_dir = os.path.dirname(filename)
     
     with open(filename, 'r', encoding='utf-8') as f:
-        for line_num, line in enumerate(f, 1):
-            line = line.strip()
-            if not line or line.startswith('#'):
-                continue
-            
-            # Divise la ligne en tokens
-            tokens = line.split()
-            if not tokens:
-                continue
-            
-            command = tokens[0].upper()
-            
+        for line_num, command, tokens in iter_commands(f):
             try:
-                if command == 'CAMERA':
-                    if len(tokens) < 8:
-                        print(f"Ligne {line_num}: CAMERA nécessite 7 paramètres")
-                        continue
-                    position = Vec3(float(tokens[1]), float(tokens[2]), float(tokens[3]))
-                    look_at = Vec3(float(tokens[4]), float(tokens[5]), float(tokens[6]))
-                    fov = float(tokens[7])
-                    up = Vec3(0, 1, 0)  # Vecteur "haut" par défaut
-                    aspect_ratio = 16.0 / 9.0  # Ratio par défaut
-                    camera = Camera(position, look_at, up, fov, aspect_ratio)
-                    scene.set_camera(camera)
-                
-                elif command == 'LIGHT':
-                    if len(tokens) < 5:
-                        print(f"Ligne {line_num}: LIGHT nécessite au moins 4 paramètres")
-                        continue
-                    position = Vec3(float(tokens[1]), float(tokens[2]), float(tokens[3]))
-                    intensity = float(tokens[4])
-                    color = Vec3(1, 1, 1)  # Blanc par défaut
-                    if len(tokens) >= 8:
-                        color = Vec3(float(tokens[5]), float(tokens[6]), float(tokens[7]))
-                    light = Light(position, intensity, color)
-                    scene.add_light(light)
-                
-                elif command == 'DIRECTIONAL_LIGHT':
-                    if len(tokens) < 5:
-                        print(f"Ligne {line_num}: DIRECTIONAL_LIGHT nécessite au moins 4 paramètres")
-                        continue
-                    direction = Vec3(float(tokens[1]), float(tokens[2]), float(tokens[3]))
-                    intensity = float(tokens[4])
-                    color = Vec3(1, 1, 1)  # Blanc par défaut
-                    if len(tokens) >= 8:
-                        color = Vec3(float(tokens[5]), float(tokens[6]), float(tokens[7]))
-                    light = DirectionalLight(direction, intensity, color)
-                    scene.add_light(light)
-                
-                elif command == 'AMBIENT_LIGHT':
-                    if len(tokens) < 2:
-                        print(f"Ligne {line_num}: AMBIENT_LIGHT nécessite au moins 1 paramètre")
-                        continue
-                    intensity = float(tokens[1])
-                    color = Vec3(1, 1, 1)  # Blanc par défaut
-                    if len(tokens) >= 5:
-                        color = Vec3(float(tokens[2]), float(tokens[3]), float(tokens[4]))
-                    light = AmbientLight(intensity, color)
-                    scene.add_light(light)
-                
-                elif command == 'SPHERE':
-                    if len(tokens) < 8:
-                        print(f"Ligne {line_num}: SPHERE nécessite au moins 7 paramètres")
-                        continue
-                    center = Vec3(float(tokens[1]), float(tokens[2]), float(tokens[3]))
-                    radius = float(tokens[4])
-                    color = Vec3(float(tokens[5]), float(tokens[6]), float(tokens[7]))
-                    
-                    ambient = float(tokens[8]) if len(tokens) > 8 else 0.1
-                    diffuse = float(tokens[9]) if len(tokens) > 9 else 0.7
-                    specular = float(tokens[10]) if len(tokens) > 10 else 0.2
-                    shininess = float(tokens[11]) if len(tokens) > 11 else 32.0
-                    reflectivity = float(tokens[12]) if len(tokens) > 12 else 0.0
-                    
-                    material = Material(color, ambient, diffuse, specular, shininess, reflectivity) # type: ignore
-                    sphere = Sphere(center, radius, material)
-                    scene.add_object(sphere)
-                
-                elif command == 'PLANE':
-                    if len(tokens) < 10:
-                        print(f"Ligne {line_num}: PLANE nécessite au moins 9 paramètres")
-                        continue
-                    point = Vec3(float(tokens[1]), float(tokens[2]), float(tokens[3]))
-                    normal = Vec3(float(tokens[4]), float(tokens[5]), float(tokens[6]))
-                    color = Vec3(float(tokens[7]), float(tokens[8]), float(tokens[9]))
-                    
-                    ambient = float(tokens[10]) if len(tokens) > 10 else 0.1
-                    diffuse = float(tokens[11]) if len(tokens) > 11 else 0.7
-                    specular = float(tokens[12]) if len(tokens) > 12 else 0.1
-                    shininess = 10.0
-                    reflectivity = float(tokens[13]) if len(tokens) > 13 else 0.0
-                    
-                    material = Material(color, ambient, diffuse, specular, shininess, reflectivity) # type: ignore
-                    plane = Plane(point, normal, material)
-                    scene.add_object(plane)
-                
-                elif command == 'BACKGROUND':
-                    if len(tokens) < 4:
-                        print(f"Ligne {line_num}: BACKGROUND nécessite 3 paramètres")
-                        continue
-                    color = Vec3(float(tokens[1]), float(tokens[2]), float(tokens[3]))
-                    scene.set_background(color)
-                
-                else:
+                if parse_animation_command(animation, command, tokens, line_num):
+                    continue
+                if not parse_command(scene, command, tokens, line_num, base_dir):
                     print(f"Ligne {line_num}: Commande inconnue '{command}'")
-            
             except (ValueError, IndexError) as e:
                 print(f"Ligne {line_num}: Erreur de parsing - {e}")
                 continue
     
+    check_scene(scene)
+    return AnimatedScene(scene, animation['frames'], animation['tracks'])
+
+
+def load_scene(filename, frame=0, cache=True):
+    """
+    Charge une scène ; pour un fichier animé, la scène de la frame demandée.
+    Avec cache=True, une scène statique est compilée au premier chargement
+    dans un fichier binaire voisin (voir scene_cache.py), relu ensuite tant
+    que le texte source ne change pas.
+    """
+    digest = None
+    if cache:
+        digest = scene_cache.source_hash(filename)
+        scene = scene_cache.load_cache(filename, digest)
+        if scene is not None:
+            check_scene(scene)
+            return scene
+    
+    animation = load_animation(filename)
+    if animation.is_animated:
+        return animation.scene_at(frame)
+    if cache:
+        scene_cache.save_cache(filename, animation.base_scene, digest)
+    return animation.base_scene
+
+
+def check_scene(scene):
     # Vérifications
     if scene.camera is None:
         print("ATTENTION: Aucune caméra définie dans la scène!")
@@ -123,5 +269,3 @@ def load_scene(filename):
         print("ATTENTION: Aucune lumière définie dans la scène!")
     if len(scene.objects) == 0:
         print("ATTENTION: Aucun objet défini dans la scène!")
-    
-    return scene
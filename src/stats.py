@@ -0,0 +1,176 @@
+"""
+Statistiques détaillées d'un rendu (optionnelles).
+
+Avec Renderer(..., stats=True), le renderer remplit un RenderStats :
+- rayons par type (primaires, réfléchis, d'ombre) ;
+- tests d'intersection et impacts par type d'objet (Sphere, Plane...) ;
+- histogramme des profondeurs de réflexion ;
+- nombre de points éclairés et temps de rendu de chaque tuile.
+
+Désactivées (stats=None, par défaut), elles ne coûtent qu'un test
+"is not None" par rayon : le BVH n'est instrumenté (InstrumentedBVH) que
+lorsqu'elles sont actives.
+
+profile_call() entoure un appel (ex. renderer.render) de cProfile.
+"""
+
+import cProfile
+import io
+import pstats
+
+
+class RenderStats:
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.rays = {}            # type -> nombre de rayons
+        self.tests = {}           # type d'objet -> tests d'intersection
+        self.hits = {}            # type d'objet -> tests réussis
+        self.depths = {}          # profondeur -> rayons tracés à cette profondeur
+        self.shading_points = 0   # appels à compute_lighting (points éclairés)
+        self.tile_times = {}      # (x0, y0, x1, y1) -> secondes
+        self.render_time = 0.0
+
+    # ------------------------------------------------------------------
+    # Collecte
+    # ------------------------------------------------------------------
+
+    def ray(self, kind, depth=None, count=1):
+        self.rays[kind] = self.rays.get(kind, 0) + count
+        if depth is not None:
+            self.depths[depth] = self.depths.get(depth, 0) + count
+
+    def test(self, kind, hits, count=1):
+        """Compte count tests d'intersection sur des objets de type kind, dont hits réussis."""
+        self.tests[kind] = self.tests.get(kind, 0) + count
+        if hits:
+            self.hits[kind] = self.hits.get(kind, 0) + hits
+
+    def tile(self, tile, seconds):
+        self.tile_times[tuple(tile)] = seconds
+
+    def merge(self, other):
+        """Ajoute les statistiques d'un autre collecteur (ex. tuile d'un processus du pool)."""
+        for mine, theirs in ((self.rays, other.rays), (self.tests, other.tests),
+                             (self.hits, other.hits), (self.depths, other.depths)):
+            for key, value in theirs.items():
+                mine[key] = mine.get(key, 0) + value
+        self.shading_points += other.shading_points
+        self.tile_times.update(other.tile_times)
+
+    # ------------------------------------------------------------------
+    # Rapport
+    # ------------------------------------------------------------------
+
+    def slowest_tiles(self, count=5):
+        return sorted(self.tile_times.items(), key=lambda item: item[1], reverse=True)[:count]
+
+    def to_dict(self, counters=None):
+        """Statistiques sérialisables en JSON (avec les compteurs du renderer si donnés)."""
+        tile_total = sum(self.tile_times.values())
+        return {
+            'render_time': self.render_time,
+            'rays': dict(self.rays),
+            'intersection_tests': dict(self.tests),
+            'intersection_hits': dict(self.hits),
+            'depth_histogram': {str(depth): count for depth, count in sorted(self.depths.items())},
+            'shading_points': self.shading_points,
+            'tiles': {
+                'count': len(self.tile_times),
+                'total_time': tile_total,
+                'mean_time': tile_total / len(self.tile_times) if self.tile_times else 0.0,
+                'times': [{'tile': list(tile), 'seconds': seconds}
+                          for tile, seconds in sorted(self.tile_times.items(),
+                                                      key=lambda item: (item[0][1], item[0][0]))],
+            },
+            'counters': dict(counters or {}),
+        }
+
+    def summary(self):
+        """Lignes de résumé lisibles."""
+        lines = [f"Temps de rendu: {self.render_time:.2f}s"]
+        if self.rays:
+            lines.append("Rayons: " + ", ".join(f"{kind} {count}" for kind, count in sorted(self.rays.items())))
+        for kind in sorted(self.tests):
+            tests, hits = self.tests[kind], self.hits.get(kind, 0)
+            lines.append(f"Tests {kind}: {tests} ({hits} impacts, {hits / tests * 100:.1f}%)")
+        if self.depths:
+            lines.append("Profondeurs: " + ", ".join(f"{depth}: {count}"
+                                                     for depth, count in sorted(self.depths.items())))
+        if self.tile_times:
+            slowest = ", ".join(f"{tile} {seconds:.3f}s" for tile, seconds in self.slowest_tiles(3))
+            lines.append(f"Tuiles: {len(self.tile_times)}, les plus lentes: {slowest}")
+        return lines
+
+
+class InstrumentedBVH:
+    """
+    BVH dont les requêtes comptent chaque test d'intersection dans un
+    RenderStats (même parcours que BVH.closest_hit / BVH.any_hit).
+    """
+
+    def __init__(self, bvh, collector):
+        self.bvh = bvh
+        self.collector = collector
+
+    def closest_hit(self, ray):
+        bvh, test = self.bvh, self.collector.test
+        closest_t = float('inf')
+        closest_object = None
+
+        for obj in bvh.unbounded:
+            t = obj.hit_distance(ray)
+            test(type(obj).__name__, t is not None)
+            if t is not None and t < closest_t:
+                closest_t, closest_object = t, obj
+
+        max_t = [closest_t]
+        for obj in bvh.candidates(ray, max_t):
+            t = obj.hit_distance(ray)
+            test(type(obj).__name__, t is not None)
+            if t is not None and t < max_t[0]:
+                max_t[0] = t
+                closest_object = obj
+
+        if closest_object is None:
+            return float('inf'), None, None
+        return max_t[0], closest_object, closest_object.normal_at(ray, max_t[0])
+
+    def any_hit(self, ray, max_distance):
+        bvh, test = self.bvh, self.collector.test
+        for obj in bvh.unbounded:
+            hit = obj.occludes(ray, max_distance)
+            test(type(obj).__name__, hit)
+            if hit:
+                return obj
+
+        for obj in bvh.candidates(ray, [max_distance]):
+            hit = obj.occludes(ray, max_distance)
+            test(type(obj).__name__, hit)
+            if hit:
+                return obj
+        return None
+
+    def stats(self):
+        return self.bvh.stats()
+
+
+def profile_call(func, output=None, top=25):
+    """
+    Appelle func() sous cProfile, affiche les top fonctions (temps cumulé)
+    et enregistre le profil dans output (lisible avec pstats / snakeviz).
+    Seul le processus courant est profilé (pas les processus du pool).
+    """
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func)
+
+    if output:
+        profiler.dump_stats(output)
+        print(f"Profil sauvegardé: {output}")
+
+    text = io.StringIO()
+    pstats.Stats(profiler, stream=text).sort_stats('cumulative').print_stats(top)
+    print(text.getvalue())
+    return result
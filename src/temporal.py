@@ -0,0 +1,274 @@
+"""
+Réutilisation temporelle pour les animations.
+
+Entre deux frames consécutives, on compare les scènes (scene_diff) ; si
+seuls des objets bornés ont changé (ex. sphères qui tournent), on projette
+à l'écran une région "sale" conservative qui couvre :
+- les anciennes et nouvelles boîtes englobantes des objets modifiés ;
+- leurs ombres : projection des boîtes depuis chaque lumière sur les plans,
+  et les objets bornés qui se trouvent dans leur cône (ou cylindre) d'ombre ;
+- les réflexions : les objets réfléchissants bornés en entier, et l'image
+  miroir de tout ce qui précède dans un plan réfléchissant.
+Seules les tuiles qui touchent cette région sont retracées, les autres
+sont recopiées depuis la frame précédente. Comme l'échantillonnage ne
+dépend que de la graine et du pixel (et le mode adaptatif seulement de la
+tuile), le résultat est identique à un rendu complet.
+
+Quand on ne sait pas borner l'effet d'un changement (caméra, lumières,
+plans, objet derrière la caméra...), on renvoie None : rendu complet.
+"""
+
+import math
+
+from geometry import Sphere, Plane
+
+# Au-delà de cette fraction de tuiles à retracer, autant tout rendre
+MAX_DIRTY_FRACTION = 0.6
+
+# Marge (en pixels) autour des régions projetées : le jitter de
+# l'anti-aliasing déborde d'un pixel, plus les arrondis
+PIXEL_MARGIN = 2
+
+
+def _vec(v):
+    return (v.x, v.y, v.z)
+
+
+def _material_signature(material):
+    return (_vec(material.color), material.ambient, material.diffuse,
+            material.specular, material.shininess, material.reflectivity)
+
+
+def object_signature(obj):
+    """Description comparable d'un objet, ou None si le type est inconnu."""
+    if isinstance(obj, Sphere):
+        return ('sphere', _vec(obj.center), obj.radius, _material_signature(obj.material))
+    if isinstance(obj, Plane):
+        return ('plane', _vec(obj.point), _vec(obj.normal), _material_signature(obj.material))
+    return None
+
+
+def light_signature(light):
+    parts = [type(light).__name__, light.intensity, _vec(light.color)]
+    if hasattr(light, 'position'):
+        parts.append(_vec(light.position))
+    if hasattr(light, 'direction'):
+        parts.append(_vec(light.direction))
+    return tuple(parts)
+
+
+def camera_signature(camera):
+    if camera is None:
+        return None
+    return (_vec(camera.position), _vec(camera.look_at), _vec(camera.up),
+            camera.fov, camera.aspect_ratio)
+
+
+def scene_diff(previous, scene):
+    """
+    Liste des paires (ancien, nouveau) d'objets bornés modifiés entre deux
+    scènes, ou None si le changement n'est pas localisable (rendu complet).
+    """
+    if camera_signature(previous.camera) != camera_signature(scene.camera):
+        return None
+    if _vec(previous.background_color) != _vec(scene.background_color):
+        return None
+    if [light_signature(l) for l in previous.lights] != [light_signature(l) for l in scene.lights]:
+        return None
+    if len(previous.objects) != len(scene.objects):
+        return None
+
+    changed = []
+    for old, new in zip(previous.objects, scene.objects):
+        if old is new:
+            continue
+        old_signature, new_signature = object_signature(old), object_signature(new)
+        if old_signature is not None and old_signature == new_signature:
+            continue
+        # Un objet non borné (plan) ou inconnu qui change touche toute l'image
+        if old.bounding_box() is None or new.bounding_box() is None:
+            return None
+        changed.append((old, new))
+    return changed
+
+
+# ----------------------------------------------------------------------
+# Géométrie des régions influencées
+# ----------------------------------------------------------------------
+
+def _corners(box):
+    return [(x, y, z) for x in (box[0], box[3]) for y in (box[1], box[4]) for z in (box[2], box[5])]
+
+
+def _bounding_sphere(box):
+    center = ((box[0] + box[3]) * 0.5, (box[1] + box[4]) * 0.5, (box[2] + box[5]) * 0.5)
+    radius = 0.5 * math.sqrt((box[3] - box[0]) ** 2 + (box[4] - box[1]) ** 2 + (box[5] - box[2]) ** 2)
+    return center, radius
+
+
+def _sub(a, b):
+    return (a[0] - b[0], a[1] - b[1], a[2] - b[2])
+
+
+def _dot(a, b):
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+
+def _length(a):
+    return math.sqrt(_dot(a, a))
+
+
+class Unbounded(Exception):
+    """L'influence d'un changement ne peut pas être bornée à l'écran."""
+
+
+def _shadow_on_plane(corners, light, plane):
+    """Projection des coins depuis la lumière sur le plan (ombre portée)."""
+    p, n = _vec(plane.point), _vec(plane.normal)
+    points = []
+    for c in corners:
+        if getattr(light, 'is_directional', False):
+            d = _vec(light.direction)
+            origin = c
+        else:
+            origin = _vec(light.position)
+            d = _sub(c, origin)
+        denom = _dot(d, n)
+        s = _dot(_sub(p, origin), n) / denom if abs(denom) > 1e-9 else -1.0
+        if s <= 0:
+            points.append(None)
+        else:
+            points.append((origin[0] + d[0] * s, origin[1] + d[1] * s, origin[2] + d[2] * s))
+
+    hits = [q for q in points if q is not None]
+    if not hits:
+        return []  # l'ombre ne tombe pas sur ce plan
+    if len(hits) != len(points):
+        raise Unbounded()  # ombre étirée jusqu'à l'horizon
+    return hits
+
+
+def _in_shadow_volume(box, light, receiver_box):
+    """Le récepteur peut-il être dans l'ombre de box pour cette lumière ?"""
+    c, r = _bounding_sphere(box)
+    q, rq = _bounding_sphere(receiver_box)
+
+    if getattr(light, 'is_directional', False):
+        d = _vec(light.direction)
+        to_receiver = _sub(q, c)
+        along = _dot(to_receiver, d)
+        if along < -(r + rq):
+            return False
+        perpendicular = _length(_sub(to_receiver, (d[0] * along, d[1] * along, d[2] * along)))
+        return perpendicular <= r + rq
+
+    L = _vec(light.position)
+    to_occluder, to_receiver = _sub(c, L), _sub(q, L)
+    dc, dq = _length(to_occluder), _length(to_receiver)
+    if dc <= r:
+        raise Unbounded()  # lumière à l'intérieur de la boîte
+    if dq <= rq:
+        return True
+    if dq + rq < dc - r:
+        return False  # récepteur entièrement entre la lumière et l'objet
+    cos_beta = max(-1.0, min(1.0, _dot(to_occluder, to_receiver) / (dc * dq)))
+    return math.acos(cos_beta) <= math.asin(r / dc) + math.asin(min(1.0, rq / dq))
+
+
+def _mirror(point, plane):
+    p, n = _vec(plane.point), _vec(plane.normal)
+    k = 2 * _dot(_sub(point, p), n)
+    return (point[0] - n[0] * k, point[1] - n[1] * k, point[2] - n[2] * k)
+
+
+def influenced_points(scene, changed, max_depth):
+    """Nuage de points 3D (par groupes) dont la projection couvre la région sale."""
+    boxes = [box for old, new in changed for box in (old.bounding_box(), new.bounding_box())]
+    groups = [_corners(box) for box in boxes]
+
+    bounded = [obj for obj in scene.objects if obj.bounding_box() is not None]
+    planes = [obj for obj in scene.objects if isinstance(obj, Plane)]
+    changed_new = {id(new) for _, new in changed}
+
+    # Ombres portées (ancienne et nouvelle position)
+    for light in scene.lights:
+        if getattr(light, 'is_ambient', False):
+            continue
+        for box in boxes:
+            corners = _corners(box)
+            for plane in planes:
+                points = _shadow_on_plane(corners, light, plane)
+                if points:
+                    groups.append(points)
+            for receiver in bounded:
+                if id(receiver) in changed_new:
+                    continue
+                if _in_shadow_volume(box, light, receiver.bounding_box()):
+                    groups.append(_corners(receiver.bounding_box()))
+
+    # Réflexions
+    if max_depth > 1:
+        for obj in bounded:
+            if obj.material.reflectivity > 0:
+                groups.append(_corners(obj.bounding_box()))
+        mirrors = [plane for plane in planes if plane.material.reflectivity > 0]
+        if len(mirrors) > 1:
+            raise Unbounded()  # réflexions entre plans : non borné
+        for plane in mirrors:
+            groups.extend([[_mirror(point, plane) for point in group] for group in list(groups)])
+
+    return groups
+
+
+def _project(camera, point):
+    """Coordonnées écran (u, v) d'un point, comme Camera.get_ray les utilise."""
+    d = _sub(point, _vec(camera.position))
+    depth = _dot(d, _vec(camera.forward))
+    if depth <= 1e-6:
+        raise Unbounded()  # derrière la caméra
+    half_width = _length(_vec(camera.horizontal)) / 2
+    half_height = _length(_vec(camera.vertical)) / 2
+    u = _dot(d, _vec(camera.right)) / depth / (2 * half_width) + 0.5
+    v = _dot(d, _vec(camera.up_corrected)) / depth / (2 * half_height) + 0.5
+    return u, v
+
+
+def screen_rects(scene, groups, width, height):
+    """Rectangles pixels (x0, y0, x1, y1) couvrant chaque groupe de points."""
+    rects = []
+    for group in groups:
+        us, vs = zip(*(_project(scene.camera, point) for point in group))
+        # u = i / (width - 1) et v = 1 - j / (height - 1)
+        x0 = math.floor(min(us) * (width - 1)) - PIXEL_MARGIN
+        x1 = math.ceil(max(us) * (width - 1)) + PIXEL_MARGIN + 1
+        y0 = math.floor((1.0 - max(vs)) * (height - 1)) - PIXEL_MARGIN
+        y1 = math.ceil((1.0 - min(vs)) * (height - 1)) + PIXEL_MARGIN + 1
+        x0, y0 = max(0, x0), max(0, y0)
+        x1, y1 = min(width, x1), min(height, y1)
+        if x0 < x1 and y0 < y1:
+            rects.append((x0, y0, x1, y1))
+    return rects
+
+
+def dirty_tiles(previous_scene, scene, renderer, max_fraction=MAX_DIRTY_FRACTION):
+    """
+    Ensemble des tuiles de renderer à retracer pour passer de previous_scene
+    à scene, ou None s'il faut tout rendre.
+    """
+    changed = scene_diff(previous_scene, scene)
+    if changed is None:
+        return None
+
+    try:
+        groups = influenced_points(scene, changed, renderer.max_depth)
+        rects = screen_rects(scene, groups, renderer.width, renderer.height)
+    except Unbounded:
+        return None
+
+    tiles = renderer.tiles()
+    dirty = {tile for tile in tiles
+             if any(tile[0] < r[2] and r[0] < tile[2] and tile[1] < r[3] and r[1] < tile[3]
+                    for r in rects)}
+    if len(dirty) > max_fraction * len(tiles):
+        return None
+    return dirty
@@ -0,0 +1,126 @@
+"""
+Worker de rendu distribué : se connecte à un coordinateur (voir
+distributed.py), demande des tuiles, les rend et renvoie les pixels.
+
+    python src/worker.py --connect hote:5050
+    python src/worker.py --connect 127.0.0.1:5050 --processes 4   # 4 workers locaux
+"""
+
+import argparse
+import os
+import pickle
+import sys
+import time
+import traceback
+from collections import OrderedDict
+from multiprocessing import AuthenticationError, Process
+from multiprocessing.connection import Client
+
+from distributed import AUTHKEY_VARIABLE, default_authkey, parse_address
+from parallel import render_tile_job, default_workers
+
+# Nombre de scènes gardées en mémoire (par empreinte)
+SCENE_CACHE_SIZE = 4
+
+
+def connect(address, authkey, retry):
+    """Connexion au coordinateur, en réessayant pendant retry secondes."""
+    deadline = time.monotonic() + retry
+    while True:
+        try:
+            return Client(address, authkey=authkey)
+        except ConnectionRefusedError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.5)
+
+
+def run_worker(address, authkey=None, retry=0.0, name=None):
+    """Rend des tuiles jusqu'à ce que le coordinateur arrête la session ; renvoie leur nombre."""
+    name = name or f"{os.uname().nodename if hasattr(os, 'uname') else 'worker'}:{os.getpid()}"
+    scenes = OrderedDict()  # empreinte -> renderer
+    rendered = 0
+
+    authkey = authkey or default_authkey()
+    if not authkey:
+        raise ValueError(f"Clé partagée requise : --authkey ou variable {AUTHKEY_VARIABLE} "
+                         f"(affichée par le coordinateur s'il l'a tirée au hasard)")
+    conn = connect(address, authkey, retry)
+    print(f"[{name}] connecté à {address[0]}:{address[1]}")
+    try:
+        conn.send(('ready',))
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                break  # coordinateur arrêté
+            if message[0] == 'stop':
+                break
+
+            _, fingerprint, tile = message
+            renderer = scenes.get(fingerprint)
+            if renderer is None:
+                conn.send(('need_scene', fingerprint))
+                _, fingerprint, payload = conn.recv()
+                renderer = scenes[fingerprint] = pickle.loads(payload)
+                if len(scenes) > SCENE_CACHE_SIZE:
+                    scenes.popitem(last=False)
+            scenes.move_to_end(fingerprint)
+
+            try:
+                result = render_tile_job(renderer, tuple(tile))
+            except Exception:
+                conn.send(('error', tile, traceback.format_exc(limit=3)))
+                continue
+            conn.send(('result',) + result)
+            rendered += 1
+    finally:
+        conn.close()
+
+    print(f"[{name}] terminé, {rendered} tuile(s) rendue(s)")
+    return rendered
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Worker de rendu distribué")
+    parser.add_argument("--connect", required=True, metavar="HOTE:PORT",
+                        help="adresse du coordinateur (main.py --serve)")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="nombre de workers lancés sur cette machine (0 = un par cœur)")
+    parser.add_argument("--authkey", default=None,
+                        help="clé partagée avec le coordinateur (de préférence la variable "
+                             "RAYTRACER_AUTHKEY : un argument est visible des autres utilisateurs)")
+    parser.add_argument("--retry", type=float, default=30.0,
+                        help="secondes pendant lesquelles réessayer la connexion")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    address = parse_address(args.connect)
+    authkey = args.authkey.encode() if args.authkey else default_authkey()
+    if not authkey:
+        print(f"Erreur: clé partagée requise (--authkey ou variable {AUTHKEY_VARIABLE}, "
+              f"la même que celle du coordinateur)")
+        return 1
+    processes = args.processes if args.processes > 0 else default_workers()
+
+    if processes == 1:
+        try:
+            run_worker(address, authkey, args.retry)
+        except AuthenticationError:
+            print(f"Erreur: clé refusée par le coordinateur (vérifiez {AUTHKEY_VARIABLE})")
+            return 1
+        return 0
+
+    workers = [Process(target=run_worker, args=(address, authkey, args.retry))
+               for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())